@@ -0,0 +1,108 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import logging
+import math
+import os
+
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_WINDOW = int(os.getenv('BACKFILL_WINDOW', 24 * 3600))
+BACKFILL_CONCURRENCY = int(os.getenv('BACKFILL_CONCURRENCY', 4))
+BACKFILL_MAX_WINDOWS = int(os.getenv('BACKFILL_MAX_WINDOWS', 8))
+
+
+def needs_backfill(cursor, now, window=BACKFILL_WINDOW):
+    """
+    Проверяет, что пропуск между курсором и now длиннее окна.
+    Нулевой курсор — запрос всей истории, а не простой.
+    """
+    return bool(cursor) and now - cursor > window
+
+
+def plan_windows(start, end, window=BACKFILL_WINDOW,
+                 max_windows=BACKFILL_MAX_WINDOWS):
+    """
+    Делит пропуск [start, end) на окна по window секунд.
+    Окон не больше max_windows: для долгого простоя окна длиннее.
+    Последнее окно открыто справа: его граница — current_date ответа.
+    """
+    window = max(window, math.ceil((end - start) / max_windows))
+    count = max(1, math.ceil((end - start) / window))
+    return [(start + number * window,
+             None if number == count - 1 else start + (number + 1) * window)
+            for number in range(count)]
+
+
+def updated_at(homework):
+    """Возвращает date_updated работы в секундах или None."""
+    value = homework.get('date_updated')
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (TypeError, ValueError):
+        return None
+    return moment.timestamp()
+
+
+def window_homeworks(homeworks, start, end):
+    """
+    Отбирает работы, обновлённые в окне [start, end).
+    API ограничивает выборку только снизу, поэтому более новые работы
+    отбрасываются и попадут в своё окно; работы без date_updated
+    относятся к последнему окну (end is None). homeworks может быть
+    потоком: в памяти остаются только работы окна. Порядок по
+    date_updated наводит HomeworkIndex.diff.
+    """
+    selected = []
+    for homework in homeworks:
+        moment = updated_at(homework)
+        if moment is None:
+            if end is None:
+                selected.append(homework)
+        elif moment >= start and (end is None or moment < end):
+            selected.append(homework)
+    return selected
+
+
+def prefetch(executor, func, args, depth):
+    """
+    Отдаёт func(arg) для каждого arg по порядку args.
+    В executor одновременно выполняется не больше depth вызовов.
+    """
+    pending = deque()
+    for arg in args:
+        pending.append(executor.submit(func, arg))
+        if len(pending) >= depth:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def run_backfill(fetch, cursor, now, process, window=BACKFILL_WINDOW,
+                 concurrency=BACKFILL_CONCURRENCY,
+                 max_windows=BACKFILL_MAX_WINDOWS):
+    """
+    Догоняет пропуск опроса от cursor до now по окнам.
+    fetch(start, end) возвращает (current_date, работы окна), окна
+    запрашиваются параллельно не больше concurrency штук, а
+    process(homeworks, cursor) вызывается строго по порядку окон
+    с работами окна и новым курсором, который можно сохранить.
+    API ограничивает выборку только снизу, и запрос окна скачивает
+    всё от его начала до текущего момента. Поэтому окон не больше
+    max_windows: трафик не превышает max_windows запросов с from_date,
+    равным cursor, а при потоковом fetch в памяти остаются только
+    работы concurrency окон. Ошибка прерывает догон: курсор остаётся
+    на последнем обработанном окне. Возвращает новый курсор.
+    """
+    windows = plan_windows(cursor, now, window, max_windows)
+    logger.info(f'Пропуск опроса {now - cursor} с, окон: {len(windows)}')
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        responses = prefetch(
+            executor, lambda bounds: fetch(*bounds), windows, concurrency)
+        for (_, end), (current_date, homeworks) in zip(windows, responses):
+            cursor = current_date if end is None else end
+            process(homeworks, cursor)
+    return cursor
@@ -0,0 +1,108 @@
+"""
+Бенчмарк ответов на команды /status и /history.
+
+Запуск: python benchmarks/bench_commands.py --tenants 100 --commands 200
+API Практикума и Telegram Bot API заменены заглушками из stub_server.
+Движок один раз опрашивает всех арендаторов, затем CommandHandler
+получает команды через getUpdates заглушки и отвечает по одной.
+Отчёт: перцентили задержки от появления команды в заглушке до
+получения ответа и число запросов к API за время ответов. С --stale
+индекс считается устаревшим и каждый ответ запрашивает API.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_server import (push_command,  # noqa: E402
+                                    start_stub_server, start_telegram_stub)
+from commands import CommandHandler, CommandPoller  # noqa: E402
+import homework  # noqa: E402
+from engine import PollingEngine, Tenant  # noqa: E402
+import telegram  # noqa: E402
+from telegram.utils.request import Request  # noqa: E402
+
+BOT_TOKEN = '1234:abcdefg'
+HOMEWORKS = [
+    {'id': number, 'homework_name': f'hw{number}', 'status': status,
+     'date_updated': f'2022-10-{number + 1:02d}T18:07:39Z'}
+    for number, status in enumerate(['approved', 'rejected', 'reviewing'])]
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+async def ask(telegram_stub, chat_id, text, timeout=10):
+    expected = len(telegram_stub.sent) + 1
+    pushed = push_command(telegram_stub, chat_id, text)
+    deadline = time.monotonic() + timeout
+    while len(telegram_stub.sent) < expected:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f'Нет ответа на {text} в чат {chat_id}')
+        await asyncio.sleep(0.001)
+    return telegram_stub.sent[expected - 1][2] - pushed
+
+
+async def measure(engine, handler, telegram_stub, polls, args):
+    await engine.run_once()
+    polls['count'] = 0
+    runner = asyncio.ensure_future(handler.run())
+    delays = []
+    try:
+        for number in range(args.commands):
+            chat_id = number % args.tenants + 1
+            text = ('/status', '/history')[number % 2]
+            delays.append(await ask(telegram_stub, chat_id, text))
+    finally:
+        runner.cancel()
+        await asyncio.gather(runner, return_exceptions=True)
+    return delays
+
+
+def run(args):
+    homework.logger.disabled = True
+    api, url = start_stub_server(args.api_latency, homeworks=HOMEWORKS)
+    telegram_stub, base_url = start_telegram_stub(args.tg_latency)
+    homework.ENDPOINT = url
+    bot = telegram.Bot(BOT_TOKEN, base_url=base_url,
+                       request=Request(con_pool_size=args.tenants + 4))
+    polls = {'count': 0}
+
+    def fetch(token, from_date):
+        polls['count'] += 1
+        return homework.request_homework_statuses(token, from_date)
+
+    tenants = [Tenant(f'practicum{number}', str(number + 1), 0)
+               for number in range(args.tenants)]
+    engine = PollingEngine(bot, tenants, fetch=fetch)
+    handler = CommandHandler(engine, CommandPoller(bot, timeout=1),
+                             max_age=-1 if args.stale else 3600)
+    try:
+        delays = asyncio.run(
+            measure(engine, handler, telegram_stub, polls, args))
+    finally:
+        engine.close()
+        api.shutdown()
+        telegram_stub.shutdown()
+    print(f'команд: {len(delays)}, запросов к API: {polls["count"]}')
+    print('задержка ответа, мс: ' + ', '.join(
+        f'p{int(share * 100)} {percentile(delays, share) * 1000:.1f}'
+        for share in (0.5, 0.9, 0.99))
+        + f', max {max(delays) * 1000:.1f}')
+    return delays, polls['count']
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--tenants', type=int, default=100)
+    parser.add_argument('--commands', type=int, default=200)
+    parser.add_argument('--api-latency', type=float, default=0.2)
+    parser.add_argument('--tg-latency', type=float, default=0.01)
+    parser.add_argument('--stale', action='store_true')
+    run(parser.parse_args())
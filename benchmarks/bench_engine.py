@@ -0,0 +1,66 @@
+"""
+Бенчмарк движка опроса: сколько арендаторов выдерживает одно ядро.
+
+Запуск: python benchmarks/bench_engine.py --tenants 5000 --latency 0.05
+API и Telegram заменены заглушками, поэтому измеряется только
+собственная стоимость движка в секундах процессора на один опрос.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import homework  # noqa: E402
+from engine import PollingEngine, Tenant  # noqa: E402
+
+
+class StubBot:
+    def send_message(self, chat_id, text):
+        return None
+
+
+def make_fetch(latency, changed_every):
+    counter = {'calls': 0}
+
+    def fetch(token, from_date):
+        counter['calls'] += 1
+        if latency:
+            time.sleep(latency)
+        homeworks = []
+        if changed_every and counter['calls'] % changed_every == 0:
+            homeworks = [{'homework_name': 'hw', 'status': 'approved'}]
+        return {'homeworks': homeworks, 'current_date': from_date + 1}
+    return fetch
+
+
+def run(tenants, latency, max_in_flight, changed_every):
+    engine = PollingEngine(
+        StubBot(), [Tenant(f'token{i}', str(i), 0) for i in range(tenants)],
+        max_in_flight=max_in_flight, fetch=make_fetch(latency, changed_every))
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    asyncio.run(engine.run_once())
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - wall
+    engine.close()
+    per_poll = cpu / tenants
+    print(f'арендаторов:            {tenants}')
+    print(f'одновременных запросов: {max_in_flight}')
+    print(f'время цикла:            {wall:.3f} с')
+    print(f'опросов в секунду:      {tenants / wall:.0f}')
+    print(f'CPU на опрос:           {per_poll * 1e6:.1f} мкс')
+    print(f'арендаторов на ядро при RETRY_TIME={homework.RETRY_TIME}: '
+          f'{homework.RETRY_TIME / per_poll:.0f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tenants', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--max-in-flight', type=int, default=64)
+    parser.add_argument('--changed-every', type=int, default=10)
+    args = parser.parse_args()
+    run(args.tenants, args.latency, args.max_in_flight, args.changed_every)
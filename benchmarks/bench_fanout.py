@@ -0,0 +1,102 @@
+"""
+Бенчмарк рассылки одного изменения статуса многим чатам.
+
+Запуск: python benchmarks/bench_fanout.py --recipients 1 10 100 1000
+Telegram заменён локальной заглушкой Bot API с задержкой --latency,
+сообщения уходят через настоящий telegram.Bot. Сравниваются
+последовательная отправка в каждый чат и рассылка движка: один
+checkpoint с outbox на всех получателей и SendQueue с --workers
+отправителями. Ограничения скорости Telegram сняты, чтобы измерить
+собственную пропускную способность рассылки; с ними время рассылки
+определяется TELEGRAM_GLOBAL_RATE.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_server import start_telegram_stub  # noqa: E402
+import homework  # noqa: E402
+from engine import PollingEngine, Tenant  # noqa: E402
+from send_queue import SendQueue  # noqa: E402
+from storage import CheckpointStore  # noqa: E402
+import telegram  # noqa: E402
+from telegram.utils.request import Request  # noqa: E402
+
+TOKEN = '1234:abcdefg'
+CHANGE = {'homeworks': [{'id': 1, 'homework_name': 'hw',
+                         'status': 'approved'}], 'current_date': 1}
+
+
+def fetch(token, from_date):
+    return CHANGE
+
+
+def make_tenant(recipients):
+    return Tenant('practicum', '1', 0, subscribers=tuple(
+        str(chat) for chat in range(2, recipients + 1)))
+
+
+def sequential(bot, recipients):
+    tenant = make_tenant(recipients)
+    message = homework.parse_status(CHANGE['homeworks'][0])
+    started = time.perf_counter()
+    for chat_id in tenant.recipients:
+        homework.send_message_to_chat(bot, chat_id, message)
+    return time.perf_counter() - started
+
+
+def fan_out(bot, recipients, workers):
+    store = CheckpointStore(':memory:')
+    queue = SendQueue(bot, workers=workers, global_rate=10 ** 9,
+                      per_chat_rate=10 ** 9, on_sent=store.ack)
+    polling = PollingEngine(bot, [make_tenant(recipients)], fetch=fetch,
+                            store=store, send_queue=queue)
+
+    async def scenario():
+        queue.start()
+        started = time.perf_counter()
+        await polling.poll_tenant(polling.tenants[0])
+        await queue.join()
+        elapsed = time.perf_counter() - started
+        await queue.stop()
+        return elapsed
+
+    elapsed = asyncio.run(scenario())
+    assert not store.pending_messages(), 'outbox не опустел'
+    polling.close()
+    store.close()
+    return elapsed
+
+
+def run(recipients, workers, latency):
+    homework.logger.disabled = True
+    server, base_url = start_telegram_stub(latency)
+    bot = telegram.Bot(TOKEN, base_url=base_url,
+                       request=Request(con_pool_size=workers + 4))
+    print(f'{"чатов":>6} {"подряд, с":>10} {"рассылка, с":>12} '
+          f'{"сообщ./с":>10} {"ускорение":>10}')
+    try:
+        for count in recipients:
+            server.sent.clear()
+            single = sequential(bot, count)
+            server.sent.clear()
+            parallel = fan_out(bot, count, workers)
+            assert len(server.sent) == count, 'доставлены не все сообщения'
+            print(f'{count:>6} {single:>10.3f} {parallel:>12.3f} '
+                  f'{count / parallel:>10.0f} {single / parallel:>9.1f}x')
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--recipients', type=int, nargs='+',
+                        default=[1, 10, 100, 1000])
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.01)
+    args = parser.parse_args()
+    run(args.recipients, args.workers, args.latency)
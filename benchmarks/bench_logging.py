@@ -0,0 +1,88 @@
+"""
+Пропускная способность логирования: синхронные обработчики против очереди.
+
+Запуск: python benchmarks/bench_logging.py --records 50000 --threads 8
+Сравнивает прежнюю схему (FileHandler + StreamHandler прямо в потоке
+вызова) с log_pipeline.setup_logging. Выводит записи в секунду с точки
+зрения вызывающего кода и полное время до сброса всех записей на диск.
+stdout перенаправляется в /dev/null, файлы пишутся во временный каталог.
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import log_pipeline  # noqa: E402
+
+
+def sync_setup(directory):
+    formatter = logging.Formatter(
+        '%(asctime)s,%(levelname)s,%(message)s,%(funcName)s,%(lineno)d')
+    handlers = [logging.StreamHandler(sys.stdout), logging.FileHandler(
+        os.path.join(directory, 'sync.log'), mode='w', encoding='UTF-8')]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    root = logging.getLogger()
+    root.handlers = handlers
+    root.setLevel(logging.INFO)
+    return None
+
+
+def queue_setup(directory):
+    return log_pipeline.setup_logging(
+        level=logging.INFO, filename=os.path.join(directory, 'queue.log'))
+
+
+def emit(records, threads):
+    logger = logging.getLogger('bench')
+    per_thread = records // threads
+
+    def work(number):
+        context = {'tenant': f'tenant{number}', 'stage': 'poll',
+                   'duration': 0.0123}
+        for index in range(per_thread):
+            logger.info(f'Сообщение отправлено {index}', extra=context)
+
+    workers = [threading.Thread(target=work, args=(number,))
+               for number in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return per_thread * threads, time.perf_counter() - started
+
+
+def run(records, threads):
+    stdout = sys.stdout
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name, setup in (('синхронно', sync_setup),
+                            ('очередь', queue_setup)):
+            sys.stdout = open(os.devnull, 'w')
+            listener = setup(directory)
+            count, emitted = emit(records, threads)
+            started = time.perf_counter()
+            if listener is not None:
+                listener.stop()
+            flushed = emitted + time.perf_counter() - started
+            sys.stdout.close()
+            sys.stdout = stdout
+            results.append((name, count, emitted, flushed))
+        logging.getLogger().handlers = []
+    for name, count, emitted, flushed in results:
+        print(f'{name:<10} вызовы: {count / emitted:>9.0f} зап/с   '
+              f'до сброса: {count / flushed:>9.0f} зап/с')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=50000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+    run(args.records, args.threads)
@@ -0,0 +1,82 @@
+"""
+Бенчмарк памяти состояния арендаторов в одном процессе.
+
+Запуск: python benchmarks/bench_memory.py --tenants 10000 100000
+Создаёт N арендаторов в том виде, в каком их держит движок: Tenant
+с курсором, индексом из --homeworks работ (статусы и даты приходят
+из JSON-ответа, как от API) и записью в PollScheduler. Каждому
+--failing-share арендатору засчитывается сбой (ErrorNotifier).
+Память считается tracemalloc после сборки мусора, ответы API к
+этому моменту освобождены. Отчёт: байт на арендатора.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import Tenant  # noqa: E402
+from scheduler import PollScheduler  # noqa: E402
+
+STATUSES = ('approved', 'reviewing', 'rejected')
+
+
+def response_body(number, homeworks):
+    return json.dumps({'homeworks': [
+        {'id': number * 100 + item, 'homework_name': f'user{number}/hw{item}',
+         'status': STATUSES[(number + item) % len(STATUSES)],
+         'date_updated': f'2022-10-{item % 28 + 1:02d}T18:07:39Z'}
+        for item in range(homeworks)], 'current_date': 1666800000 + number})
+
+
+def build(count, homeworks, failing_share):
+    scheduler = PollScheduler(rng=lambda: 0.5)
+    tenants = []
+    failing = int(1 / failing_share) if failing_share else 0
+    for number in range(count):
+        tenant = Tenant(f'y0_{number:030d}', str(10 ** 9 + number), 0)
+        response = json.loads(response_body(number, homeworks))
+        tenant.from_date = response['current_date']
+        for homework_item in tenant.index.diff(response['homeworks']):
+            tenant.index.apply(homework_item)
+        if failing and number % failing == 0:
+            tenant.errors = 1
+            tenant.notifier.alert(ConnectionError('API недоступно'))
+        scheduler.reschedule(tenant, tenant.statuses())
+        tenants.append(tenant)
+    return tenants, scheduler
+
+
+def measure(count, homeworks, failing_share):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    state = build(count, homeworks, failing_share)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del state
+    return used / count
+
+
+def run(counts, homeworks, failing_share):
+    print(f'{"арендаторов":>12} {"работ":>6} {"байт/арендатор":>15}')
+    results = {}
+    for count in counts:
+        results[count] = measure(count, homeworks, failing_share)
+        print(f'{count:>12} {homeworks:>6} {results[count]:>15.0f}')
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--tenants', type=int, nargs='+',
+                        default=[10000, 100000])
+    parser.add_argument('--homeworks', type=int, default=5)
+    parser.add_argument('--failing-share', type=float, default=0.01)
+    args = parser.parse_args()
+    run(args.tenants, args.homeworks, args.failing_share)
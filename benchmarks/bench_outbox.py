@@ -0,0 +1,57 @@
+"""
+Бенчмарк outbox: пропускная способность надёжных checkpoint().
+
+Запуск: python benchmarks/bench_outbox.py --threads 32 --checkpoints 2000
+Потоки одновременно фиксируют курсор, статус и одно сообщение, как
+движок при изменении статуса. Каждая фиксация дожидается fsync;
+сравниваются отдельная транзакция на вызов и group commit, при
+котором одновременные вызовы делят одну транзакцию и один fsync.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import CheckpointStore  # noqa: E402
+
+
+def measure(group_commit, threads, checkpoints):
+    with tempfile.TemporaryDirectory() as directory:
+        store = CheckpointStore(
+            os.path.join(directory, 'state.sqlite3'),
+            group_commit=group_commit)
+
+        def checkpoint(number):
+            tenant = f't{number % 500}'
+            store.checkpoint(
+                tenant, number, [('hw', 'approved', str(number))],
+                [(f'{tenant}:hw:{number}', tenant, 'Работа проверена')])
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(checkpoint, range(checkpoints)))
+        elapsed = time.perf_counter() - started
+        assert len(store.pending_messages()) == checkpoints
+        store.close()
+    return checkpoints / elapsed
+
+
+def run(threads, checkpoints):
+    single = measure(False, threads, checkpoints)
+    grouped = measure(True, threads, checkpoints)
+    print(f'потоков:                  {threads}')
+    print(f'транзакция на вызов:      {single:8.0f} checkpoint/с')
+    print(f'group commit:             {grouped:8.0f} checkpoint/с')
+    print(f'ускорение:                {grouped / single:8.1f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--checkpoints', type=int, default=2000)
+    args = parser.parse_args()
+    run(args.threads, args.checkpoints)
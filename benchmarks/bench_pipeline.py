@@ -0,0 +1,231 @@
+"""
+Микробенчмарки этапов конвейера бота с порогом регрессии.
+
+Запуск:
+    python benchmarks/bench_pipeline.py            # сравнить с baseline
+    python benchmarks/bench_pipeline.py --update   # записать baseline
+
+Работает без сети: get_api_answer и send_message получают заглушки
+MockResponseGET и MockTelegramBot из tests/test_bot.py. Скорость
+этапа измеряется в единицах калибровки: отрезки работы этапа
+чередуются с отрезками эталонной нагрузки на чистом Python, и
+медиана отношений времени на операцию почти не зависит от частоты
+процессора и соседей по машине. Память — медиана пикового объёма,
+выделяемого за операцию (tracemalloc).
+
+baseline.json хранит замеры в stages и допуски в allowances:
+стоимость и память, которые этап может прибавить из-за функции,
+принятой после замера, с номером заявки и причиной. --update
+перезаписывает только stages. Регрессия — если этап дороже замера
+с допусками больше чем на --threshold или выделяет больше на
+--threshold, но не меньше чем на MEMORY_FLOOR байт; тогда скрипт
+завершается с кодом 1.
+"""
+import argparse
+import json
+import os
+from statistics import median
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tests'))
+
+from test_bot import MockResponseGET, MockTelegramBot  # noqa: E402
+
+import homework  # noqa: E402
+from storage import CheckpointStore  # noqa: E402
+from throttle import RequestThrottle  # noqa: E402
+import transport  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+MEMORY_FLOOR = 1024
+TIMESTAMP = 1000198000
+HOMEWORKS = [
+    {'id': number, 'homework_name': f'hw{number}',
+     'status': ('approved', 'rejected', 'reviewing')[number % 3],
+     'date_updated': '2022-10-26T18:07:39Z'}
+    for number in range(5)
+]
+RESPONSE = {'homeworks': HOMEWORKS, 'current_date': TIMESTAMP}
+
+
+class StopLoop(Exception):
+    pass
+
+
+def mock_get(*args, **kwargs):
+    response = MockResponseGET(
+        *args, random_timestamp=TIMESTAMP,
+        current_timestamp=kwargs['params']['from_date'], **kwargs)
+    response.json = lambda: {'homeworks': list(HOMEWORKS),
+                             'current_date': TIMESTAMP}
+    return response
+
+
+def mock_bot(*args, **kwargs):
+    return MockTelegramBot(*args, random_timestamp=TIMESTAMP, **kwargs)
+
+
+def stop_loop(seconds):
+    raise StopLoop
+
+
+def setup():
+    """Подменяет сеть, Telegram, хранилища и сон в модуле homework."""
+    transport.get = mock_get
+    homework.telegram.Bot = mock_bot
+    homework.CheckpointStore = lambda: CheckpointStore(':memory:')
+    homework.RequestThrottle = lambda: RequestThrottle(
+        ':memory:', token_limit=10 ** 9, ip_limit=10 ** 9)
+    homework.time.sleep = stop_loop
+    homework.PRACTICUM_TOKEN = 'token'
+    homework.TELEGRAM_TOKEN = '1234:abcdefg'
+    homework.TELEGRAM_CHAT_ID = 12345
+    homework.logger.disabled = True
+
+
+def main_iteration():
+    try:
+        homework.main()
+    except StopLoop:
+        pass
+
+
+def stages():
+    bot = mock_bot(token=homework.TELEGRAM_TOKEN)
+    return {
+        'get_api_answer': lambda: homework.get_api_answer(TIMESTAMP),
+        'check_response': lambda: homework.check_response(RESPONSE),
+        'parse_status': lambda: homework.parse_status(HOMEWORKS[0]),
+        'send_message': lambda: homework.send_message(bot, 'message'),
+        'main_iteration': main_iteration,
+    }
+
+
+def calibration():
+    """Эталонная нагрузка: разбор словаря и сортировка на чистом Python."""
+    items = {str(number): number for number in range(40)}
+    return sorted(items.items(), key=lambda item: -item[1])
+
+
+def seconds_per_op(operation, min_time):
+    count = 0
+    started = time.perf_counter()
+    deadline = started + min_time
+    while time.perf_counter() < deadline:
+        operation()
+        count += 1
+    return (time.perf_counter() - started) / count
+
+
+def ops_per_sec(operation, min_time=0.05, repeat=21):
+    """Медиана операций в секунду по repeat отрезкам."""
+    return 1 / median(seconds_per_op(operation, min_time)
+                      for _ in range(repeat))
+
+
+def relative_cost(operation, min_time=0.05, repeat=21):
+    """
+    Стоимость операции в единицах калибровки и операции в секунду.
+    Отрезки операции и калибровки чередуются, берутся медианы.
+    """
+    ratios, times = [], []
+    for _ in range(repeat):
+        reference = seconds_per_op(calibration, min_time)
+        elapsed = seconds_per_op(operation, min_time)
+        ratios.append(elapsed / reference)
+        times.append(elapsed)
+    return median(ratios), 1 / median(times)
+
+
+def peak_bytes(operation, repeat=5):
+    samples = []
+    for _ in range(repeat):
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        operation()
+        samples.append(tracemalloc.get_traced_memory()[1] - before)
+        tracemalloc.stop()
+    return median(samples)
+
+
+def measure():
+    setup()
+    results = {}
+    for name, operation in stages().items():
+        operation()
+        cost, speed = relative_cost(operation)
+        results[name] = {'cost': round(cost, 4),
+                         'ops_per_sec': round(speed, 1),
+                         'peak_bytes': peak_bytes(operation)}
+    return results
+
+
+def allowed(baseline, name):
+    """Возвращает замер этапа с прибавленными допусками."""
+    base = dict(baseline['stages'][name])
+    for allowance in baseline.get('allowances', {}).get(name, {}).values():
+        base['cost'] += allowance.get('cost', 0)
+        base['peak_bytes'] += allowance.get('peak_bytes', 0)
+    return base
+
+
+def compare(results, baseline, threshold):
+    """Печатает сравнение и возвращает список регрессий."""
+    regressions = []
+    for name, result in results.items():
+        line = (f'{name:<15} {result["ops_per_sec"]:>12.1f} оп/с '
+                f'{result["cost"]:>9.3f} ед. {result["peak_bytes"]:>9} Б/оп')
+        if name in baseline.get('stages', {}):
+            base = allowed(baseline, name)
+            cost = result['cost'] / base['cost'] - 1
+            grown = result['peak_bytes'] - base['peak_bytes']
+            memory = grown / max(base['peak_bytes'], 1)
+            line += f'   стоимость {cost:+.1%}  память {grown:+} Б'
+            if cost > threshold or (
+                    memory > threshold and grown > MEMORY_FLOOR):
+                regressions.append(name)
+                line += '   РЕГРЕССИЯ'
+        print(line)
+    return regressions
+
+
+def load_baseline(baseline_path):
+    if not os.path.exists(baseline_path):
+        return {}
+    with open(baseline_path, encoding='UTF-8') as file:
+        return json.load(file)
+
+
+def run(update, threshold, baseline_path):
+    results = measure()
+    baseline = load_baseline(baseline_path)
+    if update:
+        baseline['stages'] = {
+            name: {'cost': result['cost'], 'peak_bytes': result['peak_bytes']}
+            for name, result in results.items()}
+        with open(baseline_path, 'w', encoding='UTF-8') as file:
+            json.dump(baseline, file, indent=2, sort_keys=True,
+                      ensure_ascii=False)
+            file.write('\n')
+        compare(results, {}, threshold)
+        print(f'baseline записан в {baseline_path}')
+        return 0
+    regressions = compare(results, baseline, threshold)
+    if regressions:
+        print(f'Регрессия этапов: {", ".join(regressions)}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--update', action='store_true')
+    parser.add_argument('--threshold', type=float, default=0.3)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    args = parser.parse_args()
+    sys.exit(run(args.update, args.threshold, args.baseline))
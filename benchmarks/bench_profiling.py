@@ -0,0 +1,62 @@
+"""
+Цена профилирования по запросу для этапов конвейера.
+
+Запуск: python benchmarks/bench_profiling.py --interval 0.01
+Этапы из bench_pipeline (без сети) измеряются в операциях в секунду:
+без профилирования, во время сеанса Profiler только с сэмплером
+стеков раз в --interval секунд (cpu), с сэмплером и tracemalloc
+(cpu+memory) и под SlowCycleWatch, когда итерация уже превысила
+порог и сэмплер работает. Отчёт: оп/с и изменение относительно
+прогона без профилирования.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_pipeline import ops_per_sec, setup, stages  # noqa: E402
+from profiling import Profiler, SlowCycleWatch  # noqa: E402
+
+
+def measure(operations, repeat):
+    return {name: ops_per_sec(operation, repeat=repeat)
+            for name, operation in operations.items()}
+
+
+def run(interval, repeat):
+    setup()
+    operations = stages()
+    del operations['main_iteration']
+    results = {'выкл': measure(operations, repeat)}
+    with tempfile.TemporaryDirectory() as directory:
+        profiler = Profiler(directory, interval)
+        for mode, memory in (('cpu', False), ('cpu+memory', True)):
+            profiler.start(3600, reason='bench', memory=memory)
+            results[mode] = measure(operations, repeat)
+            profiler.stop()
+            profiler.wait()
+        watch = SlowCycleWatch(1e-6, directory, interval, min_interval=0)
+        cycle = watch.begin('bench')
+        results['SlowCycleWatch'] = measure(operations, repeat)
+        watch.end(cycle)
+        watch.flush()
+    print(f'{"этап":<15}' + ''.join(f'{mode:>20}' for mode in results))
+    for name in operations:
+        base = results['выкл'][name]
+        line = f'{name:<15}'
+        for mode in results:
+            value = results[mode][name]
+            line += f'{value:>10.0f} ({value / base - 1:+6.1%})'
+        print(line)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--interval', type=float, default=0.01)
+    parser.add_argument('--repeat', type=int, default=7)
+    args = parser.parse_args()
+    run(args.interval, args.repeat)
@@ -0,0 +1,80 @@
+"""
+Симуляция: запросы к API на одно обнаруженное изменение статуса.
+
+Запуск: python benchmarks/bench_scheduler.py --tenants 2000 --days 14
+Сравнивает фиксированный RETRY_TIME с PollScheduler на синтетических
+жизненных циклах работ: сдача → reviewing → approved/rejected.
+Выводит число запросов, запросов на изменение и среднюю задержку
+обнаружения изменения.
+"""
+import argparse
+import bisect
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import PollScheduler  # noqa: E402
+
+DAY = 24 * 3600
+
+
+def make_timeline(rng, days):
+    """Возвращает отсортированные (момент, статус) одной работы за период."""
+    events = []
+    moment = rng.uniform(0, 2 * DAY)
+    while moment < days * DAY:
+        moment += rng.uniform(0.5, 36) * 3600
+        events.append((moment, 'reviewing'))
+        moment += rng.uniform(0.2, 24) * 3600
+        verdict = 'approved' if rng.random() < 0.6 else 'rejected'
+        events.append((moment, verdict))
+        if verdict == 'approved':
+            moment += rng.uniform(1, 5) * DAY
+    return events
+
+
+def simulate(timelines, days, next_interval):
+    calls = detected = lag = 0
+    for events in timelines:
+        moments = [moment for moment, _ in events]
+        now, seen, last_change = 0.0, 0, None
+        while now < days * DAY:
+            calls += 1
+            position = bisect.bisect_right(moments, now)
+            for moment, _ in events[seen:position]:
+                detected += 1
+                lag += now - moment
+            if position > seen:
+                last_change = now
+            seen = position
+            status = events[position - 1][1] if position else None
+            since_change = None if last_change is None else now - last_change
+            now += next_interval([status] if status else [], since_change)
+    return calls, detected, lag / max(detected, 1)
+
+
+def run(tenants, days, seed):
+    rng = random.Random(seed)
+    timelines = [make_timeline(rng, days) for _ in range(tenants)]
+    scheduler = PollScheduler(rng=rng.random)
+    strategies = {
+        'RETRY_TIME': lambda statuses, since: scheduler.retry_time,
+        'PollScheduler': lambda statuses, since: scheduler.interval(
+            statuses, since) * (1 + scheduler.jitter * (2 * rng.random() - 1)),
+    }
+    for name, next_interval in strategies.items():
+        calls, detected, lag = simulate(timelines, days, next_interval)
+        print(f'{name:<14} запросов {calls:>9}  изменений {detected:>7}  '
+              f'запросов/изменение {calls / max(detected, 1):7.1f}  '
+              f'задержка {lag / 60:6.1f} мин')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tenants', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=14)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    run(args.tenants, args.days, args.seed)
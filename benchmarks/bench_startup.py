@@ -0,0 +1,98 @@
+"""
+Время холодного старта: импорт модулей и время до первого опроса.
+
+Запуск:
+    python benchmarks/bench_startup.py --runs 7 --budget 200 \
+        --import-budget 100
+
+Каждый замер выполняется в новом интерпретаторе. Стоимость импорта
+homework и engine берётся из вывода python -X importtime, время до
+первого опроса — от запуска интерпретатора до ответа локальной
+заглушки API Практикума на первый get_api_answer. Бюджет --budget
+в миллисекундах сравнивается с временем до первого опроса за вычетом
+запуска пустого интерпретатора, --import-budget — со временем
+импорта homework: при превышении скрипт завершается с кодом 1.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.stub_server import start_stub_server  # noqa: E402
+
+FIRST_POLL = """
+import homework
+homework.ENDPOINT = {url!r}
+homework.PRACTICUM_TOKEN = 'bench'
+homework.get_api_answer(0)
+"""
+
+
+def import_cost(module):
+    """Возвращает суммарное время импорта модуля в миллисекундах."""
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True, check=True).stderr
+    for line in reversed(output.splitlines()):
+        _, cumulative, name = line.split('|')
+        if name.strip() == module:
+            return int(cumulative) / 1000
+    raise RuntimeError(f'{module} не найден в выводе -X importtime')
+
+
+def time_to_first_poll(url):
+    """Возвращает время от запуска интерпретатора до первого ответа API."""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', FIRST_POLL.format(url=url)],
+                   cwd=ROOT, check=True)
+    return (time.perf_counter() - started) * 1000
+
+
+def interpreter_start():
+    """Возвращает время запуска пустого интерпретатора."""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'], check=True)
+    return (time.perf_counter() - started) * 1000
+
+
+def median(measure, runs):
+    return statistics.median(measure() for _ in range(runs))
+
+
+def run(runs, budget, import_budget):
+    server, url = start_stub_server()
+    failed = False
+    try:
+        baseline = median(interpreter_start, runs)
+        for module in ('homework', 'engine'):
+            cost = median(lambda: import_cost(module), runs)
+            print(f'импорт {module:<10} {cost:8.1f} мс')
+            if module == 'homework' and cost > import_budget:
+                print(f'Импорт homework дольше {import_budget:.0f} мс')
+                failed = True
+        first_poll = median(lambda: time_to_first_poll(url), runs)
+    finally:
+        server.shutdown()
+    overhead = first_poll - baseline
+    print(f'пустой интерпретатор {baseline:8.1f} мс')
+    print(f'до первого опроса    {first_poll:8.1f} мс, '
+          f'сверх интерпретатора {overhead:.1f} мс (бюджет {budget:.0f} мс)')
+    if overhead > budget:
+        print('Время до первого опроса превышает бюджет')
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--budget', type=float, default=200)
+    parser.add_argument('--import-budget', type=float, default=100)
+    args = parser.parse_args()
+    sys.exit(run(args.runs, args.budget, args.import_budget))
@@ -0,0 +1,83 @@
+"""
+Пиковая память разбора ответа API: json.loads против HomeworkStream.
+
+Запуск: python benchmarks/bench_streaming.py --items 10000
+Тело ответа генерируется фрагментами, как при чтении из сокета.
+Для json.loads тело собирается целиком, как это делает
+requests.Response.json(). Память меряется через tracemalloc.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import homework  # noqa: E402
+from streaming import HomeworkStream  # noqa: E402
+
+CHUNK_SIZE = homework.STREAM_CHUNK_SIZE
+
+
+def make_homework(number):
+    return {
+        'id': number,
+        'status': ('approved', 'rejected', 'reviewing')[number % 3],
+        'homework_name': f'student__hw{number:05d}.zip',
+        'reviewer_comment': 'Всё нравится, но есть пара замечаний. ' * 3,
+        'date_updated': '2022-10-26T18:07:39Z',
+        'lesson_name': f'Урок {number}',
+    }
+
+
+def body_chunks(items):
+    """Отдаёт тело ответа фрагментами по CHUNK_SIZE байт."""
+    pending = b'{"homeworks": ['
+    for number in range(items):
+        if number:
+            pending += b','
+        pending += json.dumps(make_homework(number)).encode()
+        while len(pending) >= CHUNK_SIZE:
+            yield pending[:CHUNK_SIZE]
+            pending = pending[CHUNK_SIZE:]
+    yield pending + f'], "current_date": {int(time.time())}}}'.encode()
+
+
+def full_json(items):
+    response = json.loads(b''.join(body_chunks(items)))
+    return sum(1 for homework_item in homework.check_response(response)
+               if homework.parse_status(homework_item))
+
+
+def streamed(items):
+    return sum(1 for homework_item in HomeworkStream(body_chunks(items))
+               if homework.parse_status(homework_item))
+
+
+def measure(func, items):
+    tracemalloc.start()
+    started = time.perf_counter()
+    count = func(items)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert count == items
+    return peak, elapsed
+
+
+def run(sizes):
+    for items in sizes:
+        for name, func in (('json.loads', full_json),
+                           ('HomeworkStream', streamed)):
+            peak, elapsed = measure(func, items)
+            print(f'{name:<15} работ {items:>6}  пик памяти '
+                  f'{peak / 1024:9.1f} КБ  время {elapsed * 1000:8.1f} мс')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, nargs='+',
+                        default=[100, 1000, 10000])
+    run(parser.parse_args().items)
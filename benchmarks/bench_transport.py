@@ -0,0 +1,57 @@
+"""
+Задержка запросов до и после перехода на пул keep-alive соединений.
+
+Запуск: python benchmarks/bench_transport.py --requests 500
+Сравнивает requests.get (новое соединение на каждый запрос) с
+transport.Transport против локальной заглушки API Практикума.
+Заглушка работает по HTTP, поэтому экономия на TLS в цифры не входит.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_server import start_stub_server  # noqa: E402
+from transport import Transport  # noqa: E402
+
+HEADERS = {'Authorization': 'OAuth bench'}
+
+
+def measure(get, url, count):
+    samples = []
+    for from_date in range(count):
+        started = time.perf_counter()
+        response = get(url, headers=HEADERS, params={'from_date': from_date})
+        response.json()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f'{name:<18} среднее {statistics.mean(samples):7.3f} мс  '
+          f'p50 {statistics.median(samples):7.3f} мс  p95 {p95:7.3f} мс')
+
+
+def run(count):
+    server, url = start_stub_server()
+    try:
+        report('requests.get', measure(requests.get, url, count))
+        pooled = Transport()
+        pooled.prewarm(url)
+        report('Transport.get', measure(pooled.get, url, count))
+        pooled.close()
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=300)
+    run(parser.parse_args().requests)
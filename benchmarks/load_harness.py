@@ -0,0 +1,245 @@
+"""
+Нагрузочный и длительный прогон движка на локальных заглушках.
+
+Запуск:
+    python benchmarks/load_harness.py --tenants 500 --duration 60 \
+        --api-error-rate 0.01 --api-429-rate 0.01 --tg-429-rate 0.01
+
+Движок работает как в продакшене: настоящие сокеты, пул соединений,
+throttle, outbox и SendQueue. API Практикума и Telegram Bot API
+заменены заглушками из stub_server с задержкой и долей ответов 500
+и 429. У каждого из N синтетических арендаторов своя работа на
+каждый шаг сценария: через случайное время она уходит на проверку
+(reviewing), а через --review-time — принимается или отклоняется.
+Отчёт: опросы в секунду, перцентили задержки уведомления (от
+смены статуса в заглушке API до получения сообщения заглушкой
+Telegram) и RSS процесса по ходу прогона.
+"""
+import argparse
+import asyncio
+from collections import Counter
+from datetime import datetime, timezone
+import logging
+import os
+import random
+import re
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_server import (start_stub_server,  # noqa: E402
+                                    start_telegram_stub)
+import homework  # noqa: E402
+from engine import PollingEngine, Tenant  # noqa: E402
+from scheduler import PollScheduler  # noqa: E402
+from send_queue import SendQueue  # noqa: E402
+from storage import CheckpointStore  # noqa: E402
+import telegram  # noqa: E402
+from telegram.utils.request import Request  # noqa: E402
+from throttle import RequestThrottle  # noqa: E402
+
+BOT_TOKEN = '1234:abcdefg'
+NAME = re.compile(r'работы "(?P<token>[^/"]+)/(?P<step>\d+)"\.(?P<verdict>.*)')
+STATUS_BY_VERDICT = {
+    verdict: status for status, verdict in homework.VERDICTS.items()}
+
+
+class Script:
+    """
+    Сценарий смены статусов для заглушки API Практикума.
+    events[token] — отсортированные (момент, шаг, статус).
+    """
+
+    def __init__(self, tokens, steps, step_interval, review_time, started):
+        self.events = {}
+        for token in tokens:
+            events = []
+            moment = started + random.random() * step_interval
+            for step in range(steps):
+                verdict = random.choice(('approved', 'rejected'))
+                events.append((moment, step, 'reviewing'))
+                events.append((moment + review_time, step, verdict))
+                moment += step_interval
+            self.events[token] = sorted(events)
+        self.moments = {
+            (token, step, status): moment
+            for token, events in self.events.items()
+            for moment, step, status in events}
+
+    def homeworks(self, token, from_date, now):
+        """Возвращает работы токена, изменившиеся с from_date."""
+        current = {}
+        for moment, step, status in self.events.get(token, ()):
+            if moment > now:
+                break
+            current[step] = (moment, status)
+        return [
+            {'id': step, 'homework_name': f'{token}/{step}',
+             'status': status,
+             'date_updated': datetime.fromtimestamp(
+                 moment, timezone.utc).isoformat()}
+            for step, (moment, status) in current.items()
+            if int(moment) >= from_date]
+
+    def occurred(self, until):
+        """Число смен статуса, случившихся до момента until."""
+        return sum(1 for moment in self.moments.values() if moment <= until)
+
+
+def rss_mb():
+    """Текущий RSS процесса в мегабайтах."""
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values, share):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+def latencies(script, sent):
+    """
+    Возвращает задержки первых уведомлений о смене статуса в секундах
+    и число повторных уведомлений (доставка at-least-once).
+    """
+    result = []
+    seen = Counter()
+    for chat_id, text, received in sorted(sent, key=lambda item: item[2]):
+        match = NAME.search(text)
+        if match is None:
+            continue
+        event = (match['token'], int(match['step']),
+                 STATUS_BY_VERDICT.get(match['verdict']))
+        seen[chat_id, event] += 1
+        moment = script.moments.get(event)
+        if moment is not None and seen[chat_id, event] == 1:
+            result.append(received - moment)
+    return result, sum(count - 1 for count in seen.values())
+
+
+def build(args, bot, directory):
+    tenants = [Tenant(f'practicum{number}', str(number + 1), 0)
+               for number in range(args.tenants)]
+    polls = {'count': 0}
+
+    def fetch(token, from_date):
+        polls['count'] += 1
+        return homework.request_homework_statuses(token, from_date)
+
+    store = CheckpointStore(os.path.join(directory, 'state.sqlite3'))
+    engine = PollingEngine(
+        bot, tenants, retry_time=args.interval, fetch=fetch,
+        max_in_flight=args.max_in_flight, store=store,
+        send_queue=SendQueue(bot, workers=args.senders,
+                             global_rate=10 ** 6, per_chat_rate=10 ** 6,
+                             on_sent=store.ack),
+        scheduler=PollScheduler(
+            retry_time=args.interval, reviewing_interval=args.interval,
+            idle_interval=args.interval, max_backoff=args.interval * 4),
+        throttle=RequestThrottle(
+            os.path.join(directory, 'throttle.sqlite3'),
+            token_limit=10 ** 6, ip_limit=10 ** 6, default_penalty=1))
+    return engine, polls
+
+
+async def soak(engine, polls, args):
+    samples = []
+    runner = asyncio.ensure_future(engine.run())
+    started = time.monotonic()
+    previous = 0
+    try:
+        while time.monotonic() - started < args.duration:
+            await asyncio.sleep(args.sample)
+            count = polls['count']
+            samples.append((time.monotonic() - started, rss_mb(),
+                            (count - previous) / args.sample))
+            previous = count
+    finally:
+        runner.cancel()
+        await asyncio.gather(runner, return_exceptions=True)
+        await engine.send_queue.stop()
+    return samples
+
+
+def report(args, script, api, telegram_stub, polls, samples, elapsed):
+    """Печатает отчёт прогона и возвращает его основные цифры."""
+    delays, duplicates = latencies(script, telegram_stub.sent)
+    occurred = script.occurred(time.time() - args.interval * 2)
+    print(f'арендаторов: {args.tenants}, прогон {elapsed:.0f} с')
+    print(f'опросов: {polls["count"]}, '
+          f'{polls["count"] / elapsed:.1f} в секунду')
+    print(f'ответы API: {dict(api.statuses)}, '
+          f'ответы Telegram: {dict(telegram_stub.statuses)}')
+    print(f'уведомлений: {len(delays)}, повторных: {duplicates}, '
+          f'смен статуса (старше двух интервалов): {occurred}')
+    print('задержка уведомления, с: ' + ', '.join(
+        f'p{int(share * 100)} {percentile(delays, share):.2f}'
+        for share in (0.5, 0.9, 0.99)) + f', max {max(delays or [0]):.2f}')
+    print(f'{"время, с":>9} {"RSS, МБ":>9} {"опросов/с":>10}')
+    for moment, rss, rate in samples:
+        print(f'{moment:>9.0f} {rss:>9.1f} {rate:>10.1f}')
+    return {'polls': polls['count'], 'delays': delays,
+            'duplicates': duplicates, 'occurred': occurred,
+            'samples': samples}
+
+
+def run(args):
+    started = time.time()
+    tokens = [f'practicum{number}' for number in range(args.tenants)]
+    script = Script(tokens, args.steps, args.step_interval,
+                    args.review_time, started)
+    api, url = start_stub_server(
+        args.api_latency, error_rate=args.api_error_rate,
+        rate_limit_rate=args.api_429_rate, script=script)
+    telegram_stub, base_url = start_telegram_stub(
+        args.tg_latency, error_rate=args.tg_error_rate,
+        rate_limit_rate=args.tg_429_rate)
+    homework.ENDPOINT = url
+    bot = telegram.Bot(BOT_TOKEN, base_url=base_url,
+                       request=Request(con_pool_size=args.senders + 4))
+    with tempfile.TemporaryDirectory() as directory:
+        engine, polls = build(args, bot, directory)
+        samples = asyncio.run(soak(engine, polls, args))
+        engine.close()
+        engine.store.close()
+        engine.throttle.close()
+    elapsed = time.time() - started
+    api.shutdown()
+    telegram_stub.shutdown()
+    return report(args, script, api, telegram_stub, polls, samples, elapsed)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--tenants', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--sample', type=float, default=5)
+    parser.add_argument('--interval', type=float, default=2,
+                        help='интервал опроса арендатора, с')
+    parser.add_argument('--steps', type=int, default=3)
+    parser.add_argument('--step-interval', type=float, default=10)
+    parser.add_argument('--review-time', type=float, default=3)
+    parser.add_argument('--max-in-flight', type=int, default=32)
+    parser.add_argument('--senders', type=int, default=16)
+    parser.add_argument('--api-latency', type=float, default=0.02)
+    parser.add_argument('--api-error-rate', type=float, default=0.0)
+    parser.add_argument('--api-429-rate', type=float, default=0.0)
+    parser.add_argument('--tg-latency', type=float, default=0.01)
+    parser.add_argument('--tg-error-rate', type=float, default=0.0)
+    parser.add_argument('--tg-429-rate', type=float, default=0.0)
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    logging.disable(logging.ERROR)
+    run(parse_args())
@@ -0,0 +1,93 @@
+"""
+Прогон конвейера бота по записанной кассете без сети.
+
+Запись трафика:
+    CASSETTE_MODE=record CASSETTE_PATH=traffic.bin python homework.py
+Воспроизведение:
+    python benchmarks/replay_cassette.py traffic.bin --speed 0 --profile
+
+Ответы API из кассеты проходят тот же путь, что в homework.main():
+check_response → HomeworkIndex.diff → parse_status → send_message.
+Задержки API и Telegram воспроизводятся с ускорением --speed
+(1 — записанная скорость, 0 — без задержек), чтобы профилировать
+конвейер на настоящей форме трафика. Отчёт: число записей, время
+по этапам и, с --profile, самые дорогие функции по cProfile.
+"""
+import argparse
+from collections import Counter
+import cProfile
+import os
+import pstats
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cassette import API, CassettePlayer  # noqa: E402
+import homework  # noqa: E402
+from homework_index import HomeworkIndex  # noqa: E402
+
+
+def replay(player):
+    """Прогоняет записи API кассеты через конвейер, возвращает время."""
+    stages = Counter()
+    errors = Counter()
+    indexes = {}
+    requests = [payload for kind, _, _, payload in player.records()
+                if kind == API]
+    for payload in requests:
+        token = payload['token']
+        index = indexes.setdefault(token, HomeworkIndex())
+        started = time.perf_counter()
+        try:
+            response = player.request(token, payload['from_date'])
+            stages['get_api_answer'] += time.perf_counter() - started
+            started = time.perf_counter()
+            homeworks = homework.check_response(response)
+            stages['check_response'] += time.perf_counter() - started
+            started = time.perf_counter()
+            _, messages = homework.collect_changes(
+                token, (token,), index, index.diff(homeworks))
+            stages['parse_status'] += time.perf_counter() - started
+            for _, chat_id, text in messages:
+                started = time.perf_counter()
+                player.send(None, chat_id, text)
+                stages['send_message'] += time.perf_counter() - started
+        except Exception as error:
+            errors[type(error).__name__] += 1
+    return len(requests), stages, errors
+
+
+def run(path, speed, profile):
+    homework.logger.disabled = True
+    player = CassettePlayer(path, speed)
+    profiler = cProfile.Profile() if profile else None
+    started = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        count, stages, errors = replay(player)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        player.close()
+    elapsed = time.perf_counter() - started
+    print(f'запросов API: {count}, прогон {elapsed:.3f} с, '
+          f'{count / max(elapsed, 1e-9):.0f} запросов/с')
+    for stage, seconds in stages.items():
+        print(f'{stage:<15} {seconds:>9.3f} с')
+    if errors:
+        print(f'ошибки: {dict(errors)}')
+    if profiler is not None:
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
+    return count, stages, errors
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('path')
+    parser.add_argument('--speed', type=float, default=0)
+    parser.add_argument('--profile', action='store_true')
+    args = parser.parse_args()
+    run(args.path, args.speed, args.profile)
@@ -0,0 +1,192 @@
+"""Локальные заглушки API Практикума и Telegram Bot API для бенчмарков."""
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+ENDPOINT_PATH = '/api/user_api/homework_statuses/'
+
+
+class PracticumStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    wbufsize = 1 << 16
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != ENDPOINT_PATH:
+            self._reply(404, {'message': 'not found'})
+            return
+        authorization = self.headers.get('Authorization', '')
+        if not authorization.startswith('OAuth '):
+            self._reply(401, {'message': 'unauthorized'})
+            return
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        failure = _failure(self.server)
+        if failure == 429:
+            self._reply(429, {'message': 'too many requests'},
+                        {'Retry-After': str(self.server.retry_after)})
+            return
+        if failure:
+            self._reply(failure, {'message': 'internal error'})
+            return
+        from_date = int(parse_qs(url.query).get('from_date', ['0'])[0])
+        now = time.time()
+        homeworks = self.server.homeworks
+        if self.server.script is not None:
+            homeworks = self.server.script.homeworks(
+                authorization[len('OAuth '):], from_date, now)
+        self._reply(200, {'homeworks': homeworks,
+                          'current_date': max(from_date, int(now))})
+
+    def _reply(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.server.statuses[status] += 1
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _failure(server):
+    """Разыгрывает ответ 429 или 500 с заданными вероятностями."""
+    roll = random.random()
+    if roll < server.rate_limit_rate:
+        return 429
+    if roll < server.rate_limit_rate + server.error_rate:
+        return 500
+    return None
+
+
+def _configure(server, latency, error_rate, rate_limit_rate, retry_after):
+    server.daemon_threads = True
+    server.latency = latency
+    server.error_rate = error_rate
+    server.rate_limit_rate = rate_limit_rate
+    server.retry_after = retry_after
+    server.statuses = Counter()
+
+
+def start_stub_server(latency=0.0, homeworks=None, host='127.0.0.1',
+                      error_rate=0.0, rate_limit_rate=0.0, retry_after=1,
+                      script=None):
+    """
+    Запускает заглушку в фоновом потоке и возвращает (server, url).
+    error_rate и rate_limit_rate — доли ответов 500 и 429 (с заголовком
+    Retry-After: retry_after). script — объект с методом
+    homeworks(token, from_date, now), подменяющий статичный homeworks.
+    Коды ответов считаются в server.statuses.
+    """
+    server = ThreadingHTTPServer((host, 0), PracticumStubHandler)
+    _configure(server, latency, error_rate, rate_limit_rate, retry_after)
+    server.homeworks = homeworks or []
+    server.script = script
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_port}{ENDPOINT_PATH}'
+
+
+class TelegramStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        if self.path.endswith('/getUpdates'):
+            self._reply({'ok': True, 'result': _wait_updates(
+                self.server, int(payload.get('offset') or 0),
+                float(payload.get('timeout') or 0))})
+            return
+        if not self.path.endswith('/sendMessage'):
+            self._reply({'ok': False, 'error_code': 404,
+                         'description': 'Not Found'})
+            return
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        failure = _failure(self.server)
+        if failure == 429:
+            self._reply({'ok': False, 'error_code': 429,
+                         'description': 'Too Many Requests',
+                         'parameters': {
+                             'retry_after': self.server.retry_after}}, 429)
+            return
+        if failure:
+            self._reply({'ok': False, 'error_code': failure,
+                         'description': 'Internal Server Error'}, failure)
+            return
+        chat_id = payload.get('chat_id')
+        with self.server.lock:
+            self.server.sent.append(
+                (str(chat_id), payload.get('text'), time.time()))
+            message_id = len(self.server.sent)
+        self._reply({'ok': True, 'result': {
+            'message_id': message_id, 'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'},
+            'text': payload.get('text')}})
+
+    def _reply(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.server.statuses[status] += 1
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _wait_updates(server, offset, timeout):
+    """Long polling: ждёт обновления с update_id >= offset."""
+    deadline = time.monotonic() + timeout
+    with server.lock:
+        while True:
+            updates = [update for update in server.updates
+                       if update['update_id'] >= offset]
+            remaining = deadline - time.monotonic()
+            if updates or remaining <= 0:
+                return updates
+            server.updated.wait(remaining)
+
+
+def push_command(server, chat_id, text):
+    """Добавляет в заглушку Telegram входящее сообщение из чата."""
+    with server.lock:
+        update_id = len(server.updates) + 1
+        server.updates.append({'update_id': update_id, 'message': {
+            'message_id': update_id, 'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'},
+            'text': text}})
+        server.updated.notify_all()
+    return time.time()
+
+
+def start_telegram_stub(latency=0.0, host='127.0.0.1', error_rate=0.0,
+                        rate_limit_rate=0.0, retry_after=1):
+    """
+    Запускает заглушку Telegram Bot API и возвращает (server, base_url).
+    base_url передаётся в telegram.Bot; доставленные сообщения
+    копятся в server.sent как (chat_id, text, время получения), а
+    getUpdates отдаёт сообщения, добавленные push_command.
+    error_rate и rate_limit_rate — доли ответов 500 и 429 с
+    retry_after, как у flood control Telegram.
+    """
+    server = ThreadingHTTPServer((host, 0), TelegramStubHandler)
+    _configure(server, latency, error_rate, rate_limit_rate, retry_after)
+    server.sent = []
+    server.updates = []
+    server.lock = threading.Lock()
+    server.updated = threading.Condition(server.lock)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_port}/bot'
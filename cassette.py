@@ -0,0 +1,263 @@
+import atexit
+from collections import deque
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+from exceptions import (CurrentTimeError, HTTPError, RateLimitError,
+                        RequestAPIError, SendMessageError)
+import homework
+from streaming import HomeworkStream
+
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_MODE = os.getenv('CASSETTE_MODE', '')
+CASSETTE_PATH = os.getenv('CASSETTE_PATH', 'cassette.bin')
+CASSETTE_SPEED = float(os.getenv('CASSETTE_SPEED', 1))
+
+MAGIC = b'HWCAS1\n\x00'
+HEADER = struct.Struct('<BIddI')
+API, SEND = 0, 1
+ERRORS = {error.__name__: error for error in (
+    RequestAPIError, HTTPError, RateLimitError, CurrentTimeError,
+    SendMessageError)}
+
+
+def _error_payload(error):
+    return {'type': type(error).__name__, 'message': str(error),
+            'status_code': getattr(error, 'status_code', None),
+            'retry_after': getattr(error, 'retry_after', None)}
+
+
+def _rebuild_error(payload, default):
+    error = ERRORS.get(payload['type'], default)
+    if issubclass(error, RateLimitError):
+        return error(payload['message'], payload['status_code'],
+                     payload['retry_after'])
+    if issubclass(error, HTTPError):
+        return error(payload['message'], payload['status_code'])
+    return error(payload['message'])
+
+
+class CassetteRecorder:
+    """
+    Записывает обмен с API Практикума и Telegram в файл кассеты.
+    Файл — заголовок MAGIC и записи подряд: HEADER (вид записи, номер
+    токена, смещение от начала записи и длительность вызова в секундах,
+    длина тела) и компактный JSON тела. Токены заменяются псевдонимами
+    token-N в порядке первого появления, абсолютное время вызовов не
+    сохраняется. Обёртки потокобезопасны и пишут и ответы, и ошибки.
+    """
+
+    def __init__(self, path, clock=time.monotonic):
+        self.path = path
+        self.clock = clock
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC)
+        self._lock = threading.Lock()
+        self._aliases = {}
+        self._started = clock()
+
+    def alias(self, token):
+        """Возвращает стабильный номер токена, начиная с 1."""
+        with self._lock:
+            return self._aliases.setdefault(token, len(self._aliases) + 1)
+
+    def _write(self, kind, started, payload):
+        duration = self.clock() - started
+        number = payload.pop('token', 0)
+        if number:
+            payload = dict(payload, token=f'token-{number}')
+        body = json.dumps(payload, ensure_ascii=False,
+                          separators=(',', ':')).encode()
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(HEADER.pack(
+                kind, number, started - self._started, duration, len(body)))
+            self._file.write(body)
+
+    def _call(self, kind, payload, func, *args):
+        started = self.clock()
+        try:
+            result = func(*args)
+        except Exception as error:
+            self._write(kind, started, dict(
+                payload, error=_error_payload(error)))
+            raise
+        return started, result
+
+    def record_api(self, func):
+        """Оборачивает request_homework_statuses(token, from_date)."""
+        def request(token, from_date):
+            payload = {'token': self.alias(token), 'from_date': from_date}
+            started, response = self._call(
+                API, payload, func, token, from_date)
+            self._write(API, started, dict(payload, response=response))
+            return response
+        return request
+
+    def record_stream(self, func):
+        """
+        Оборачивает stream_homework_statuses(token, from_date).
+        Поток читается целиком, чтобы записать ответ, и отдаётся
+        дальше новым HomeworkStream.
+        """
+        def stream(token, from_date):
+            payload = {'token': self.alias(token), 'from_date': from_date}
+
+            def read():
+                response = func(token, from_date)
+                homeworks = list(response)
+                return {'homeworks': homeworks,
+                        'current_date': response.current_date}
+
+            started, response = self._call(API, payload, read)
+            self._write(API, started, dict(payload, response=response))
+            return HomeworkStream([json.dumps(response).encode()])
+        return stream
+
+    def record_send(self, func):
+        """Оборачивает send_message_to_chat(bot, chat_id, message)."""
+        def send(bot, chat_id, message):
+            payload = {'chat_id': str(chat_id), 'text': message}
+            started, result = self._call(
+                SEND, payload, func, bot, chat_id, message)
+            self._write(SEND, started, payload)
+            return result
+        return send
+
+    def close(self):
+        """Дописывает буфер и закрывает файл кассеты."""
+        with self._lock:
+            self._file.close()
+
+
+class CassettePlayer:
+    """
+    Воспроизводит кассету вместо сети.
+    Файл отображается в память (mmap): при открытии строится только
+    индекс смещений записей, а тело записи разбирается при выдаче.
+    Ответы API выдаются по порядку записи для каждого токена, токены
+    воспроизведения сопоставляются псевдонимам в порядке первого
+    появления; отправки в Telegram потребляют записи SEND по порядку.
+    Каждый вызов длится записанное время, делённое на speed:
+    speed=1 — записанная скорость, 10 — в десять раз быстрее,
+    0 — без задержек. Записанные ошибки выбрасываются снова.
+    """
+
+    def __init__(self, path, speed=1.0, sleep=time.sleep):
+        self.path = path
+        self.speed = speed
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError(f'{path} не является файлом кассеты')
+        self._queues = {}
+        self._aliases = {}
+        for kind, number, offset, _, _ in self._scan():
+            self._queues.setdefault((kind, number), deque()).append(offset)
+
+    def _scan(self):
+        position = len(MAGIC)
+        while position + HEADER.size <= len(self._map):
+            kind, number, moment, duration, length = HEADER.unpack_from(
+                self._map, position)
+            yield kind, number, position, moment, duration
+            position += HEADER.size + length
+
+    def _payload(self, offset):
+        length = HEADER.unpack_from(self._map, offset)[4]
+        start = offset + HEADER.size
+        return json.loads(self._map[start:start + length])
+
+    def records(self):
+        """
+        Отдаёт записи по порядку.
+        Каждая запись — (вид, смещение, длительность, тело).
+        """
+        for kind, _, offset, moment, duration in self._scan():
+            yield kind, moment, duration, self._payload(offset)
+
+    def _next(self, key):
+        with self._lock:
+            queue = self._queues.get(key)
+            if not queue:
+                return None
+            offset = queue.popleft()
+        duration = HEADER.unpack_from(self._map, offset)[3]
+        if self.speed > 0:
+            self.sleep(duration / self.speed)
+        return self._payload(offset)
+
+    def _alias(self, token):
+        with self._lock:
+            return self._aliases.setdefault(token, len(self._aliases) + 1)
+
+    def request(self, token, from_date):
+        """Заменяет request_homework_statuses."""
+        payload = self._next((API, self._alias(token)))
+        if payload is None:
+            raise RequestAPIError('Записи кассеты для токена закончились')
+        if 'error' in payload:
+            raise _rebuild_error(payload['error'], RequestAPIError)
+        return payload['response']
+
+    def stream(self, token, from_date):
+        """Заменяет stream_homework_statuses."""
+        response = self.request(token, from_date)
+        return HomeworkStream([json.dumps(response).encode()])
+
+    def send(self, bot, chat_id, message):
+        """Заменяет send_message_to_chat."""
+        payload = self._next((SEND, 0))
+        if payload is not None and 'error' in payload:
+            raise _rebuild_error(payload['error'], SendMessageError)
+
+    def close(self):
+        """Закрывает отображение файла кассеты."""
+        self._map.close()
+
+
+def install(mode=CASSETTE_MODE, path=CASSETTE_PATH, speed=CASSETTE_SPEED,
+            suffix=None):
+    """
+    Подключает запись или воспроизведение кассеты к модулю homework.
+    mode — record, replay или пустая строка (кассета не используется).
+    Подменяются request_homework_statuses, stream_homework_statuses и
+    send_message_to_chat, поэтому вызывать install нужно до сборки
+    бота или движка. suffix добавляется к имени файла, чтобы воркеры
+    супервизора писали каждый в свою кассету.
+    Возвращает CassetteRecorder, CassettePlayer или None.
+    """
+    if not mode:
+        return None
+    if suffix is not None:
+        base, extension = os.path.splitext(path)
+        path = f'{base}.{suffix}{extension}'
+    if mode == 'record':
+        cassette = CassetteRecorder(path)
+        homework.request_homework_statuses = cassette.record_api(
+            homework.request_homework_statuses)
+        homework.stream_homework_statuses = cassette.record_stream(
+            homework.stream_homework_statuses)
+        homework.send_message_to_chat = cassette.record_send(
+            homework.send_message_to_chat)
+        atexit.register(cassette.close)
+    elif mode == 'replay':
+        cassette = CassettePlayer(path, speed)
+        homework.request_homework_statuses = cassette.request
+        homework.stream_homework_statuses = cassette.stream
+        homework.send_message_to_chat = cassette.send
+    else:
+        raise ValueError(f'Неизвестный режим кассеты: {mode}')
+    logger.info(f'Кассета {path}: режим {mode}')
+    return cassette
@@ -0,0 +1,109 @@
+from collections import OrderedDict
+import os
+import threading
+import time
+
+import metrics
+
+
+COALESCE_WINDOW = int(os.getenv('COALESCE_WINDOW', 60))
+COALESCE_TTL = float(os.getenv('COALESCE_TTL', 30))
+COALESCE_MAX_ENTRIES = int(os.getenv('COALESCE_MAX_ENTRIES', 4096))
+
+
+class _Flight:
+    """Запрос к API, результата которого ждут несколько вызовов."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RequestCoalescer:
+    """
+    Объединяет одинаковые запросы к API Практикума (singleflight).
+    Запросы с одним токеном и from_date из одного окна window секунд
+    имеют общий ключ и уходят к API как один запрос с from_date,
+    округлённым вниз до начала окна: ответ содержит все работы,
+    нужные каждому из вызовов, а лишние отсеивает HomeworkIndex.
+    Пока запрос выполняется, остальные вызовы с тем же ключом ждут
+    его результат или исключение; успешный ответ ещё ttl секунд
+    отдаётся из кэша на max_entries ключей с вытеснением LRU.
+    Так число запросов к API растёт с числом токенов, а не чатов.
+    """
+
+    def __init__(self, window=COALESCE_WINDOW, ttl=COALESCE_TTL,
+                 max_entries=COALESCE_MAX_ENTRIES, clock=time.monotonic):
+        self.window = window
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._flights = {}
+
+    def _bucket(self, from_date):
+        if not self.window:
+            return from_date
+        return from_date - from_date % self.window
+
+    def _cached(self, key):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires, result = entry
+        if self.clock() >= expires:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return entry
+
+    def _store(self, key, result):
+        if self.ttl <= 0:
+            return
+        self._cache[key] = (self.clock() + self.ttl, result)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def call(self, token, from_date, func):
+        """
+        Возвращает func(from_date окна), объединяя одинаковые вызовы.
+        func вызывается не больше одного раза на ключ (token, окно)
+        одновременно; ошибка передаётся всем ожидавшим её вызовам.
+        """
+        key = (token, self._bucket(from_date))
+        with self._lock:
+            entry = self._cached(key)
+            if entry is not None:
+                metrics.API_REQUESTS.inc('cached')
+                return entry[1]
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            metrics.API_REQUESTS.inc('shared')
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        metrics.API_REQUESTS.inc('upstream')
+        try:
+            flight.result = func(key[1])
+        except BaseException as error:
+            flight.error = error
+            raise
+        else:
+            with self._lock:
+                self._store(key, flight.result)
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result
+
+    def __len__(self):
+        """Число ответов в кэше, включая устаревшие."""
+        return len(self._cache)
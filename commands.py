@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import os
+import time
+
+from exceptions import SendMessageError
+import homework
+import metrics
+
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_COMMANDS = os.getenv('TELEGRAM_COMMANDS', '') == '1'
+COMMAND_POLL_TIMEOUT = int(os.getenv('TELEGRAM_COMMAND_POLL_TIMEOUT', 30))
+COMMAND_MAX_AGE = float(os.getenv('TELEGRAM_COMMAND_MAX_AGE', 2 * 3600))
+COMMAND_RETRY_DELAY = float(os.getenv('TELEGRAM_COMMAND_RETRY_DELAY', 5))
+HISTORY_LIMIT = int(os.getenv('TELEGRAM_HISTORY_LIMIT', 10))
+COMMANDS = ('status', 'history')
+
+
+def parse_command(text):
+    """Возвращает имя команды из '/status@bot' или None."""
+    if not text or not text.startswith('/'):
+        return None
+    return text.split()[0][1:].split('@')[0].lower()
+
+
+def _describe(record):
+    _, name, status, date_updated = record
+    text = f'"{name}": {homework.VERDICTS.get(status, status)}'
+    if date_updated:
+        text += f' (обновлено {date_updated})'
+    return text
+
+
+def format_reply(command, records, limit=HISTORY_LIMIT):
+    """
+    Готовит ответ на /status или /history.
+    records — HomeworkIndex.records(): от свежих работ к давним.
+    """
+    if not records:
+        return 'Пока нет данных о проверке работ.'
+    if command == 'status':
+        return f'Статус проверки работы {_describe(records[0])}'
+    lines = [f'— {_describe(record)}' for record in records[:limit]]
+    return '\n'.join([f'История проверки работ: {len(lines)}', *lines])
+
+
+class CommandPoller:
+    """
+    Получает команды бота long polling через Bot.get_updates.
+    Запрос ждёт новых сообщений до timeout секунд; подтверждённые
+    обновления (offset) повторно не приходят. Адрес Bot API задаётся
+    TELEGRAM_BASE_URL, поэтому Telegram можно заменить заглушкой.
+    """
+
+    def __init__(self, bot, timeout=COMMAND_POLL_TIMEOUT):
+        self.bot = bot
+        self.timeout = timeout
+        self.offset = None
+
+    def poll(self, timeout=None):
+        """Возвращает пары (chat_id, команда) из новых сообщений."""
+        updates = self.bot.get_updates(
+            offset=self.offset,
+            timeout=self.timeout if timeout is None else timeout,
+            allowed_updates=['message'])
+        commands = []
+        for update in updates:
+            self.offset = update.update_id + 1
+            message = update.effective_message
+            if message is None:
+                continue
+            command = parse_command(message.text)
+            if command in COMMANDS:
+                commands.append((str(message.chat_id), command))
+        return commands
+
+
+def serve_commands(bot, poller, recipients, index, seconds):
+    """
+    Отвечает на команды вместо паузы между опросами в homework.main().
+    Индекс обновляется каждым циклом опроса, поэтому ответы берутся
+    из него без запросов к API. Команды из чатов не из recipients
+    пропускаются. Без poller функция просто ждёт seconds секунд.
+    """
+    deadline = time.monotonic() + seconds
+    while poller is not None:
+        remaining = deadline - time.monotonic()
+        if remaining < 1:
+            break
+        try:
+            commands = poller.poll(int(min(remaining, poller.timeout)))
+        except Exception as error:
+            logger.error(f'Не удалось получить команды: {error}')
+            break
+        for chat_id, command in commands:
+            if chat_id not in recipients:
+                continue
+            metrics.COMMANDS.inc(command, 'cache')
+            try:
+                homework.send_message_to_chat(
+                    bot, chat_id, format_reply(command, index.records()))
+            except SendMessageError as error:
+                logger.error(f'Не удалось ответить на команду: {error}')
+    time.sleep(max(0, deadline - time.monotonic()))
+
+
+class CommandHandler:
+    """
+    Отвечает на /status и /history в движке из индексов арендаторов.
+    Арендаторы чата — те, у кого он среди recipients. Если последний
+    успешный опрос арендатора был больше max_age секунд назад (или
+    его ещё не было), статусы один раз запрашиваются у API через
+    PollingEngine.peek; иначе ответ собирается из памяти без сети.
+    Ответы уходят через SendQueue движка, как уведомления.
+    """
+
+    def __init__(self, engine, poller=None, max_age=COMMAND_MAX_AGE,
+                 history_limit=HISTORY_LIMIT, clock=time.monotonic):
+        self.engine = engine
+        self.poller = poller or CommandPoller(engine.bot)
+        self.max_age = max_age
+        self.history_limit = history_limit
+        self.clock = clock
+        self._tenants = None
+        self._chats = {}
+
+    def tenants_for(self, chat_id):
+        """Возвращает арендаторов, которым принадлежит чат."""
+        if self._tenants is not self.engine.tenants:
+            self._tenants = self.engine.tenants
+            self._chats = {}
+            for tenant in self._tenants:
+                for chat in tenant.recipients:
+                    self._chats.setdefault(str(chat), []).append(tenant)
+        return self._chats.get(chat_id, ())
+
+    def is_stale(self, tenant):
+        """Проверяет, устарели ли статусы арендатора в памяти."""
+        return (tenant.polled_at is None
+                or self.clock() - tenant.polled_at > self.max_age)
+
+    async def _records(self, tenant, command):
+        if not self.is_stale(tenant):
+            metrics.COMMANDS.inc(command, 'cache')
+            return tenant.index.records()
+        metrics.COMMANDS.inc(command, 'api')
+        try:
+            return await self.engine._call(self.engine.peek, tenant)
+        except Exception as error:
+            logger.error(f'Не удалось обновить статусы для команды: {error}',
+                         extra={'tenant': tenant.key})
+            return tenant.index.records()
+
+    async def reply(self, chat_id, command):
+        """Готовит ответ на команду из чата chat_id."""
+        tenants = self.tenants_for(chat_id)
+        if not tenants:
+            return 'Для этого чата не отслеживаются работы.'
+        return '\n\n'.join([
+            format_reply(command, await self._records(tenant, command),
+                         self.history_limit)
+            for tenant in tenants])
+
+    async def handle(self, chat_id, command):
+        """Отвечает на команду; сбой отправки только логируется."""
+        try:
+            await self.engine._send_to(
+                chat_id, await self.reply(chat_id, command))
+        except SendMessageError as error:
+            logger.error(f'Не удалось ответить на команду: {error}')
+
+    async def run(self):
+        """Получает и обрабатывает команды, пока задачу не отменят."""
+        while True:
+            try:
+                commands = await self.engine._call(self.poller.poll)
+            except Exception as error:
+                logger.error(f'Не удалось получить команды: {error}')
+                await asyncio.sleep(COMMAND_RETRY_DELAY)
+                continue
+            await asyncio.gather(*(self.handle(chat_id, command)
+                                   for chat_id, command in commands))
@@ -0,0 +1,787 @@
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from copy import copy
+from functools import partial
+from itertools import islice
+from operator import attrgetter
+import json
+import logging
+import os
+import sys
+import time
+
+import env  # noqa: F401 (загружает .env до чтения настроек модулями)
+import backfill
+import cassette
+from coalesce import RequestCoalescer
+from commands import CommandHandler, TELEGRAM_COMMANDS
+from exceptions import (NotSendingError, RequestAPIError, SendMessageError,
+                        ThrottledError)
+import homework
+from homework_index import HomeworkIndex
+from lazy import lazy_import
+from leasing import LEASE_POOL, LeaseManager, SQLiteLeaseBackend
+from log_pipeline import LOG_FILE, setup_logging
+from resilience import CircuitBreaker, ErrorNotifier
+import metrics
+import profiling
+from scheduler import PollScheduler
+from send_queue import DIGEST_WINDOW, GLOBAL_RATE, SENDER_WORKERS, SendQueue
+from storage import CheckpointStore
+from supervisor import HEALTH_INTERVAL, Supervisor, worker_count
+from streaming import HomeworkStream
+from throttle import RequestThrottle
+import transport
+
+telegram = lazy_import('telegram')
+
+logger = logging.getLogger(__name__)
+
+MAX_IN_FLIGHT = int(os.getenv('MAX_IN_FLIGHT', 64))
+# Ключ общего для воркеров лимита отправки в базе RequestThrottle.
+TELEGRAM_RATE_KEY = 'telegram:global'
+# Уровень записей о длительности этапов опроса: fetch, checkpoint, send
+# и poll (весь цикл). При тысячах арендаторов это несколько записей
+# на опрос, поэтому уровень можно понизить: STAGE_LOG_LEVEL=DEBUG.
+STAGE_LOG_LEVEL = logging.getLevelName(os.getenv('STAGE_LOG_LEVEL', 'INFO'))
+
+
+def log_stage(context, stage, started):
+    """
+    Пишет в лог длительность этапа опроса с уровнем STAGE_LOG_LEVEL.
+    context — поля записи (tenant), started — time.perf_counter()
+    в начале этапа.
+    """
+    if logger.isEnabledFor(STAGE_LOG_LEVEL):
+        logger.log(STAGE_LOG_LEVEL, f'Этап {stage} завершён', extra=dict(
+            context, stage=stage,
+            duration=round(time.perf_counter() - started, 6)))
+
+
+@contextmanager
+def timed_stage(context, stage):
+    """Измеряет этап опроса в блоке with и пишет его в лог."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        log_stage(context, stage, started)
+
+
+class Tenant:
+    """
+    Пара «токен Практикума — чат Telegram», которую опрашивает движок.
+    Атрибуты хранятся в __slots__, а ErrorNotifier создаётся только
+    при первом сбое и освобождается после восстановления: так
+    состояние сотен тысяч арендаторов помещается в один процесс.
+    polled_at — time.monotonic() последнего успешного опроса.
+    """
+
+    __slots__ = ('token', 'chat_id', 'from_date', 'index', 'errors',
+                 'last_change', 'retry_after', '_notifier', 'subscribers',
+                 'digest_window', 'polled_at')
+    _compared = ('token', 'chat_id', 'from_date', 'errors', 'last_change',
+                 'retry_after', 'subscribers', 'digest_window', 'polled_at')
+
+    def __init__(self, token, chat_id, from_date=None, index=None, errors=0,
+                 last_change=None, retry_after=None, notifier=None,
+                 subscribers=(), digest_window=0, polled_at=None):
+        self.token = token
+        self.chat_id = chat_id
+        self.from_date = int(time.time()) if from_date is None else from_date
+        self.index = HomeworkIndex() if index is None else index
+        self.errors = errors
+        self.last_change = last_change
+        self.retry_after = retry_after
+        self._notifier = notifier
+        self.subscribers = subscribers
+        self.digest_window = digest_window
+        self.polled_at = polled_at
+
+    def _values(self):
+        return tuple(getattr(self, name) for name in self._compared)
+
+    def __eq__(self, other):
+        """Сравнивает арендаторов по полям, кроме индекса и оповещений."""
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._values() == other._values()
+
+    __hash__ = None
+
+    def __repr__(self):
+        """Показывает поля арендатора, кроме индекса и оповещений."""
+        fields = ', '.join(f'{name}={getattr(self, name)!r}'
+                           for name in self._compared)
+        return f'{self.__class__.__name__}({fields})'
+
+    @property
+    def notifier(self):
+        """Возвращает ErrorNotifier, создавая его при первом обращении."""
+        if self._notifier is None:
+            self._notifier = ErrorNotifier()
+        return self._notifier
+
+    def recovered(self):
+        """Возвращает сообщение о восстановлении после сбоя или None."""
+        if self._notifier is None:
+            return None
+        message = self._notifier.recovered()
+        self._notifier = None
+        return message
+
+    def statuses(self):
+        """Текущие статусы работ арендатора."""
+        return self.index.statuses()
+
+    @property
+    def key(self):
+        """Стабильный идентификатор арендатора для логов и хранилищ."""
+        return homework.tenant_key(self.chat_id, self.token)
+
+    @property
+    def recipients(self):
+        """Чаты, получающие уведомления: основной и подписчики."""
+        return (self.chat_id, *self.subscribers)
+
+
+def load_tenants(path=None):
+    """
+    Загружает список арендаторов.
+    Файл TENANTS_FILE — JSON-список объектов с ключами token и chat_id,
+    необязательным списком чатов-подписчиков subscribers и окном
+    дайджеста digest_window в секундах (0 — отправлять сразу).
+    Без файла движок работает с единственной парой из переменных
+    окружения и подписчиками из TELEGRAM_SUBSCRIBERS. По умолчанию
+    окно дайджеста берётся из TELEGRAM_DIGEST_WINDOW.
+    """
+    path = path or os.getenv('TENANTS_FILE')
+    if path:
+        with open(path, encoding='UTF-8') as file:
+            return [Tenant(str(item['token']), str(item['chat_id']),
+                           subscribers=tuple(
+                               str(chat) for chat
+                               in item.get('subscribers', ())),
+                           digest_window=float(
+                               item.get('digest_window', DIGEST_WINDOW)))
+                    for item in json.load(file)]
+    if not homework.check_tokens():
+        return []
+    return [Tenant(homework.PRACTICUM_TOKEN, homework.TELEGRAM_CHAT_ID,
+                   subscribers=homework.parse_subscribers(
+                       homework.TELEGRAM_SUBSCRIBERS),
+                   digest_window=DIGEST_WINDOW)]
+
+
+class PollingEngine:
+    """
+    Асинхронный движок опроса множества арендаторов в одном процессе.
+    Для каждого арендатора выполняется тот же конвейер, что и в
+    homework.main(): get_api_answer → check_response → parse_status →
+    send_message. Блокирующие вызовы уходят в пул потоков, а семафор
+    ограничивает число одновременных запросов.
+    fetch может вернуть как словарь, так и HomeworkStream: тогда работы
+    сверяются с индексом по одной и память не зависит от длины истории.
+    prewarm — функция прогрева соединений, вызываемая за
+    transport.PREWARM_LEAD секунд до очередного опроса.
+    store — CheckpointStore: курсоры и отправленные статусы переживают
+    перезапуск процесса.
+    send_queue — SendQueue: сообщения уходят в отдельную очередь с
+    ограничением скорости, и опрос не ждёт ответа Telegram.
+    scheduler — PollScheduler, выбирающий интервал опроса каждого
+    арендатора по статусам его работ и числу ошибок подряд.
+    breaker — общий для всех арендаторов CircuitBreaker вокруг API:
+    пока API недоступно, опросы не уходят в сеть.
+    throttle — RequestThrottle с общим для процессов бюджетом запросов
+    по токенам и IP-адресу; ответы 429 и 503 откладывают опрос на срок
+    из Retry-After.
+    leases — LeaseManager: когда несколько узлов делят один список
+    арендаторов, узел опрашивает только тех, чья аренда у него.
+    coalescer — RequestCoalescer: арендаторы с общим токеном делят
+    один запрос к API; не подходит для fetch, возвращающего
+    HomeworkStream, который можно прочитать только один раз.
+    Если курсор арендатора отстал больше чем на backfill_window секунд,
+    пропуск догоняется окнами такой длины, но не больше
+    backfill_max_windows окон: не больше backfill_concurrency запросов
+    одновременно, курсор сохраняется после каждого окна. Окна
+    запрашиваются через backfill_fetch (по умолчанию fetch); потоковый
+    fetch держит в памяти только работы окна.
+    slow_cycles — profiling.SlowCycleWatch: опрос арендатора дольше
+    порога оставляет дамп стеков с этапами конвейера.
+    """
+
+    def __init__(self, bot, tenants, max_in_flight=MAX_IN_FLIGHT,
+                 retry_time=homework.RETRY_TIME,
+                 fetch=homework.request_homework_statuses, prewarm=None,
+                 store=None, send_queue=None, scheduler=None, breaker=None,
+                 throttle=None, leases=None, coalescer=None,
+                 backfill_window=backfill.BACKFILL_WINDOW,
+                 backfill_concurrency=backfill.BACKFILL_CONCURRENCY,
+                 backfill_max_windows=backfill.BACKFILL_MAX_WINDOWS,
+                 backfill_fetch=None, slow_cycles=None):
+        self.bot = bot
+        self.candidates = list(tenants)
+        self.tenants = list(tenants)
+        self._assigned = {tenant.key: tenant for tenant in self.tenants}
+        self.max_in_flight = max_in_flight
+        self.retry_time = retry_time
+        self.fetch = fetch
+        self.prewarm = prewarm
+        self.store = store
+        self.send_queue = send_queue
+        if scheduler is None:
+            scheduler = PollScheduler(retry_time=retry_time)
+        self.scheduler = scheduler
+        self.breaker = CircuitBreaker() if breaker is None else breaker
+        self.throttle = throttle
+        self.leases = leases
+        self.coalescer = coalescer
+        self.backfill_window = backfill_window
+        self.backfill_concurrency = backfill_concurrency
+        self.backfill_max_windows = backfill_max_windows
+        self.backfill_fetch = backfill_fetch or fetch
+        self.slow_cycles = slow_cycles
+        self._sending = set()
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self._semaphore = None
+        self._wakeup = None
+
+    async def _call(self, func, *args):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def _send(self, tenant, message, key=None):
+        await self._send_to(tenant.chat_id, message, key)
+
+    async def _send_to(self, chat_id, message, key=None):
+        if self.send_queue is not None:
+            self.send_queue.put(chat_id, message, key)
+            return
+        try:
+            await self._call(
+                homework.send_message_to_chat, self.bot, chat_id, message)
+            if key is not None and self.store is not None:
+                await self._call(self.store.ack, key)
+        finally:
+            self._sending.discard(key)
+
+    def _in_flight(self, key):
+        if self.send_queue is not None and key in self.send_queue.keys:
+            return True
+        return key in self._sending
+
+    def _reserve(self, messages):
+        # Ключи помечаются до фиксации в outbox, чтобы повторная
+        # отправка не взяла сообщения, которые вот-вот уйдут.
+        self._sending.update(key for key, _, _ in messages)
+
+    async def _fan_out(self, messages, context=None, window=0):
+        """
+        Рассылает сообщения (key, chat_id, text) всем получателям.
+        Ключи сообщений должны быть помечены _reserve. Через SendQueue
+        сообщения ставятся в очереди чатов одним пакетом и при окне
+        window копятся в дайджест, без очереди отправляются сразу
+        и одновременно. Сбой в одном чате не останавливает рассылку:
+        сообщение остаётся в outbox и повторяется позже только для
+        этого чата, пока не исчерпает попытки CheckpointStore.fail.
+        """
+        if self.send_queue is not None:
+            self.send_queue.put_many(messages, window)
+            self._sending.difference_update(key for key, _, _ in messages)
+            return
+        results = await asyncio.gather(
+            *(self._send_to(chat_id, text, key)
+              for key, chat_id, text in messages),
+            return_exceptions=True)
+        failed = []
+        for (key, chat_id, _), result in zip(messages, results):
+            if isinstance(result, SendMessageError):
+                metrics.count_error(result)
+                logger.error(f'Сообщение в чат {chat_id} не отправлено, '
+                             f'{key} осталось в outbox: {result}',
+                             extra=context)
+                failed.append(key)
+            elif isinstance(result, BaseException):
+                raise result
+        if failed and self.store is not None:
+            await self._call(self.store.fail, *failed)
+
+    async def replay_outbox(self, keys=None):
+        """
+        Повторно отправляет сообщения арендаторов из outbox.
+        Это сообщения, которые были зафиксированы вместе с курсором,
+        но не доставлены: до остановки процесса, до переезда
+        арендатора на другой узел или из-за сбоя в чате получателя.
+        Сообщения, которые ещё отправляются, пропускаются.
+        keys — ключи арендаторов, по умолчанию все арендаторы движка.
+        """
+        if self.store is None:
+            return
+        keys = set(self._assigned) if keys is None else keys
+        pending = [
+            message for message
+            in await self._call(self.store.pending_messages, keys)
+            if not self._in_flight(message[0])]
+        self._reserve(pending)
+        if pending:
+            logger.info(f'Повторная отправка сообщений из outbox: '
+                        f'{len(pending)}')
+        await self._fan_out(pending)
+
+    async def _retry_outbox(self):
+        while True:
+            await asyncio.sleep(self.retry_time)
+            try:
+                await self.replay_outbox()
+            except Exception as error:
+                logger.error(f'Не удалось повторить отправку: {error}')
+
+    def restore(self):
+        """Восстанавливает курсоры и индексы статусов из хранилища."""
+        if self.store is None:
+            return
+        cursors = self.store.load_cursors()
+        statuses = self.store.load_statuses()
+        for tenant in self.tenants:
+            tenant.from_date = cursors.get(tenant.key, tenant.from_date)
+            tenant.index = HomeworkIndex(statuses.get(tenant.key))
+
+    def _restore_tenant(self, tenant):
+        if self.store is None:
+            return
+        tenant.from_date = self.store.get_cursor(tenant.key, tenant.from_date)
+        tenant.index = HomeworkIndex(self.store.get_statuses(tenant.key))
+
+    def assign(self, tenants):
+        """
+        Заменяет набор арендаторов узла.
+        Вызывается при перебалансировке воркеров; с арендами узел
+        опрашивает только тех из них, чья аренда у него.
+        """
+        self.candidates = list(tenants)
+        self._activate(self._owned(self.candidates))
+
+    def _select_leased(self):
+        self.tenants = self._owned(self.candidates)
+        self._assigned = {tenant.key: tenant for tenant in self.tenants}
+
+    def _owned(self, tenants):
+        if self.leases is None:
+            return tenants
+        owned = self.leases.renew([tenant.key for tenant in tenants])
+        return [tenant for tenant in tenants if tenant.key in owned]
+
+    def _activate(self, tenants, spread=None):
+        """
+        Заменяет набор опрашиваемых арендаторов.
+        Новые арендаторы восстанавливаются из хранилища и равномерно
+        распределяются по spread секундам (по умолчанию retry_time);
+        у снятых запланированные опросы пропускаются.
+        """
+        spread = self.retry_time if spread is None else spread
+        keys = {tenant.key for tenant in tenants}
+        removed = len(self._assigned.keys() - keys)
+        # Копия отличает новые опросы от оставшихся в плане старых.
+        added = [copy(tenant) for tenant in tenants
+                 if tenant.key not in self._assigned]
+        self._assigned = {
+            tenant.key: self._assigned.get(tenant.key, tenant)
+            for tenant in tenants}
+        self._assigned.update((tenant.key, tenant) for tenant in added)
+        self.tenants = list(self._assigned.values())
+        for index, tenant in enumerate(added):
+            self._restore_tenant(tenant)
+            self.scheduler.add(tenant, spread * index / len(added))
+        if self._wakeup is not None:
+            self._wakeup.set()
+            if added:
+                asyncio.ensure_future(self.replay_outbox(
+                    {tenant.key for tenant in added}))
+        if added or removed:
+            logger.info(f'Опрашивается арендаторов: {len(self.tenants)}, '
+                        f'новых: {len(added)}, снято: {removed}')
+
+    async def _renew_leases(self):
+        # Захваченные у упавшего узла арендаторы опрашиваются в течение
+        # интервала продления, а не через полный retry_time.
+        while True:
+            await asyncio.sleep(self.leases.renew_interval)
+            try:
+                owned = await self._call(self._owned, self.candidates)
+            except Exception as error:
+                logger.error(f'Не удалось продлить аренды: {error}')
+                continue
+            self._activate(owned, self.leases.renew_interval)
+
+    def _checkpoint(self, tenant, statuses, messages):
+        if self.store is not None:
+            self.store.checkpoint(
+                tenant.key, tenant.from_date, statuses, messages)
+
+    def _request(self, token, from_date, fetch=None):
+        fetch = fetch or self.fetch
+        if self.throttle is None:
+            return self.breaker.call(fetch, token, from_date)
+        return self.throttle.call(
+            token, self.breaker.call, fetch, token, from_date)
+
+    def _fetch(self, tenant):
+        if self.coalescer is None:
+            return self._request(tenant.token, tenant.from_date)
+        return self.coalescer.call(
+            tenant.token, tenant.from_date,
+            partial(self._request, tenant.token))
+
+    def _fetch_changes(self, tenant):
+        response = self._fetch(tenant)
+        if isinstance(response, HomeworkStream):
+            try:
+                changed = tenant.index.diff_stream(response)
+            except RequestAPIError as error:
+                # Тело читается после breaker.call: обрыв учитываем сами.
+                self.breaker.record_failure(error)
+                raise
+            return response.current_date, changed
+        homework_answer = homework.check_response(response)
+        return response.get('current_date'), tenant.index.diff(homework_answer)
+
+    def _fetch_window(self, tenant, start, end):
+        return homework.fetch_window(
+            partial(self._request, tenant.token, fetch=self.backfill_fetch),
+            start, end)
+
+    def peek(self, tenant):
+        """
+        Запрашивает свежие статусы арендатора, не меняя его состояние.
+        Возвращает HomeworkIndex.records() с учётом ответа API, а
+        уведомления о найденных изменениях отправит очередной опрос.
+        Запрос проходит через coalescer, throttle и breaker, как опрос.
+        """
+        response = self._fetch(tenant)
+        if isinstance(response, HomeworkStream):
+            return tenant.index.records(list(response))
+        return tenant.index.records(homework.check_response(response))
+
+    async def _report_failure(self, tenant, error, context):
+        logger.error(f'Сбой в работе программы: {error}', extra=context)
+        alert = tenant.notifier.alert(error)
+        if alert is None:
+            return
+        try:
+            await self._send(tenant, alert)
+        except SendMessageError as error:
+            logger.error(f'Не удалось отправить сообщение об ошибке:{error}',
+                         extra=context)
+
+    async def _deliver_changes(self, tenant, changed, context):
+        statuses, messages = homework.collect_changes(
+            tenant.key, tenant.recipients, tenant.index, changed)
+        self._reserve(messages)
+        try:
+            with timed_stage(context, 'checkpoint'):
+                await self._call(
+                    self._checkpoint, tenant, statuses, messages)
+        except BaseException:
+            self._sending.difference_update(key for key, _, _ in messages)
+            raise
+        with timed_stage(context, 'send'):
+            await self._fan_out(messages, context, tenant.digest_window)
+
+    async def _backfill(self, tenant, context):
+        windows = iter(backfill.plan_windows(
+            tenant.from_date, int(time.time()), self.backfill_window,
+            self.backfill_max_windows))
+        logger.info(f'Догоняем пропуск опроса с {tenant.from_date}',
+                    extra=context)
+        pending = deque()
+
+        def schedule(count):
+            for start, end in islice(windows, count):
+                pending.append((end, asyncio.ensure_future(self._call(
+                    self._fetch_window, tenant, start, end))))
+
+        schedule(self.backfill_concurrency)
+        total = 0
+        try:
+            while pending:
+                end, fetch = pending.popleft()
+                schedule(1)
+                current_date, homeworks = await fetch
+                changed = tenant.index.diff(homeworks)
+                tenant.from_date = current_date if end is None else end
+                await self._deliver_changes(tenant, changed, context)
+                total += len(changed)
+        finally:
+            for _, fetch in pending:
+                fetch.cancel()
+        return total
+
+    async def _poll_changes(self, tenant, context):
+        if backfill.needs_backfill(
+                tenant.from_date, time.time(), self.backfill_window):
+            return await self._backfill(tenant, context)
+        with timed_stage(context, 'fetch'):
+            tenant.from_date, changed = await self._call(
+                self._fetch_changes, tenant)
+        await self._deliver_changes(tenant, changed, context)
+        return len(changed)
+
+    async def poll_tenant(self, tenant):
+        """
+        Выполняет один цикл опроса арендатора.
+        Длительность этапов fetch, checkpoint, send и всего цикла (poll)
+        пишется в лог с уровнем STAGE_LOG_LEVEL (log_stage).
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        context = {'tenant': tenant.key, 'stage': 'poll'}
+        async with self._semaphore:
+            started = time.perf_counter()
+            cycle = None
+            if self.slow_cycles is not None:
+                cycle = self.slow_cycles.begin(tenant.key)
+            try:
+                changed = await self._poll_changes(tenant, context)
+                tenant.polled_at = time.monotonic()
+                tenant.errors = 0
+                tenant.retry_after = None
+                if not changed:
+                    logger.debug('Отсутствуют новые статусы домашки',
+                                 extra=context)
+                else:
+                    tenant.last_change = time.monotonic()
+                recovered = tenant.recovered()
+                if recovered:
+                    await self._send(tenant, recovered)
+            except NotSendingError as error:
+                metrics.count_error(error)
+                tenant.retry_after = getattr(error, 'retry_after', None)
+                if not isinstance(error, (SendMessageError, ThrottledError)):
+                    tenant.errors += 1
+                logger.error(f'Сбой в работе программы: {error}',
+                             extra=context)
+            except Exception as error:
+                metrics.count_error(error)
+                tenant.errors += 1
+                tenant.retry_after = getattr(error, 'retry_after', None)
+                await self._report_failure(tenant, error, context)
+            finally:
+                if cycle is not None:
+                    self.slow_cycles.end(cycle)
+                log_stage(context, 'poll', started)
+
+    async def run_once(self):
+        """Опрашивает всех арендаторов по одному разу."""
+        await asyncio.gather(
+            *(self.poll_tenant(tenant) for tenant in self.tenants))
+
+    async def _poll_and_reschedule(self, tenant):
+        if self.leases is None or self.leases.owns(tenant.key):
+            await self.poll_tenant(tenant)
+        since_change = None
+        if tenant.last_change is not None:
+            since_change = time.monotonic() - tenant.last_change
+        if tenant.retry_after is not None and not tenant.errors:
+            # Исчерпан локальный бюджет: повтор, как только он освободится.
+            self.scheduler.add(tenant, tenant.retry_after)
+        else:
+            self.scheduler.reschedule(
+                tenant, tenant.statuses(), since_change, tenant.errors,
+                not_before=tenant.retry_after or 0)
+        self._wakeup.set()
+
+    async def _sleep(self, delay):
+        # asyncio.wait, а не wait_for: до Python 3.12 wait_for теряет
+        # отмену, совпавшую с пробуждением, и run() не останавливается.
+        self._wakeup.clear()
+        waiter = asyncio.ensure_future(self._wakeup.wait())
+        try:
+            await asyncio.wait((waiter,), timeout=delay)
+        finally:
+            waiter.cancel()
+
+    def _start(self):
+        if self.leases is not None:
+            self._select_leased()
+        self.restore()
+        metrics.QUEUE_DEPTH.set_function(
+            'scheduled', function=lambda: len(self.scheduler))
+        if self.send_queue is not None:
+            self.send_queue.start()
+        count = len(self.tenants) or 1
+        for index, tenant in enumerate(self.tenants):
+            self.scheduler.add(tenant, self.retry_time * index / count)
+        self._wakeup = asyncio.Event()
+        replay = asyncio.ensure_future(self.replay_outbox())
+        tasks = {replay, asyncio.ensure_future(self._retry_outbox())}
+        replay.add_done_callback(tasks.discard)
+        if self.leases is not None:
+            tasks.add(asyncio.ensure_future(self._renew_leases()))
+        return tasks
+
+    async def run(self):
+        """
+        Бесконечно опрашивает арендаторов по плану PollScheduler.
+        Цикл спит до ближайшего дедлайна и просыпается раньше, если
+        завершившийся опрос запланировал более ранний.
+        Первые опросы равномерно разнесены по retry_time, чтобы запросы
+        не уходили к API одной пачкой; перед каждой порцией опросов
+        прогреваются соединения. С арендами опрашиваются только
+        арендаторы узла, а набор обновляется при каждом продлении.
+        """
+        tasks = self._start()
+        warmed = False
+        while True:
+            delay = self.scheduler.time_until_next()
+            if delay is None:
+                delay = self.retry_time
+            if delay > 0:
+                if (self.prewarm is not None and not warmed
+                        and delay <= transport.PREWARM_LEAD):
+                    await self._call(self.prewarm, homework.ENDPOINT)
+                    warmed = True
+                await self._sleep(delay)
+                continue
+            warmed = False
+            for tenant in self.scheduler.pop_due():
+                if self._assigned.get(tenant.key) is not tenant:
+                    continue
+                task = asyncio.ensure_future(
+                    self._poll_and_reschedule(tenant))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+    def close(self):
+        """Останавливает пул потоков и освобождает аренды."""
+        self.executor.shutdown(wait=False)
+        if self.leases is not None:
+            self.leases.release()
+
+
+def build_leases(pool=LEASE_POOL):
+    """
+    Возвращает LeaseManager для бэкенда из LEASE_BACKEND или None.
+    Без бэкенда узел опрашивает всех своих арендаторов.
+    """
+    backend = os.getenv('LEASE_BACKEND', '')
+    if not backend:
+        return None
+    if backend != 'sqlite':
+        raise ValueError(f'Неизвестный бэкенд аренд: {backend}')
+    return LeaseManager(SQLiteLeaseBackend(), pool=pool)
+
+
+def build_bot(workers=SENDER_WORKERS):
+    """
+    Создаёт бота с пулом соединений на всех отправителей SendQueue.
+    По умолчанию у Bot одно соединение, и при рассылке многим чатам
+    отправители стояли бы в очереди за ним.
+    """
+    from telegram.utils.request import Request
+    return telegram.Bot(token=homework.TELEGRAM_TOKEN,
+                        base_url=homework.TELEGRAM_BASE_URL,
+                        request=Request(con_pool_size=workers + 4))
+
+
+def build_engine(bot, tenants, pool=LEASE_POOL):
+    """Собирает движок с настройками из переменных окружения."""
+    stream = os.getenv('STREAM_RESPONSES', '') == '1'
+    store = CheckpointStore()
+    throttle = RequestThrottle()
+    send_queue = SendQueue(
+        bot, on_sent=store.ack, on_failed=store.fail,
+        global_take=partial(throttle.take, TELEGRAM_RATE_KEY, GLOBAL_RATE,
+                            GLOBAL_RATE))
+    return PollingEngine(
+        bot, tenants,
+        fetch=(homework.stream_homework_statuses if stream
+               else homework.request_homework_statuses),
+        max_in_flight=min(MAX_IN_FLIGHT, transport.POOL_MAXSIZE),
+        prewarm=transport.prewarm, store=store,
+        send_queue=send_queue,
+        throttle=throttle, leases=build_leases(pool),
+        coalescer=None if stream else RequestCoalescer(),
+        backfill_fetch=homework.stream_homework_statuses,
+        slow_cycles=profiling.SlowCycleWatch())
+
+
+def run_engine(engine, *tasks):
+    """Запускает движок вместе с фоновыми задачами и закрывает его."""
+    async def serve():
+        await asyncio.gather(engine.run(), *tasks)
+
+    try:
+        asyncio.run(serve())
+    finally:
+        engine.close()
+        engine.store.close()
+        engine.throttle.close()
+
+
+async def _receive_commands(engine, commands):
+    loop = asyncio.get_event_loop()
+    while True:
+        command, tenants = await loop.run_in_executor(None, commands.get)
+        if command == 'assign':
+            engine.assign(tenants)
+
+
+async def _report_health(engine, worker_id, events):
+    while True:
+        events.put(('health', worker_id, len(engine.tenants),
+                    metrics.REGISTRY.snapshot()))
+        await asyncio.sleep(HEALTH_INTERVAL)
+
+
+def run_worker(worker_id, tenants, commands, events):
+    """
+    Точка входа процесса-воркера в режиме супервизора.
+    Опрашивает назначенных арендаторов, принимает новые назначения
+    из commands и отправляет супервизору состояние и метрики.
+    """
+    base, extension = os.path.splitext(LOG_FILE)
+    setup_logging(filename=f'{base}.{worker_id}{extension}')
+    cassette.install(suffix=worker_id)
+    profiling.install(suffix=worker_id)
+    engine = build_engine(build_bot(), tenants,
+                          pool=f'{LEASE_POOL}:{worker_id}')
+    logger.info(f'Воркер {worker_id}: арендаторов {len(tenants)}')
+    run_engine(engine, _receive_commands(engine, commands),
+               _report_health(engine, worker_id, events))
+
+
+def main():
+    """
+    Запускает движок для всех арендаторов из конфигурации.
+    При WORKER_PROCESSES больше 1 (или auto) арендаторы
+    распределяются между процессами-воркерами под супервизором.
+    """
+    homework.load_config()
+    tenants = load_tenants()
+    if not tenants or not homework.TELEGRAM_TOKEN:
+        logger.critical('Токены недоступны')
+        sys.exit('Токены недоступны')
+    workers = worker_count()
+    if workers > 1:
+        if TELEGRAM_COMMANDS:
+            logger.warning('Команды бота работают только в одном процессе '
+                           '(WORKER_PROCESSES=1)')
+        logger.info(f'Запуск супервизора: арендаторов {len(tenants)}, '
+                    f'воркеров {workers}')
+        Supervisor(tenants, run_worker, workers,
+                   shard_key=attrgetter('token')).run()
+        return
+    cassette.install()
+    profiling.install()
+    engine = build_engine(build_bot(), tenants)
+    logger.info(f'Запуск движка: арендаторов {len(tenants)}')
+    metrics.start_metrics_server()
+    tasks = [CommandHandler(engine).run()] if TELEGRAM_COMMANDS else []
+    run_engine(engine, *tasks)
+
+
+if __name__ == '__main__':
+    setup_logging()
+    main()
@@ -0,0 +1,24 @@
+import os
+
+ENV_FILE = '.env'
+
+
+def load_env(name=ENV_FILE):
+    """
+    Загружает .env из рабочего каталога или каталога бота.
+    Модули читают настройки из окружения при импорте, поэтому точки
+    входа (homework, engine) импортируют этот модуль первым.
+    python-dotenv загружается, только если файл есть, чтобы не
+    замедлять холодный старт. Возвращает путь к файлу или None.
+    """
+    directories = (os.getcwd(), os.path.dirname(os.path.abspath(__file__)))
+    for directory in directories:
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            from dotenv import load_dotenv
+            load_dotenv(path)
+            return path
+    return None
+
+
+load_env()
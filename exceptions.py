@@ -11,7 +11,9 @@ class RequestAPIError(Exception):
 
 
 class HTTPError(Exception):
-    pass
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
 
 
 class CurrentTimeError(NotSendingError):
@@ -20,3 +22,19 @@ class CurrentTimeError(NotSendingError):
 
 class JSONDecodeError(Exception):
     pass
+
+
+class CircuitOpenError(NotSendingError):
+    pass
+
+
+class RateLimitError(HTTPError):
+    def __init__(self, message, status_code=None, retry_after=None):
+        super().__init__(message, status_code)
+        self.retry_after = retry_after
+
+
+class ThrottledError(NotSendingError):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
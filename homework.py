@@ -1,28 +1,42 @@
+from functools import partial
 from http import HTTPStatus
 import logging
 import os
 import time
 import sys
 
-import requests
-from telegram import Bot, TelegramError
-from dotenv import load_dotenv
-
+import env  # noqa: F401 (загружает .env до чтения настроек модулями)
+from backfill import needs_backfill, run_backfill, window_homeworks
 from exceptions import (NotSendingError, SendMessageError,
-                        RequestAPIError, HTTPError, CurrentTimeError)
-
+                        RequestAPIError, HTTPError, CurrentTimeError,
+                        RateLimitError)
+from homework_index import HomeworkIndex, status_code
+from lazy import lazy_import
+from log_pipeline import setup_logging
+import metrics
+import profiling
+from resilience import CircuitBreaker, ErrorNotifier
+from storage import CheckpointStore
+from streaming import HomeworkStream
+from throttle import parse_retry_after, RequestThrottle
+import transport
 
-load_dotenv()
+requests = lazy_import('requests')
+telegram = lazy_import('telegram')
 
 logger = logging.getLogger(__name__)
 
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+TELEGRAM_SUBSCRIBERS = os.getenv('TELEGRAM_SUBSCRIBERS')
+TELEGRAM_BASE_URL = os.getenv('TELEGRAM_BASE_URL')
 
 RETRY_TIME = 600
+STREAM_CHUNK_SIZE = 64 * 1024
+RATE_LIMIT_STATUSES = (HTTPStatus.TOO_MANY_REQUESTS,
+                       HTTPStatus.SERVICE_UNAVAILABLE)
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
-HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
 
 
 VERDICTS = {
@@ -30,6 +44,24 @@ VERDICTS = {
     'reviewing': 'Работа взята на проверку ревьюером.',
     'rejected': 'Работа проверена: у ревьюера есть замечания.'
 }
+STATUS_CODES = {status: status_code(status) for status in VERDICTS}
+
+
+@profiling.stage('send_message')
+@metrics.STAGE_LATENCY.time('telegram_send')
+def send_message_to_chat(bot, chat_id, message):
+    """
+    Отправляет сообщение в произвольный Telegram чат.
+    Принимает на вход экземпляр класса Bot,
+    идентификатор чата и строку с текстом сообщения.
+    """
+    try:
+        bot.send_message(chat_id, message)
+    except telegram.TelegramError as error:
+        raise SendMessageError(
+            f'Сбой при отправке сообщения.{error}') from error
+    else:
+        logger.info('Сообщение отправлено')
 
 
 def send_message(bot, message):
@@ -39,13 +71,75 @@ def send_message(bot, message):
     Принимает на вход два параметра:
     экземпляр класса Bot и строку с текстом сообщения.
     """
+    send_message_to_chat(bot, TELEGRAM_CHAT_ID, message)
+
+
+def check_status_code(homework_statuses):
+    """
+    Проверяет код ответа API.
+    На 429 и 503 выбрасывает RateLimitError со временем из Retry-After,
+    на остальные коды, отличные от 200, — HTTPError.
+    """
+    status_code = homework_statuses.status_code
+    if status_code == HTTPStatus.OK:
+        return
+    if status_code in RATE_LIMIT_STATUSES:
+        raise RateLimitError(
+            f'Превышен лимит запросов к эндпоинту{status_code}', status_code,
+            parse_retry_after(homework_statuses.headers.get('Retry-After')))
+    raise HTTPError(
+        f'Сбои при запросе к эндпоинту{status_code}', status_code)
+
+
+@profiling.stage('get_api_answer')
+@metrics.STAGE_LATENCY.time('api_request')
+def request_homework_statuses(token, from_date):
+    """
+    Запрашивает статусы домашних работ от имени произвольного токена.
+    Возвращает ответ API, преобразованный из JSON к типам данных Python.
+    """
+    headers = {'Authorization': f'OAuth {token}'}
+    params = {'from_date': from_date}
     try:
-        bot.send_message(TELEGRAM_CHAT_ID, message)
-    except TelegramError as error:
-        raise SendMessageError(
-            f'Сбой при отправке сообщения.{error}')
-    else:
-        logger.info('Сообщение отправлено')
+        homework_statuses = transport.get(
+            ENDPOINT, headers=headers, params=params)
+        check_status_code(homework_statuses)
+        return homework_statuses.json()
+    except requests.RequestException as error:
+        raise RequestAPIError(
+            f'Ошибка при запросе к Эндпоинту:{error}')
+
+
+@profiling.stage('get_api_answer')
+@metrics.STAGE_LATENCY.time('api_request')
+def stream_homework_statuses(token, from_date):
+    """
+    Запрашивает статусы домашних работ без загрузки тела целиком.
+    Возвращает HomeworkStream, который отдаёт работы по одной;
+    подходит для больших выборок, например с from_date=0.
+    """
+    headers = {'Authorization': f'OAuth {token}'}
+    params = {'from_date': from_date}
+    try:
+        homework_statuses = transport.get(
+            ENDPOINT, headers=headers, params=params, stream=True)
+    except requests.RequestException as error:
+        raise RequestAPIError(
+            f'Ошибка при запросе к Эндпоинту:{error}')
+    if homework_statuses.status_code != HTTPStatus.OK:
+        homework_statuses.close()
+        check_status_code(homework_statuses)
+    return HomeworkStream(
+        _read_chunks(homework_statuses), close=homework_statuses.close)
+
+
+def _read_chunks(homework_statuses):
+    # Соединение может оборваться посреди тела ответа.
+    try:
+        yield from homework_statuses.iter_content(STREAM_CHUNK_SIZE)
+    except requests.RequestException as error:
+        raise RequestAPIError(
+            f'Ошибка при чтении ответа Эндпоинта:{error}') from error
 
 
 def get_api_answer(current_timestamp):
@@ -55,19 +149,11 @@ def get_api_answer(current_timestamp):
     В случае успешного запроса должна вернуть ответ API,
     преобразовав его из формата JSON к типам данных Python.
     """
-    params = {'from_date': current_timestamp}
-    try:
-        homework_statuses = requests.get(
-            ENDPOINT, headers=HEADERS, params=params)
-        if homework_statuses.status_code != HTTPStatus.OK:
-            raise HTTPError(
-                f'Сбои при запросе к эндпоинту{homework_statuses.status_code}')
-        return homework_statuses.json()
-    except requests.RequestException as error:
-        raise RequestAPIError(
-            f'Ошибка при запросе к Эндпоинту:{error}')
+    return request_homework_statuses(PRACTICUM_TOKEN, current_timestamp)
 
 
+@profiling.stage('check_response')
+@metrics.STAGE_LATENCY.time('check_response')
 def check_response(response):
     """
     Проверяет ответ API на корректность.
@@ -90,6 +176,8 @@ def check_response(response):
     return response.get('homeworks')
 
 
+@profiling.stage('parse_status')
+@metrics.STAGE_LATENCY.time('parse_status')
 def parse_status(homework):
     """
     Извлекает из информации о конкретной домашней работе статус этой работы.
@@ -112,6 +200,182 @@ def parse_status(homework):
             f'{verdict}')
 
 
+def format_digest(messages):
+    """
+    Объединяет сообщения об изменении статусов в одно.
+    Принимает тексты, подготовленные parse_status.
+    """
+    lines = [f'— {message}' for message in messages]
+    return '\n'.join(
+        [f'Изменились статусы проверки работ: {len(messages)}', *lines])
+
+
+def parse_subscribers(value):
+    """Разбирает список чатов-подписчиков через запятую."""
+    if not value:
+        return ()
+    return tuple(chat.strip() for chat in value.split(',') if chat.strip())
+
+
+def tenant_key(chat_id, token):
+    """
+    Ключ арендатора в CheckpointStore: чат и хвост токена.
+    Один и тот же в homework.main() и в движке, поэтому состояние
+    переживает смену точки входа.
+    """
+    return f'{chat_id}:{token[-6:]}'
+
+
+def message_key(tenant, record, chat_id):
+    """
+    Ключ идемпотентности сообщения об изменении статуса для чата.
+    record — запись (homework, status, date_updated) из HomeworkIndex.
+    """
+    name, status, date_updated = record
+    return f'{tenant}:{name}:{status}:{date_updated}>{chat_id}'
+
+
+def collect_changes(tenant, recipients, index, changed):
+    """
+    Готовит сообщения об изменившихся работах и применяет их к индексу.
+    changed — работы, отобранные HomeworkIndex.diff, recipients — чаты,
+    которым рассылается каждое изменение. Текст формируется один раз
+    на изменение, а у каждого получателя свой ключ идемпотентности.
+    Все сообщения формируются до изменения индекса, поэтому ошибка
+    в ответе API не оставляет индекс в промежуточном состоянии.
+    Возвращает записи (homework, status, date_updated) и сообщения
+    (key, chat_id, text) для CheckpointStore.checkpoint.
+    """
+    texts = [parse_status(homework) for homework in changed]
+    statuses, messages = [], []
+    for homework, text in zip(changed, texts):
+        record = index.apply(homework)
+        statuses.append(record)
+        messages.extend((message_key(tenant, record, chat_id), chat_id, text)
+                        for chat_id in recipients)
+    return statuses, messages
+
+
+def drain_outbox(bot, store, tenant):
+    """
+    Отправляет сообщения арендатора из outbox и удаляет доставленные.
+    Сбой в одном чате не мешает остальным: сообщения этого чата ждут
+    следующего вызова, чтобы не нарушать порядок, а после обхода
+    выбрасывается SendMessageError со списком недоступных чатов.
+    Доставленные сообщения удаляются из outbox одной фиксацией, всем
+    сообщениям недоступного чата засчитывается неудачная попытка
+    (CheckpointStore.fail).
+    """
+    failed = {}
+    delivered, undelivered = [], []
+    try:
+        for key, chat_id, text in store.pending_messages({tenant}):
+            if chat_id in failed:
+                undelivered.append(key)
+                continue
+            try:
+                send_message_to_chat(bot, chat_id, text)
+            except SendMessageError as error:
+                failed[chat_id] = error
+                undelivered.append(key)
+                continue
+            delivered.append(key)
+    finally:
+        store.ack(*delivered)
+        store.fail(*undelivered)
+    if failed:
+        raise SendMessageError(
+            f'Сбой при отправке в чаты {", ".join(failed)}: '
+            f'{next(iter(failed.values()))}')
+
+
+def send_pending(bot, store, tenant):
+    """
+    Отправляет сообщения арендатора из outbox, не прерывая цикл опроса.
+    Сбои отдельных чатов только логируются: их сообщения ждут
+    следующего цикла, а недоступный подписчик не мешает опрашивать
+    API и доставлять уведомления остальным получателям.
+    """
+    try:
+        drain_outbox(bot, store, tenant)
+    except SendMessageError as error:
+        logger.error(f'Сбой в работе программы: {error}')
+
+
+def fetch_window(request, start, end):
+    """
+    Запрашивает работы окна [start, end) для догона пропуска.
+    request(from_date) возвращает ответ API или HomeworkStream; поток
+    читается целиком, и в памяти остаются только работы окна.
+    Возвращает current_date ответа и работы окна.
+    """
+    response = request(start)
+    if isinstance(response, HomeworkStream):
+        homeworks = window_homeworks(response, start, end)
+        return response.current_date, homeworks
+    homeworks = window_homeworks(check_response(response), start, end)
+    return response.get('current_date'), homeworks
+
+
+def catch_up(store, tenant, recipients, index, cursor, request):
+    """
+    Догоняет пропуск опроса после долгого простоя по окнам backfill.
+    request(from_date) возвращает ответ API или HomeworkStream.
+    Изменения каждого окна проходят parse_status по порядку
+    date_updated и сохраняются в outbox вместе с курсором окна,
+    поэтому сбой на середине не откатывает обработанные окна.
+    Возвращает новый курсор.
+    """
+    def process(homeworks, window_cursor):
+        statuses, messages = collect_changes(
+            tenant, recipients, index, index.diff(homeworks))
+        store.checkpoint(tenant, window_cursor, statuses, messages)
+
+    return run_backfill(partial(fetch_window, request),
+                        cursor, int(time.time()), process)
+
+
+def report_error(bot, chat_id, notifier, error):
+    """
+    Логирует сбой и сообщает о нём в чат.
+    Повторы одного и того же сбоя ErrorNotifier пропускает,
+    отправляя напоминания всё реже.
+    """
+    message = f'Сбой в работе программы: {error}'
+    logger.error(message)
+    alert = notifier.alert(error)
+    if alert is None:
+        return
+    try:
+        send_message_to_chat(bot, chat_id, alert)
+    except SendMessageError as error:
+        logger.error(f'Не удалось отправить сообщение об ошибке:{error}')
+
+
+def retry_delay(error):
+    """
+    Возвращает паузу до следующего запроса после ошибки.
+    Если API или локальный лимит просят подождать дольше RETRY_TIME
+    (атрибут retry_after), пауза увеличивается до этого срока.
+    """
+    return max(RETRY_TIME, getattr(error, 'retry_after', None) or 0)
+
+
+def load_config():
+    """
+    Подставляет токены, не заданные явно, из окружения.
+    .env к этому моменту уже загружен модулем env при импорте.
+    """
+    global PRACTICUM_TOKEN, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID
+    global TELEGRAM_SUBSCRIBERS, TELEGRAM_BASE_URL
+    PRACTICUM_TOKEN = PRACTICUM_TOKEN or os.getenv('PRACTICUM_TOKEN')
+    TELEGRAM_TOKEN = TELEGRAM_TOKEN or os.getenv('TELEGRAM_TOKEN')
+    TELEGRAM_CHAT_ID = TELEGRAM_CHAT_ID or os.getenv('TELEGRAM_CHAT_ID')
+    TELEGRAM_SUBSCRIBERS = (TELEGRAM_SUBSCRIBERS
+                            or os.getenv('TELEGRAM_SUBSCRIBERS'))
+    TELEGRAM_BASE_URL = TELEGRAM_BASE_URL or os.getenv('TELEGRAM_BASE_URL')
+
+
 def check_tokens():
     """
     Проверяет доступность переменных окружeния.
@@ -124,42 +388,73 @@ def check_tokens():
 
 def main():
     """Основная логика работы бота."""
+    load_config()
     if not check_tokens():
         logger.critical('Токены недоступны')
         sys.exit('Токены недоступны')
-    bot = Bot(token=TELEGRAM_TOKEN)
-    current_timestamp = int(time.time())
+    from cassette import install
+    from commands import CommandPoller, serve_commands, TELEGRAM_COMMANDS
+    install()
+    bot = telegram.Bot(token=TELEGRAM_TOKEN, base_url=TELEGRAM_BASE_URL)
+    commands = CommandPoller(bot) if TELEGRAM_COMMANDS else None
+    metrics.start_metrics_server()
+    profiling.install()
+    slow_cycles = profiling.SlowCycleWatch()
+    store = CheckpointStore()
+    tenant = tenant_key(TELEGRAM_CHAT_ID, PRACTICUM_TOKEN)
+    # Прежние версии хранили состояние бота под номером чата.
+    store.rename_tenant(str(TELEGRAM_CHAT_ID), tenant)
+    recipients = (str(TELEGRAM_CHAT_ID),
+                  *parse_subscribers(TELEGRAM_SUBSCRIBERS))
+    current_timestamp = store.get_cursor(tenant, int(time.time()))
+    index = HomeworkIndex(store.get_statuses(tenant))
+    breaker = CircuitBreaker()
+    notifier = ErrorNotifier()
+    throttle = RequestThrottle()
     while True:
+        delay = RETRY_TIME
+        cycle = slow_cycles.begin('main')
         try:
-            response = get_api_answer(current_timestamp)
+            send_pending(bot, store, tenant)
+            if needs_backfill(current_timestamp, time.time()):
+                current_timestamp = catch_up(
+                    store, tenant, recipients, index,
+                    store.get_cursor(tenant, current_timestamp),
+                    partial(throttle.call, PRACTICUM_TOKEN, breaker.call,
+                            stream_homework_statuses, PRACTICUM_TOKEN))
+            response = throttle.call(
+                PRACTICUM_TOKEN, breaker.call, get_api_answer,
+                current_timestamp)
             homework_answer = check_response(response)
             current_timestamp = response.get('current_date')
+            statuses, messages = [], []
             if len(homework_answer) == 0:
                 logger.error('Отсутствуют новые статусы домашки')
             else:
-                message = parse_status(homework_answer[0])
-                send_message(bot, message)
+                statuses, messages = collect_changes(
+                    tenant, recipients, index, index.diff(homework_answer))
+            store.checkpoint(tenant, current_timestamp, statuses, messages)
+            send_pending(bot, store, tenant)
+            recovered = notifier.recovered()
+            if recovered:
+                send_message(bot, recovered)
         except NotSendingError as error:
+            metrics.count_error(error)
+            delay = retry_delay(error)
             message = f'Сбой в работе программы: {error}'
             logger.error(message)
         except Exception as error:
-            message = f'Сбой в работе программы: {error}'
-            try:
-                send_message(bot, message)
-            except SendMessageError as error:
-                logger.error(
-                    f'Не удалось отправить сообщение об ошибке:{error}')
-            logger.error(message)
+            metrics.count_error(error)
+            delay = retry_delay(error)
+            report_error(bot, TELEGRAM_CHAT_ID, notifier, error)
         finally:
-            time.sleep(RETRY_TIME)
+            slow_cycles.end(cycle)
+            serve_commands(bot, commands, recipients, index,
+                           delay - transport.PREWARM_LEAD)
+            transport.prewarm(ENDPOINT)
+            time.sleep(transport.PREWARM_LEAD)
 
 
 if __name__ == '__main__':
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s,%(levelname)s,%(message)s,%(funcName)s,%(lineno)d',
-        handlers=[logging.StreamHandler(sys.stdout), logging.FileHandler(
-            filename=os.path.join('main.log'),
-            mode='w',
-            encoding='UTF-8')])
+    setup_logging()
     main()
@@ -0,0 +1,163 @@
+import os
+
+
+MAX_TRACKED_HOMEWORKS = int(os.getenv('MAX_TRACKED_HOMEWORKS', 256))
+
+KNOWN_STATUSES = ('approved', 'reviewing', 'rejected')
+UNKNOWN_STATUS = 'unknown'
+_STATUSES = KNOWN_STATUSES + (UNKNOWN_STATUS,)
+_CODES = {status: code for code, status in enumerate(KNOWN_STATUSES)}
+UNKNOWN_CODE = len(KNOWN_STATUSES)
+
+
+def status_code(status):
+    """
+    Возвращает небольшой целочисленный код статуса.
+    Коды закреплены за вердиктами KNOWN_STATUSES; любой другой
+    статус, включая None, получает общий код UNKNOWN_CODE, поэтому
+    таблица кодов не растёт от значений из ответа API.
+    """
+    return _CODES.get(status, UNKNOWN_CODE)
+
+
+def status_name(code):
+    """Возвращает статус по коду из status_code."""
+    return _STATUSES[code]
+
+
+def homework_key(homework):
+    """Возвращает идентификатор работы: id, а при его отсутствии — название."""
+    return str(homework.get('id', homework.get('homework_name')))
+
+
+class HomeworkIndex:
+    """
+    Индекс последних известных статусов домашних работ арендатора.
+    Ключ — идентификатор работы, значение — (status, date_updated).
+    Поиск выполняется за O(1); при превышении max_size вытесняются
+    работы, которые дольше всех не меняли статус, поэтому память
+    не растёт с длиной истории. Статус хранится кодом status_code,
+    а записи — в обычном словаре без __dict__ у самого индекса.
+    Название работы (homework_name) запоминается только в памяти и
+    только если оно отличается от ключа: работы, восстановленные
+    из хранилища, до следующего изменения называются ключом.
+    """
+
+    __slots__ = ('max_size', '_entries')
+
+    def __init__(self, entries=None, max_size=MAX_TRACKED_HOMEWORKS):
+        self.max_size = max_size
+        self._entries = {}
+        for key, (status, date_updated) in sorted(
+                (entries or {}).items(), key=lambda item: item[1][1] or ''):
+            self._store(key, status, date_updated)
+
+    def __len__(self):
+        """Число отслеживаемых работ."""
+        return len(self._entries)
+
+    def __contains__(self, key):
+        """Проверяет, отслеживается ли работа с ключом key."""
+        return key in self._entries
+
+    def get(self, key):
+        """Возвращает (status, date_updated) работы или None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return status_name(entry[0]), entry[1]
+
+    def items(self):
+        """Отдаёт пары (ключ, (status, date_updated))."""
+        for key, (code, date_updated, _) in self._entries.items():
+            yield key, (status_name(code), date_updated)
+
+    def statuses(self):
+        """Возвращает статусы отслеживаемых работ."""
+        return [status_name(entry[0]) for entry in self._entries.values()]
+
+    def records(self, pending=()):
+        """
+        Возвращает работы от недавно изменившихся к давним.
+        Каждая работа — (ключ, название, status, date_updated).
+        pending — свежие работы из ответа API, ещё не применённые к
+        индексу: они перекрывают известные записи, а индекс
+        не изменяется.
+        """
+        records = {key: (key, name or key, status_name(code), date_updated)
+                   for key, (code, date_updated, name)
+                   in self._entries.items()}
+        for homework in pending:
+            key = homework_key(homework)
+            known = records.get(key)
+            date_updated = homework.get('date_updated')
+            if known is None or (date_updated or '') >= (known[3] or ''):
+                records[key] = (
+                    key, homework.get('homework_name') or key,
+                    homework.get('status'), date_updated)
+        return sorted(records.values(), key=lambda record: record[3] or '',
+                      reverse=True)
+
+    def diff(self, homeworks):
+        """
+        За один проход возвращает работы, статус которых изменился.
+        Повторы одной работы в ответе схлопываются до самой свежей
+        записи, результат упорядочен по date_updated. Индекс не
+        изменяется — изменения фиксирует apply() после отправки.
+        """
+        latest = {}
+        for homework in homeworks:
+            key = homework_key(homework)
+            seen = latest.get(key)
+            if seen is None or ((homework.get('date_updated') or '')
+                                >= (seen.get('date_updated') or '')):
+                latest[key] = homework
+        changed = [homework for key, homework in latest.items()
+                   if self._changed(key, homework)]
+        changed.sort(key=lambda homework: homework.get('date_updated') or '')
+        return changed
+
+    def diff_stream(self, homeworks):
+        """
+        То же, что diff, для потока работ (HomeworkStream).
+        В памяти держатся только изменившиеся работы и даты
+        неизменившихся (они уже есть в индексе), а не весь ответ.
+        Работы с одной датой идут в порядке первого появления, как в diff.
+        """
+        changed, settled, order = {}, {}, {}
+        for homework in homeworks:
+            key = homework_key(homework)
+            order.setdefault(key, len(order))
+            date_updated = homework.get('date_updated') or ''
+            seen = changed.get(key)
+            newest = seen is None or date_updated >= (
+                seen.get('date_updated') or '')
+            if self._changed(key, homework):
+                if newest and date_updated >= settled.get(key, ''):
+                    changed[key] = homework
+                continue
+            if seen is not None and newest:
+                del changed[key]
+            if date_updated >= settled.get(key, ''):
+                settled[key] = date_updated
+        return sorted(changed.values(), key=lambda homework: (
+            homework.get('date_updated') or '', order[homework_key(homework)]))
+
+    def _changed(self, key, homework):
+        known = self._entries.get(key)
+        return known is None or known[0] != status_code(homework.get('status'))
+
+    def apply(self, homework):
+        """Запоминает статус работы и возвращает запись для хранилища."""
+        key = homework_key(homework)
+        status = homework.get('status')
+        date_updated = homework.get('date_updated')
+        self._store(key, status, date_updated, homework.get('homework_name'))
+        return key, status, date_updated
+
+    def _store(self, key, status, date_updated, name=None):
+        self._entries.pop(key, None)
+        self._entries[key] = (status_code(status), date_updated,
+                              None if name == key else name)
+        while len(self._entries) > self.max_size:
+            del self._entries[next(iter(self._entries))]
@@ -0,0 +1,24 @@
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """
+    Возвращает модуль, который загрузится при первом обращении к атрибуту.
+    Тяжёлые зависимости (requests, telegram) не замедляют импорт
+    модулей бота и запуск тестов, которым они не нужны. Выражение
+    в except вычисляется только при исключении, поэтому
+    except requests.RequestException тоже не загружает модуль.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f'No module named {name!r}', name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
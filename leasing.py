@@ -0,0 +1,205 @@
+import hashlib
+import logging
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+LEASE_PATH = os.getenv('LEASE_PATH', 'leases.sqlite3')
+LEASE_TTL = float(os.getenv('LEASE_TTL', 240))
+LEASE_RENEW_INTERVAL = float(os.getenv('LEASE_RENEW_INTERVAL', 60))
+LEASE_POOL = os.getenv('LEASE_POOL', 'default')
+NODE_ID = os.getenv('NODE_ID') or f'{socket.gethostname()}:{os.getpid()}'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    pool TEXT NOT NULL,
+    node TEXT NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (pool, node)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS leases (
+    tenant TEXT PRIMARY KEY,
+    node TEXT NOT NULL,
+    expires REAL NOT NULL,
+    pool TEXT NOT NULL DEFAULT ''
+) WITHOUT ROWID;
+"""
+
+
+class LeaseBackend:
+    """
+    Интерфейс хранилища аренд.
+    acquire одним обращением продлевает аренды узла и захватывает
+    свободные, release освобождает их. Другой бэкенд (Redis, etcd,
+    PostgreSQL) должен гарантировать, что acquire атомарен.
+    """
+
+    def acquire(self, pool, node, keys, now, expires):
+        """
+        Продлевает и захватывает аренды узла node среди keys.
+        Узел получает не больше справедливой доли keys среди живых
+        узлов пула; лишние аренды и аренды ключей вне keys
+        освобождаются. Возвращает множество ключей, которыми узел
+        владеет до expires.
+        """
+        raise NotImplementedError
+
+    def release(self, pool, node, keys):
+        """Освобождает аренды keys и убирает узел из пула."""
+        raise NotImplementedError
+
+
+def _claim_order(node, key):
+    return hashlib.md5(f'{node}#{key}'.encode()).digest()
+
+
+class SQLiteLeaseBackend(LeaseBackend):
+    """
+    Бэкенд аренд на SQLite в режиме WAL для одного хоста и тестов.
+    Продление выполняется одной транзакцией BEGIN IMMEDIATE, поэтому
+    конкурирующие узлы не могут захватить один ключ. Владелец аренды —
+    пара (pool, node): воркеры одного узла с общим NODE_ID работают
+    в разных пулах и не освобождают аренды друг друга.
+    """
+
+    def __init__(self, path=LEASE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None,
+            timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute(
+            'PRAGMA table_info(leases)')}
+        if 'pool' not in columns:
+            self._conn.execute(
+                "ALTER TABLE leases ADD COLUMN pool TEXT NOT NULL DEFAULT ''")
+
+    def _share(self, pool, node, keys, now, expires):
+        self._conn.execute(
+            'INSERT INTO nodes (pool, node, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (pool, node) DO UPDATE SET '
+            'expires = excluded.expires', (pool, node, expires))
+        (live,), = self._conn.execute(
+            'SELECT count(*) FROM nodes WHERE pool = ? AND expires > ?',
+            (pool, now))
+        return math.ceil(len(keys) / live)
+
+    def acquire(self, pool, node, keys, now, expires):
+        """Продлевает и захватывает аренды одной транзакцией."""
+        keys = set(keys)
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                share = self._share(pool, node, keys, now, expires)
+                mine, taken, stale = [], set(), []
+                for key, *holder, until in self._conn.execute(
+                        'SELECT tenant, pool, node, expires FROM leases'):
+                    if key not in keys:
+                        if holder == [pool, node]:
+                            stale.append(key)
+                        continue
+                    if holder == [pool, node]:
+                        mine.append(key)
+                    elif until > now:
+                        taken.add(key)
+                free = sorted(keys - taken - set(mine),
+                              key=lambda key: _claim_order(node, key))
+                mine.sort(key=lambda key: _claim_order(node, key))
+                owned = (mine + free)[:share]
+                self._conn.executemany(
+                    'DELETE FROM leases '
+                    'WHERE tenant = ? AND pool = ? AND node = ?',
+                    [(key, pool, node) for key in mine[share:] + stale])
+                self._conn.executemany(
+                    'INSERT INTO leases (tenant, pool, node, expires) '
+                    'VALUES (?, ?, ?, ?) ON CONFLICT (tenant) DO UPDATE SET '
+                    'pool = excluded.pool, node = excluded.node, '
+                    'expires = excluded.expires',
+                    [(key, pool, node, expires) for key in owned])
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        return set(owned)
+
+    def release(self, pool, node, keys):
+        """Освобождает аренды keys и убирает узел из пула."""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.executemany(
+                    'DELETE FROM leases '
+                    'WHERE tenant = ? AND pool = ? AND node = ?',
+                    [(key, pool, node) for key in keys])
+                self._conn.execute(
+                    'DELETE FROM nodes WHERE pool = ? AND node = ?',
+                    (pool, node))
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def close(self):
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self._conn.close()
+
+
+class LeaseManager:
+    """
+    Аренды арендаторов одного узла.
+    renew раз в renew_interval одним пакетным запросом продлевает
+    аренды узла на ttl и захватывает аренды упавших узлов. Опрашивать
+    арендатора можно, только пока owns() истинно: если продление не
+    удалось, аренда считается потерянной ещё до истечения ttl в
+    хранилище, поэтому два узла не отправляют одно уведомление.
+    При ttl + renew_interval не больше интервала опроса арендаторы
+    упавшего узла переходят к другим за один интервал.
+    """
+
+    def __init__(self, backend, node=NODE_ID, pool=LEASE_POOL,
+                 ttl=LEASE_TTL, renew_interval=LEASE_RENEW_INTERVAL,
+                 clock=time.time):
+        self.backend = backend
+        self.node = node
+        self.pool = pool
+        self.ttl = ttl
+        self.renew_interval = renew_interval
+        self.clock = clock
+        self.owned = set()
+        self._valid_until = 0.0
+
+    def renew(self, keys):
+        """
+        Продлевает аренды среди keys и возвращает ключи узла.
+        Аренды ключей, которых больше нет в keys, освобождаются.
+        """
+        started = self.clock()
+        owned = self.backend.acquire(
+            self.pool, self.node, keys, started, started + self.ttl)
+        if owned != self.owned:
+            logger.info(f'Узел {self.node}: аренд {len(owned)}, '
+                        f'получено {len(owned - self.owned)}, '
+                        f'потеряно {len(self.owned - owned)}')
+        self.owned = owned
+        # Запас в renew_interval защищает от расхождения часов узлов.
+        self._valid_until = started + self.ttl - self.renew_interval
+        return owned
+
+    def owns(self, key):
+        """Проверяет, действует ли аренда узла на ключ."""
+        return key in self.owned and self.clock() < self._valid_until
+
+    def release(self):
+        """Освобождает все аренды узла при штатной остановке."""
+        self.backend.release(self.pool, self.node, self.owned)
+        self.owned = set()
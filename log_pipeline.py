@@ -0,0 +1,108 @@
+import atexit
+import copy
+import json
+import logging
+from logging.handlers import (QueueHandler, QueueListener,
+                              RotatingFileHandler)
+import os
+import queue
+import sys
+
+
+LOG_FILE = os.getenv('LOG_FILE', 'main.log')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+CONTEXT_FIELDS = ('tenant', 'stage', 'duration')
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Форматирует запись в одну строку JSON.
+    Кроме времени, уровня и места вызова переносит поля tenant,
+    stage и duration, переданные через extra.
+    """
+
+    def format(self, record):
+        """Возвращает запись в виде строки JSON."""
+        cached = getattr(record, '_json', None)
+        if cached is not None:
+            return cached
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'func': record.funcName,
+            'line': record.lineno,
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        # Запись форматируется один раз для всех обработчиков слушателя.
+        record._json = json.dumps(data, ensure_ascii=False)
+        return record._json
+
+
+class FastQueueHandler(QueueHandler):
+    """
+    QueueHandler, который не форматирует запись в потоке вызова.
+    Сообщение только подставляется в шаблон, а трассировка
+    исключения превращается в текст, чтобы запись можно было
+    безопасно передать в поток записи; JSON собирает слушатель.
+    """
+
+    def prepare(self, record):
+        """Готовит копию записи к передаче через очередь."""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class StoppableQueueListener(QueueListener):
+    """QueueListener, который можно останавливать повторно."""
+
+    def stop(self):
+        """Сбрасывает очередь и останавливает поток, если он запущен."""
+        if self._thread is not None:
+            super().stop()
+
+
+def setup_logging(level=LOG_LEVEL, filename=LOG_FILE,
+                  max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT):
+    """
+    Настраивает неблокирующий вывод логов.
+    Обработчик корневого логгера только кладёт запись в очередь;
+    форматирование в JSON и запись в stdout и файл с ротацией по
+    размеру выполняет фоновый QueueListener. Возвращает слушателя,
+    который останавливается при выходе из процесса.
+    """
+    formatter = JsonFormatter()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+    handlers = [stream_handler]
+    if filename:
+        file_handler = RotatingFileHandler(
+            filename, maxBytes=max_bytes, backupCount=backup_count,
+            encoding='UTF-8')
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+    log_queue = queue.SimpleQueue()
+    listener = StoppableQueueListener(
+        log_queue, *handlers, respect_handler_level=True)
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.handlers = [FastQueueHandler(log_queue)]
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
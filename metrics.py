@@ -0,0 +1,307 @@
+from bisect import bisect_left
+from collections import deque
+import functools
+import logging
+import os
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1, 2.5, 5, 10, 30)
+LAG_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """Возвращает дочернюю метрику для значений меток."""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._child())
+        return child
+
+    def snapshot(self):
+        """Возвращает значения дочерних метрик для передачи в процесс."""
+        return {values: self._state(child)
+                for values, child in list(self._children.items())}
+
+    def render(self, snapshots=()):
+        """
+        Отдаёт метрику в текстовом формате Prometheus.
+        Значения из snapshots (снимки других процессов) суммируются
+        с собственными.
+        """
+        states = self.snapshot()
+        for snapshot in snapshots:
+            for values, state in snapshot.items():
+                if values in states:
+                    state = self._add(states[values], state)
+                states[values] = state
+        lines = [f'# HELP {self.name} {self.documentation}',
+                 f'# TYPE {self.name} {self.kind}']
+        for values, state in sorted(states.items()):
+            lines.extend(self._render_state(values, state))
+        return lines
+
+    @staticmethod
+    def _add(first, second):
+        return first + second
+
+
+class _CounterChild:
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """Монотонный счётчик."""
+
+    kind = 'counter'
+    _child = _CounterChild
+
+    def inc(self, *values, amount=1):
+        """Увеличивает счётчик с метками values."""
+        self.labels(*values).inc(amount)
+
+    def _state(self, child):
+        return child.value
+
+    def _render_state(self, values, state):
+        yield f'{self.name}{_labels(self.labelnames, values)} {state}'
+
+
+class _GaugeChild:
+
+    def __init__(self):
+        self.value = 0
+        self.function = None
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        return self.function() if self.function else self.value
+
+
+class Gauge(_Metric):
+    """Текущее значение, заданное явно или функцией."""
+
+    kind = 'gauge'
+    _child = _GaugeChild
+
+    def set(self, *values, value):
+        """Устанавливает значение с метками values."""
+        self.labels(*values).set(value)
+
+    def set_function(self, *values, function):
+        """Значение будет вычисляться функцией при каждом чтении."""
+        self.labels(*values).function = function
+
+    def _state(self, child):
+        return child.get()
+
+    def _render_state(self, values, state):
+        yield f'{self.name}{_labels(self.labelnames, values)} {state}'
+
+
+class _HistogramChild:
+    """
+    Корзины гистограммы с отложенным подсчётом.
+    observe() только добавляет значение в очередь (deque.append
+    атомарен), а раскладывает очередь по корзинам под блокировкой
+    чтение метрики или накопление pending_limit значений: так замер
+    этапа не берёт блокировку на каждом вызове.
+    """
+
+    pending_limit = 1024
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._pending = deque()
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        self._pending.append(value)
+        if len(self._pending) > self.pending_limit:
+            self._fold()
+
+    def _fold(self):
+        with self._lock:
+            pending = self._pending
+            for _ in range(len(pending)):
+                value = pending.popleft()
+                self._counts[bisect_left(self.buckets, value)] += 1
+                self._sum += value
+
+    def state(self):
+        """Возвращает (счётчики корзин, сумма) с учётом очереди."""
+        self._fold()
+        with self._lock:
+            return list(self._counts), self._sum
+
+    @property
+    def counts(self):
+        """Счётчики корзин; последняя — +Inf."""
+        return self.state()[0]
+
+    @property
+    def sum(self):
+        """Сумма наблюдений."""
+        return self.state()[1]
+
+
+class Histogram(_Metric):
+    """Гистограмма с фиксированными границами корзин."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, *values, value):
+        """Добавляет наблюдение с метками values."""
+        self.labels(*values).observe(value)
+
+    def time(self, *values):
+        """Декоратор, замеряющий длительность вызова функции."""
+        child = self.labels(*values)
+        pending = child._pending
+        limit = child.pending_limit
+        clock = time.perf_counter
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                started = clock()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    # То же, что child.observe, без вызова метода.
+                    pending.append(clock() - started)
+                    if len(pending) > limit:
+                        child._fold()
+            return wrapper
+        return decorator
+
+    def _state(self, child):
+        return child.state()
+
+    @staticmethod
+    def _add(first, second):
+        counts = [left + right for left, right in zip(first[0], second[0])]
+        return counts, first[1] + second[1]
+
+    def _render_state(self, values, state):
+        counts, total_sum = state
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            total += count
+            labels = _labels(self.labelnames, values, f'le="{bound}"')
+            yield f'{self.name}_bucket{labels} {total}'
+        labels = _labels(self.labelnames, values)
+        yield f'{self.name}_sum{labels} {total_sum}'
+        yield f'{self.name}_count{labels} {total}'
+
+
+class Registry:
+    """Набор метрик процесса."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        """Добавляет метрику и возвращает её."""
+        self.metrics.append(metric)
+        return metric
+
+    def snapshot(self):
+        """Возвращает снимок всех метрик: имя → значения по меткам."""
+        return {metric.name: metric.snapshot() for metric in self.metrics}
+
+    def render(self, snapshots=()):
+        """
+        Отдаёт все метрики в текстовом формате Prometheus.
+        snapshots — снимки реестров других процессов, которые
+        складываются с метриками этого реестра.
+        """
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render(
+                [snapshot.get(metric.name, {}) for snapshot in snapshots]))
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    'homework_bot_stage_seconds', 'Длительность этапов конвейера.',
+    ('stage',)))
+ERRORS = REGISTRY.register(Counter(
+    'homework_bot_errors_total', 'Ошибки по классам исключений.', ('error',)))
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'homework_bot_queue_depth', 'Число элементов в очередях.', ('queue',)))
+API_REQUESTS = REGISTRY.register(Counter(
+    'homework_bot_api_requests_total',
+    'Запросы к API: upstream — ушедшие в сеть, shared — дождавшиеся '
+    'чужого запроса, cached — из кэша.', ('result',)))
+COMMANDS = REGISTRY.register(Counter(
+    'homework_bot_commands_total',
+    'Команды бота: cache — ответ из локального индекса, api — данные '
+    'устарели и запрошены у API.', ('command', 'source')))
+POLL_LAG = REGISTRY.register(Histogram(
+    'homework_bot_poll_lag_seconds',
+    'Отставание начала опроса от запланированного момента.',
+    buckets=LAG_BUCKETS))
+
+
+def count_error(error):
+    """Учитывает исключение в счётчике ошибок по имени его класса."""
+    ERRORS.inc(type(error).__name__)
+
+
+def start_metrics_server(port=None, host=None, registry=REGISTRY):
+    """
+    Запускает HTTP-эндпоинт /metrics в фоновом потоке.
+    Порт и адрес по умолчанию берутся из METRICS_PORT и METRICS_HOST
+    в момент вызова; без порта ничего не делает. HTTP-сервер
+    импортируется только здесь, чтобы не замедлять импорт модуля.
+    """
+    port = os.getenv('METRICS_PORT') if port is None else port
+    if port is None:
+        return None
+    host = os.getenv('METRICS_HOST', '127.0.0.1') if host is None else host
+    from metrics_http import serve
+    server = serve(host, int(port), registry)
+    logger.info(f'Метрики доступны на http://{host}:{server.server_port}/')
+    return server
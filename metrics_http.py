@@ -0,0 +1,31 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Отдаёт метрики реестра сервера по GET /metrics."""
+
+    def do_GET(self):
+        """Отвечает текстом метрик в формате Prometheus."""
+        if self.path not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode()
+        self.send_response(200)
+        self.send_header(
+            'Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Не пишет access-лог в stderr."""
+
+
+def serve(host, port, registry):
+    """Запускает ThreadingHTTPServer с метриками registry в фоне."""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,393 @@
+from collections import Counter
+import functools
+import logging
+import os
+import signal
+import socketserver
+import sys
+import threading
+import time
+import tracemalloc
+
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_SECONDS = float(os.getenv('PROFILE_SECONDS', 30))
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', 0.01))
+PROFILE_SIGNAL = os.getenv('PROFILE_SIGNAL', 'SIGUSR1')
+PROFILE_SOCKET = os.getenv('PROFILE_SOCKET', '')
+PROFILE_MAX_SECONDS = 600
+SLOW_CYCLE_SECONDS = float(os.getenv('SLOW_CYCLE_SECONDS', 0))
+SLOW_CYCLE_DUMP_INTERVAL = float(os.getenv('SLOW_CYCLE_DUMP_INTERVAL', 300))
+TRACEMALLOC_FRAMES = int(os.getenv('TRACEMALLOC_FRAMES', 1))
+STACK_DEPTH = 64
+TOP_STACKS = 20
+TOP_ALLOCATIONS = 30
+IDLE = 'idle'
+
+# Текущий этап конвейера каждого потока: ident → имя этапа.
+# Пишет только сам поток, читает сэмплер из своего потока.
+_STAGES = {}
+
+
+def stage(name):
+    """
+    Декоратор, отмечающий вызов функции как этап конвейера.
+    Этап потока виден сэмплеру и попадает в дампы профиля.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            ident = threading.get_ident()
+            previous = _STAGES.get(ident)
+            _STAGES[ident] = name
+            try:
+                return func(*args, **kwargs)
+            finally:
+                if previous is None:
+                    _STAGES.pop(ident, None)
+                else:
+                    _STAGES[ident] = previous
+        return wrapper
+    return decorator
+
+
+def current_stage(ident=None):
+    """Возвращает этап потока ident (по умолчанию текущего)."""
+    return _STAGES.get(ident or threading.get_ident(), IDLE)
+
+
+def _stack(frame):
+    names = []
+    while frame is not None and len(names) < STACK_DEPTH:
+        code = frame.f_code
+        names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def sample(counts, skip=()):
+    """
+    Снимает стеки всех потоков, кроме skip, в counts.
+    Ключ — (этап потока, стек от корня к вершине).
+    """
+    stages = dict(_STAGES)
+    for ident, frame in sys._current_frames().items():
+        if ident not in skip:
+            counts[stages.get(ident, IDLE), _stack(frame)] += 1
+
+
+def write_dump(base, header, counts, snapshots=None):
+    """
+    Пишет дамп профиля и возвращает base.
+    base.stacks — стеки в свёрнутом формате flamegraph, корнем
+    каждого стека служит этап; base.txt — header, доли этапов,
+    самые частые стеки и, если переданы снимки tracemalloc
+    (до, после), рост памяти по строкам кода. Последний снимок
+    сохраняется в base.tracemalloc для разбора tracemalloc.Snapshot.load.
+    """
+    directory = os.path.dirname(base)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(f'{base}.stacks', 'w', encoding='utf-8') as file:
+        for (stage_name, stack), count in counts.most_common():
+            file.write(f'{stage_name};{stack} {count}\n')
+    total = sum(counts.values()) or 1
+    stages = Counter()
+    for (stage_name, _), count in counts.items():
+        stages[stage_name] += count
+    lines = list(header)
+    lines.append(f'Сэмплов: {sum(counts.values())}')
+    lines.append('Этапы:')
+    lines.extend(f'  {name:<16} {count / total:>6.1%}'
+                 for name, count in stages.most_common())
+    lines.append('Частые стеки:')
+    lines.extend(f'  {count:>6} {stage_name}: {stack}'
+                 for (stage_name, stack), count
+                 in counts.most_common(TOP_STACKS))
+    if snapshots is not None:
+        before, after = snapshots
+        after.dump(f'{base}.tracemalloc')
+        lines.append('Рост памяти:')
+        lines.extend(f'  {statistic}' for statistic in after.compare_to(
+            before, 'lineno')[:TOP_ALLOCATIONS])
+    with open(f'{base}.txt', 'w', encoding='utf-8') as file:
+        file.write('\n'.join(lines) + '\n')
+    return base
+
+
+def _snapshot():
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__)))
+
+
+def _dump_name(directory, kind):
+    moment = time.strftime('%Y%m%d-%H%M%S')
+    return os.path.join(directory, f'{kind}-{moment}-{os.getpid()}')
+
+
+class Profiler:
+    """
+    Профилирование работающего процесса по запросу.
+    start() на seconds секунд включает в фоновом потоке сэмплер
+    стеков всех потоков (раз в interval секунд) и, если memory,
+    tracemalloc, а по окончании пишет дамп write_dump с этапами
+    конвейера. tracemalloc замедляет выделение памяти в разы, поэтому
+    сэмплер можно включить и без него. Пока сеанс
+    идёт, новые запросы отклоняются; stop() завершает его досрочно.
+    Вне сеанса затрат нет.
+    """
+
+    def __init__(self, directory=PROFILE_DIR, interval=PROFILE_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        """Идёт ли сеанс профилирования."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds=PROFILE_SECONDS, reason='signal', memory=True):
+        """
+        Запускает сеанс и возвращает путь дампа без расширения.
+        Если сеанс уже идёт, возвращает None.
+        """
+        seconds = min(max(seconds, 0), PROFILE_MAX_SECONDS)
+        # Без ожидания: start вызывается и из обработчика сигнала.
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            if self.running:
+                return None
+            base = _dump_name(self.directory, f'profile-{reason}')
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, args=(seconds, base, reason, memory),
+                name='profiler', daemon=True)
+            self._thread.start()
+        finally:
+            self._lock.release()
+        logger.info(f'Профилирование на {seconds:g} с: {base}')
+        return base
+
+    def stop(self):
+        """Досрочно завершает сеанс; дамп всё равно пишется."""
+        self._stop.set()
+
+    def wait(self, timeout=None):
+        """Ждёт окончания текущего сеанса."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self, seconds, base, reason, memory):
+        tracing = not memory or tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        try:
+            before = _snapshot() if memory else None
+            counts = Counter()
+            skip = {threading.get_ident()}
+            deadline = time.monotonic() + seconds
+            while True:
+                sample(counts, skip)
+                if (time.monotonic() >= deadline
+                        or self._stop.wait(self.interval)):
+                    break
+            after = _snapshot() if memory else None
+        finally:
+            if not tracing:
+                tracemalloc.stop()
+        write_dump(base, [f'Профиль: {reason}, {seconds:g} с, '
+                          f'интервал {self.interval:g} с'],
+                   counts, (before, after) if memory else None)
+        logger.info(f'Дамп профиля записан: {base}.txt')
+
+
+class SlowCycleWatch:
+    """
+    Дампы медленных итераций цикла опроса.
+    begin() и end() отмечают итерацию (их может быть несколько
+    одновременно). Фоновый поток спит, пока ни одна итерация не идёт
+    дольше threshold секунд, а затем раз в interval секунд снимает
+    стеки всех потоков. Когда медленная итерация заканчивается,
+    сэмплы, собранные с прошлого дампа, пишутся в slow-cycle-*, но не
+    чаще раза в min_interval секунд. threshold=0 отключает проверку.
+    Дамп пишет тот же фоновый поток, поэтому end() не делает файловый
+    ввод-вывод в цикле событий; flush() дожидается записи.
+    """
+
+    def __init__(self, threshold=SLOW_CYCLE_SECONDS, directory=PROFILE_DIR,
+                 interval=PROFILE_INTERVAL,
+                 min_interval=SLOW_CYCLE_DUMP_INTERVAL, clock=time.monotonic):
+        self.threshold = threshold
+        self.directory = directory
+        self.interval = interval
+        self.min_interval = min_interval
+        self.clock = clock
+        self._condition = threading.Condition()
+        self._cycles = {}
+        self._counts = Counter()
+        self._thread = None
+        self._dumped = None
+        self._dumps = []
+
+    def begin(self, label='cycle'):
+        """Отмечает начало итерации и возвращает её отметку."""
+        if not self.threshold:
+            return None
+        mark = (object(), label, self.clock())
+        with self._condition:
+            self._cycles[mark[0]] = mark[2]
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._watch, name='slow-cycle-watch', daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+        return mark
+
+    def end(self, mark):
+        """
+        Отмечает конец итерации.
+        Если итерация была медленной и дамп не пропущен из-за
+        min_interval, ставит его в очередь записи и возвращает путь.
+        """
+        if mark is None:
+            return None
+        key, label, started = mark
+        duration = self.clock() - started
+        with self._condition:
+            del self._cycles[key]
+            if duration <= self.threshold:
+                return None
+            counts, self._counts = self._counts, Counter()
+            now = self.clock()
+            throttled = (self._dumped is not None
+                         and now - self._dumped < self.min_interval)
+            if not throttled:
+                self._dumped = now
+                base = _dump_name(self.directory, 'slow-cycle')
+                self._dumps.append((base, label, duration, counts))
+                self._condition.notify_all()
+        if throttled:
+            logger.warning(f'Медленная итерация {label}: {duration:.1f} с')
+            return None
+        return base
+
+    def flush(self, timeout=None):
+        """Ждёт записи дампов из очереди; возвращает True, если записаны."""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._dumps, timeout)
+
+    def _write(self, dumps):
+        for base, label, duration, counts in dumps:
+            try:
+                write_dump(base, [f'Медленная итерация {label}: '
+                                  f'{duration:.3f} с (порог '
+                                  f'{self.threshold:g} с)'], counts)
+            except OSError as error:
+                logger.error(f'Не удалось записать дамп {base}: {error}')
+                continue
+            logger.warning(f'Медленная итерация {label}: {duration:.1f} с, '
+                           f'дамп {base}.txt')
+
+    def _watch(self):
+        skip = {threading.get_ident()}
+        while True:
+            with self._condition:
+                dumps = list(self._dumps)
+                if not dumps:
+                    self._sample(skip)
+                    continue
+            self._write(dumps)
+            with self._condition:
+                del self._dumps[:len(dumps)]
+                self._condition.notify_all()
+
+    def _sample(self, skip):
+        # Вызывается с захваченным self._condition; ожидание прерывают
+        # begin() и end() с новым дампом.
+        if not self._cycles:
+            self._condition.wait()
+            return
+        age = self.clock() - min(self._cycles.values())
+        if age <= self.threshold:
+            self._condition.wait(self.threshold - age)
+            return
+        sample(self._counts, skip)
+        self._condition.wait(self.interval)
+
+
+class _ControlHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        words = self.rfile.readline().decode(errors='replace').split()
+        command = words[0] if words else ''
+        if command == 'profile':
+            try:
+                seconds = (float(words[1]) if len(words) > 1
+                           else PROFILE_SECONDS)
+            except ValueError:
+                self._reply('error: длительность должна быть числом')
+                return
+            base = self.server.profiler.start(
+                seconds, reason='socket', memory='cpu' not in words[2:])
+            self._reply(f'ok {base}' if base else 'busy')
+        elif command == 'stop':
+            self.server.profiler.stop()
+            self._reply('ok')
+        elif command == 'status':
+            self._reply('busy' if self.server.profiler.running else 'idle')
+        else:
+            self._reply(
+                'error: команды: profile [секунды] [cpu], stop, status')
+
+    def _reply(self, text):
+        self.wfile.write(f'{text}\n'.encode())
+
+
+def serve_control(profiler, path):
+    """
+    Запускает управляющий Unix-сокет path в фоновом потоке.
+    Команды — строка «profile [секунды] [cpu]» (cpu — без
+    tracemalloc), «stop» или «status»; доступ к сокету есть только
+    у владельца процесса.
+    """
+    if os.path.exists(path):
+        os.unlink(path)
+    server = socketserver.ThreadingUnixStreamServer(path, _ControlHandler)
+    os.chmod(path, 0o600)
+    server.daemon_threads = True
+    server.profiler = profiler
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def install(profiler=None, signal_name=PROFILE_SIGNAL,
+            socket_path=PROFILE_SOCKET, suffix=None):
+    """
+    Подключает профилирование по сигналу и управляющему сокету.
+    Сигнал signal_name (SIGUSR1) запускает сеанс на PROFILE_SECONDS;
+    пустое имя, отсутствие сигнала на платформе или вызов не из
+    главного потока его отключают. socket_path включает сокет,
+    suffix добавляется к его имени для воркеров супервизора.
+    Возвращает Profiler.
+    """
+    profiler = profiler or Profiler()
+    signum = getattr(signal, signal_name, None) if signal_name else None
+    if (signum is not None
+            and threading.current_thread() is threading.main_thread()):
+        signal.signal(signum, lambda *args: profiler.start(
+            PROFILE_SECONDS, 'signal'))
+    if socket_path and hasattr(socketserver, 'ThreadingUnixStreamServer'):
+        if suffix is not None:
+            socket_path = f'{socket_path}.{suffix}'
+        serve_control(profiler, socket_path)
+        logger.info(f'Управление профилированием: {socket_path}')
+    return profiler
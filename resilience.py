@@ -0,0 +1,159 @@
+import os
+import re
+import threading
+import time
+
+from exceptions import CircuitOpenError, HTTPError, RequestAPIError
+
+
+ALERT_REPEAT_INTERVAL = int(os.getenv('ALERT_REPEAT_INTERVAL', 600))
+ALERT_MAX_INTERVAL = int(os.getenv('ALERT_MAX_INTERVAL', 24 * 3600))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', 5))
+BREAKER_RESET_TIMEOUT = int(os.getenv('BREAKER_RESET_TIMEOUT', 60))
+BREAKER_MAX_RESET_TIMEOUT = int(os.getenv('BREAKER_MAX_RESET_TIMEOUT', 1800))
+
+
+def fingerprint(error):
+    """
+    Возвращает отпечаток ошибки: класс и текст без чисел.
+    Коды, метки времени и порты не делают одинаковые сбои разными.
+    """
+    return f'{type(error).__name__}:{re.sub(r"[0-9]+", "N", str(error))}'
+
+
+class ErrorNotifier:
+    """
+    Решает, когда сообщать о сбое в Telegram.
+    О новом сбое сообщается сразу, о повторах того же сбоя — через
+    экспоненциально растущие интервалы, а после первого успешного
+    цикла отправляется одно сообщение о восстановлении.
+    """
+
+    def __init__(self, repeat_interval=ALERT_REPEAT_INTERVAL,
+                 max_interval=ALERT_MAX_INTERVAL, clock=time.monotonic):
+        self.repeat_interval = repeat_interval
+        self.max_interval = max_interval
+        self.clock = clock
+        self.fingerprint = None
+        self.count = 0
+        self._interval = repeat_interval
+        self._next_alert = 0.0
+
+    def alert(self, error):
+        """Возвращает текст оповещения о сбое или None, если рано."""
+        now = self.clock()
+        current = fingerprint(error)
+        if current != self.fingerprint:
+            self.fingerprint = current
+            self.count = 1
+            self._interval = self.repeat_interval
+            self._next_alert = now + self._interval
+            return f'Сбой в работе программы: {error}'
+        self.count += 1
+        if now < self._next_alert:
+            return None
+        self._interval = min(self.max_interval, self._interval * 2)
+        self._next_alert = now + self._interval
+        return (f'Сбой в работе программы: {error} '
+                f'(повторяется, всего сбоев: {self.count})')
+
+    def recovered(self):
+        """Возвращает сообщение о восстановлении или None без сбоя."""
+        if self.fingerprint is None:
+            return None
+        count = self.count
+        self.fingerprint = None
+        self.count = 0
+        return f'Работа программы восстановлена. Сбоев подряд: {count}'
+
+
+def is_upstream_failure(error):
+    """Проверяет, говорит ли ошибка о недоступности API Практикума."""
+    if isinstance(error, RequestAPIError):
+        return True
+    if isinstance(error, HTTPError):
+        return error.status_code is None or error.status_code >= 500
+    return False
+
+
+class CircuitBreaker:
+    """
+    Предохранитель вокруг запросов к API.
+    После failure_threshold сбоев подряд цепь размыкается, и вызовы
+    сразу завершаются CircuitOpenError, не нагружая API. Через
+    reset_timeout пропускается один пробный запрос (полуоткрытое
+    состояние): успех замыкает цепь, сбой снова размыкает её на
+    вдвое больший срок, но не дольше max_reset_timeout.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout=BREAKER_RESET_TIMEOUT,
+                 max_reset_timeout=BREAKER_MAX_RESET_TIMEOUT,
+                 is_failure=is_upstream_failure, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.is_failure = is_failure
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self._timeout = reset_timeout
+        self._opened_until = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def call(self, func, *args, **kwargs):
+        """Вызывает func, если цепь замкнута или идёт пробный запрос."""
+        self._before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as error:
+            if self.is_failure(error):
+                self._on_failure()
+            else:
+                self._on_success()
+            raise
+        self._on_success()
+        return result
+
+    def record_failure(self, error):
+        """
+        Учитывает сбой, случившийся после возврата из call.
+        Например, обрыв потокового тела ответа.
+        """
+        if self.is_failure(error):
+            self._on_failure()
+
+    def _before_call(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN and self.clock() >= self._opened_until:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            raise CircuitOpenError(
+                'API Практикума недоступно, запросы приостановлены')
+
+    def _on_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._timeout = self.reset_timeout
+            self._probing = False
+
+    def _on_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN:
+                self._timeout = min(self.max_reset_timeout, self._timeout * 2)
+            elif self.failures < self.failure_threshold:
+                return
+            self.state = self.OPEN
+            self._probing = False
+            self._opened_until = self.clock() + self._timeout
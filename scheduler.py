@@ -0,0 +1,98 @@
+import heapq
+import itertools
+import os
+import random
+import time
+
+import homework
+import metrics
+
+
+REVIEWING_INTERVAL = int(os.getenv('POLL_REVIEWING_INTERVAL', 180))
+IDLE_INTERVAL = int(os.getenv('POLL_IDLE_INTERVAL', 3600))
+MAX_BACKOFF = int(os.getenv('POLL_MAX_BACKOFF', 4 * 3600))
+ACTIVE_WINDOW = int(os.getenv('POLL_ACTIVE_WINDOW', 6 * 3600))
+JITTER = float(os.getenv('POLL_JITTER', 0.1))
+
+
+class PollScheduler:
+    """
+    Планировщик опросов на куче дедлайнов.
+    Интервал каждого арендатора зависит от статусов его работ:
+    работа на проверке (reviewing) опрашивается чаще, арендатор,
+    у которого все работы приняты (approved), — реже. После ошибок
+    интервал растёт экспоненциально, а случайный разброс (jitter)
+    не даёт опросам собираться в пачки.
+    """
+
+    def __init__(self, retry_time=homework.RETRY_TIME,
+                 reviewing_interval=REVIEWING_INTERVAL,
+                 idle_interval=IDLE_INTERVAL, max_backoff=MAX_BACKOFF,
+                 active_window=ACTIVE_WINDOW, jitter=JITTER,
+                 clock=time.monotonic, rng=random.random):
+        self.retry_time = retry_time
+        self.reviewing_interval = reviewing_interval
+        self.idle_interval = idle_interval
+        self.max_backoff = max_backoff
+        self.active_window = active_window
+        self.jitter = jitter
+        self.clock = clock
+        self.rng = rng
+        self._heap = []
+        self._counter = itertools.count()
+
+    def __len__(self):
+        """Число запланированных опросов."""
+        return len(self._heap)
+
+    def interval(self, statuses, since_change=None, errors=0):
+        """
+        Возвращает интервал до следующего опроса без учёта jitter.
+        statuses — текущие статусы работ арендатора,
+        since_change — секунды с последнего изменения статуса,
+        errors — число ошибок подряд.
+        """
+        if errors:
+            return min(self.max_backoff,
+                       self.retry_time * 2 ** min(errors, 16))
+        statuses = set(statuses)
+        if 'reviewing' in statuses:
+            return self.reviewing_interval
+        if since_change is not None and since_change < self.active_window:
+            return self.retry_time
+        if statuses and statuses <= {'approved'}:
+            return self.idle_interval
+        return self.retry_time
+
+    def add(self, item, delay=0):
+        """Планирует опрос item через delay секунд."""
+        heapq.heappush(
+            self._heap, (self.clock() + delay, next(self._counter), item))
+
+    def reschedule(self, item, statuses, since_change=None, errors=0,
+                   not_before=0):
+        """
+        Планирует следующий опрос по состоянию арендатора.
+        not_before — минимальная пауза, например из Retry-After.
+        """
+        interval = self.interval(statuses, since_change, errors)
+        spread = 1 + self.jitter * (2 * self.rng() - 1)
+        delay = max(interval * spread, not_before)
+        self.add(item, delay)
+        return delay
+
+    def time_until_next(self):
+        """Секунды до ближайшего дедлайна или None, если план пуст."""
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - self.clock())
+
+    def pop_due(self):
+        """Извлекает всех арендаторов, чей дедлайн уже наступил."""
+        now = self.clock()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, item = heapq.heappop(self._heap)
+            metrics.POLL_LAG.observe(value=now - deadline)
+            due.append(item)
+        return due
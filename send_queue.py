@@ -0,0 +1,274 @@
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import logging
+import os
+import time
+
+import homework
+import metrics
+
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 30))
+PER_CHAT_RATE = float(os.getenv('TELEGRAM_PER_CHAT_RATE', 1))
+PER_CHAT_BURST = int(os.getenv('TELEGRAM_PER_CHAT_BURST', 3))
+SENDER_WORKERS = int(os.getenv('TELEGRAM_SENDER_WORKERS', 8))
+DIGEST_WINDOW = float(os.getenv('TELEGRAM_DIGEST_WINDOW', 0))
+DIGEST_MAX_MESSAGES = int(os.getenv('TELEGRAM_DIGEST_MAX_MESSAGES', 10))
+MAX_FLOOD_RETRIES = 5
+MAX_IDLE_BUCKETS = 10000
+
+
+class TokenBucket:
+    """
+    Ведро токенов: rate токенов в секунду, не больше capacity в запасе.
+    take() всегда забирает токен, уводя запас в минус при нехватке,
+    и возвращает, сколько секунд нужно подождать. Так одновременные
+    отправители выстраиваются в очередь без повторных проверок.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self):
+        """Забирает токен и возвращает задержку до его появления."""
+        self._refill()
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+    def is_full(self):
+        """Проверяет, что ведро полностью наполнено."""
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class SendQueue:
+    """
+    Очередь исходящих сообщений Telegram с пулом отправителей.
+    Ограничивает скорость глобально и для каждого чата, сохраняя
+    порядок сообщений внутри чата. Ошибки flood control (RetryAfter)
+    откладывают только свой чат на указанное сервером время.
+    put() не блокирует, поэтому опрос не зависит от задержек Telegram.
+    on_sent(key) вызывается после доставки сообщения с ключом
+    идемпотентности, например CheckpointStore.ack; недоставленные
+    сообщения с ключом остаются в outbox до повторной отправки,
+    а on_failed(key) засчитывает им неудачную попытку, например
+    CheckpointStore.fail.
+    failures — число сбоев подряд для каждого недоступного чата:
+    сбой одного получателя не задерживает остальных.
+    Сообщения, поставленные с окном дайджеста window, копят в чате
+    до window секунд и уходят одним сообщением (homework.format_digest)
+    не больше чем из digest_max штук; дайджест отправляется раньше,
+    если набралось digest_max сообщений или в чат пришло сообщение
+    без окна.
+    global_take — функция, которая списывает токен глобального лимита
+    и возвращает задержку, например общий для воркеров бюджет
+    RequestThrottle.take; она вызывается в пуле отправителей.
+    По умолчанию лимит global_rate считается только в этом процессе.
+    """
+
+    def __init__(self, bot, workers=SENDER_WORKERS, global_rate=GLOBAL_RATE,
+                 per_chat_rate=PER_CHAT_RATE, per_chat_burst=PER_CHAT_BURST,
+                 send=None, on_sent=None, on_failed=None,
+                 digest_max=DIGEST_MAX_MESSAGES, global_take=None):
+        self.bot = bot
+        self.workers = workers
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.send = send or homework.send_message_to_chat
+        self.on_sent = on_sent
+        self.on_failed = on_failed
+        self.digest_max = digest_max
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self._global_take = global_take or TokenBucket(global_rate).take
+        self._shared_global = global_take is not None
+        self._buckets = {}
+        self._pending = {}
+        self._retries = {}
+        self._digests = {}
+        self.keys = set()
+        self.failures = {}
+        self._ready = None
+        self._idle = None
+        self._unfinished = 0
+        self._tasks = []
+
+    def __len__(self):
+        """Число сообщений, ожидающих отправки."""
+        return self._unfinished
+
+    def start(self):
+        """Запускает отправителей в текущем цикле событий."""
+        self._ready = asyncio.Queue()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks = [asyncio.ensure_future(self._worker())
+                       for _ in range(self.workers)]
+        metrics.QUEUE_DEPTH.set_function(
+            'telegram_send', function=self.__len__)
+
+    def put(self, chat_id, text, key=None, window=0):
+        """
+        Ставит сообщение в очередь чата без ожидания отправки.
+        key — ключ идемпотентности сообщения из outbox, window — окно
+        дайджеста в секундах, 0 — отправить без накопления.
+        """
+        self._unfinished += 1
+        self._idle.clear()
+        if key is not None:
+            self.keys.add(key)
+        messages = self._pending.get(chat_id)
+        if messages is not None:
+            messages.append((text, key, window))
+            self._flush_early(chat_id, messages)
+            return
+        self._pending[chat_id] = deque([(text, key, window)])
+        self._schedule(chat_id, window=window)
+
+    async def join(self):
+        """Ждёт, пока очередь не опустеет."""
+        await self._idle.wait()
+
+    async def stop(self):
+        """Останавливает отправителей и пул потоков."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.executor.shutdown(wait=False)
+
+    def _bucket(self, chat_id):
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            if len(self._buckets) > MAX_IDLE_BUCKETS:
+                self._buckets = {
+                    key: value for key, value in self._buckets.items()
+                    if key in self._pending or not value.is_full()}
+            bucket = self._buckets[chat_id] = TokenBucket(
+                self.per_chat_rate, self.per_chat_burst)
+        return bucket
+
+    def _schedule(self, chat_id, delay=None, window=0):
+        if delay is None:
+            delay = self._bucket(chat_id).take()
+        if window > delay:
+            loop = asyncio.get_event_loop()
+            self._digests[chat_id] = (
+                loop.call_later(window, self._flush, chat_id),
+                loop.time() + delay)
+            return
+        if delay:
+            asyncio.get_event_loop().call_later(
+                delay, self._ready.put_nowait, chat_id)
+        else:
+            self._ready.put_nowait(chat_id)
+
+    def put_many(self, messages, window=0):
+        """Ставит в очередь сообщения (key, chat_id, text) рассылки."""
+        for key, chat_id, text in messages:
+            self.put(chat_id, text, key, window)
+
+    def _flush_early(self, chat_id, messages):
+        digest = self._digests.get(chat_id)
+        if digest is None:
+            return
+        if len(messages) < self.digest_max and messages[-1][2]:
+            return
+        handle, not_before = digest
+        handle.cancel()
+        del self._digests[chat_id]
+        loop = asyncio.get_event_loop()
+        # Токен чата уже списан при планировании: ждём только его.
+        self._schedule(chat_id, max(0.0, not_before - loop.time()))
+
+    def _flush(self, chat_id):
+        del self._digests[chat_id]
+        self._ready.put_nowait(chat_id)
+
+    def _take(self, chat_id):
+        """Возвращает текст, ключи и число сообщений для отправки."""
+        messages = self._pending[chat_id]
+        text, key, window = messages[0]
+        if not window:
+            return text, [key], 1
+        batch = []
+        for entry in messages:
+            if not entry[2] or len(batch) == self.digest_max:
+                break
+            batch.append(entry[:2])
+        if len(batch) == 1:
+            return text, [key], 1
+        return (homework.format_digest([text for text, _ in batch]),
+                [key for _, key in batch], len(batch))
+
+    def _done(self, chat_id, count=1):
+        messages = self._pending[chat_id]
+        for _ in range(count):
+            self.keys.discard(messages.popleft()[1])
+        self._retries.pop(chat_id, None)
+        self._unfinished -= count
+        if messages:
+            self._schedule(chat_id)
+        else:
+            del self._pending[chat_id]
+        if not self._unfinished:
+            self._idle.set()
+
+    def _deliver(self, chat_id, text, keys):
+        self.send(self.bot, chat_id, text)
+        if self.on_sent is None:
+            return
+        for key in keys:
+            if key is not None:
+                self.on_sent(key)
+
+    async def _worker(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            chat_id = await self._ready.get()
+            if self._shared_global:
+                delay = await loop.run_in_executor(
+                    self.executor, self._global_take)
+            else:
+                delay = self._global_take()
+            await asyncio.sleep(delay)
+            text, keys, count = self._take(chat_id)
+            try:
+                await loop.run_in_executor(
+                    self.executor, self._deliver, chat_id, text, keys)
+            except Exception as error:
+                retry_after = getattr(error.__cause__, 'retry_after', None)
+                retries = self._retries.get(chat_id, 0)
+                if retry_after is not None and retries < MAX_FLOOD_RETRIES:
+                    self._retries[chat_id] = retries + 1
+                    logger.warning(
+                        f'Flood control для чата {chat_id}: '
+                        f'повтор через {retry_after} с')
+                    self._schedule(chat_id, retry_after)
+                    continue
+                metrics.count_error(error)
+                self.failures[chat_id] = self.failures.get(chat_id, 0) + 1
+                logger.error(f'Сообщение в чат {chat_id} не отправлено '
+                             f'(сбоев подряд: {self.failures[chat_id]}): '
+                             f'{error}')
+                keys = [key for key in keys if key is not None]
+                for key in keys:
+                    logger.warning(f'Сообщение {key} осталось в outbox')
+                if keys and self.on_failed is not None:
+                    await loop.run_in_executor(
+                        self.executor, partial(self.on_failed, *keys))
+            else:
+                self.failures.pop(chat_id, None)
+            self._done(chat_id, count)
@@ -0,0 +1,306 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_PATH = os.getenv('CHECKPOINT_PATH', 'checkpoints.sqlite3')
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 20))
+# Не больше лимита параметров запроса в старых сборках SQLite (999).
+TENANTS_PER_QUERY = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cursors (
+    tenant TEXT PRIMARY KEY,
+    from_date INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS statuses (
+    tenant TEXT NOT NULL,
+    homework TEXT NOT NULL,
+    status TEXT NOT NULL,
+    date_updated TEXT,
+    PRIMARY KEY (tenant, homework)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    tenant TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS outbox_tenant ON outbox (tenant, id);
+CREATE TABLE IF NOT EXISTS dead_letters (
+    key TEXT PRIMARY KEY,
+    tenant TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created REAL NOT NULL,
+    attempts INTEGER NOT NULL,
+    parked REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class CheckpointStore:
+    """
+    Устойчивое к сбоям хранилище состояния опроса на SQLite в режиме WAL.
+    Для каждого арендатора хранит курсор from_date, последний
+    отправленный статус каждой домашней работы и исходящие сообщения
+    (outbox). Курсор, статусы и сообщения фиксируются одной
+    транзакцией, поэтому после падения процесса состояние всегда
+    соответствует последнему завершённому циклу, а сообщения об
+    изменениях не теряются.
+    Каждая фиксация дожидается fsync (synchronous=FULL), но
+    одновременные checkpoint() и ack() из разных потоков объединяются
+    в одну транзакцию (group commit), и один fsync подтверждает всю
+    пачку.
+    Сообщение, которое не удалось доставить max_attempts раз
+    (заблокированный бот, удалённый чат), переносится из outbox
+    в таблицу dead_letters и больше не повторяется.
+    """
+
+    def __init__(self, path=CHECKPOINT_PATH, group_commit=True,
+                 max_attempts=OUTBOX_MAX_ATTEMPTS):
+        self.path = path
+        self.group_commit = group_commit
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._commit = threading.Condition(threading.Lock())
+        self._batch = []
+        self._enqueued = 0
+        self._committed = 0
+        self._committing = False
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=FULL')
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute(
+            'PRAGMA table_info(outbox)')}
+        if 'attempts' not in columns:
+            self._conn.execute('ALTER TABLE outbox ADD COLUMN '
+                               'attempts INTEGER NOT NULL DEFAULT 0')
+
+    def load_cursors(self):
+        """Возвращает словарь tenant → from_date для всех арендаторов."""
+        with self._lock:
+            return dict(self._conn.execute(
+                'SELECT tenant, from_date FROM cursors'))
+
+    def get_cursor(self, tenant, default=None):
+        """Возвращает сохранённый from_date арендатора или default."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT from_date FROM cursors WHERE tenant = ?',
+                (tenant,)).fetchone()
+        return default if row is None else row[0]
+
+    def get_statuses(self, tenant):
+        """Возвращает словарь homework → (status, date_updated)."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT homework, status, date_updated FROM statuses '
+                'WHERE tenant = ?', (tenant,)).fetchall()
+        return {name: (status, updated) for name, status, updated in rows}
+
+    def load_statuses(self):
+        """Возвращает словарь tenant → {homework: (status, date_updated)}."""
+        statuses = {}
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT tenant, homework, status, date_updated FROM statuses')
+            for tenant, name, status, updated in rows:
+                statuses.setdefault(tenant, {})[name] = (status, updated)
+        return statuses
+
+    def checkpoint(self, tenant, from_date, statuses=(), messages=()):
+        """
+        Атомарно и надёжно сохраняет курсор, статусы и сообщения.
+        statuses — последовательность (homework, status, date_updated),
+        messages — (key, chat_id, text); сообщение с уже известным
+        ключом идемпотентности повторно не добавляется.
+        Возвращает управление после fsync.
+        """
+        self._submit((tenant, from_date, list(statuses), list(messages), ()))
+
+    def _submit(self, entry):
+        if not self.group_commit:
+            self._write([entry])
+            return
+        errors = []
+        with self._commit:
+            self._batch.append((entry, errors))
+            self._enqueued += 1
+            ticket = self._enqueued
+            while self._committed < ticket:
+                if self._committing:
+                    self._commit.wait()
+                else:
+                    self._flush()
+        if errors:
+            raise errors[0]
+
+    def _flush(self):
+        # Вызывается с захваченным self._commit: лидер забирает всю
+        # накопленную пачку и фиксирует её, пока остальные ждут.
+        batch, self._batch = self._batch, []
+        last = self._enqueued
+        self._committing = True
+        self._commit.release()
+        try:
+            self._write([entry for entry, _ in batch])
+        except sqlite3.Error as error:
+            for _, errors in batch:
+                errors.append(error)
+        finally:
+            self._commit.acquire()
+            self._committing = False
+            self._committed = last
+            self._commit.notify_all()
+
+    def _write(self, batch):
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                for entry in batch:
+                    self._write_entry(*entry, now)
+            except sqlite3.Error:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+
+    def _write_entry(self, tenant, from_date, statuses, messages, acked,
+                     now):
+        if acked:
+            self._conn.executemany(
+                'DELETE FROM outbox WHERE key = ?', [(key,) for key in acked])
+        if tenant is None:
+            return
+        self._conn.execute(
+            'INSERT INTO cursors (tenant, from_date) VALUES (?, ?) '
+            'ON CONFLICT(tenant) DO UPDATE SET '
+            'from_date = excluded.from_date', (tenant, from_date))
+        self._conn.executemany(
+            'INSERT INTO statuses '
+            '(tenant, homework, status, date_updated) '
+            'VALUES (?, ?, ?, ?) '
+            'ON CONFLICT(tenant, homework) DO UPDATE SET '
+            'status = excluded.status, '
+            'date_updated = excluded.date_updated',
+            [(tenant, str(name), status, updated)
+             for name, status, updated in statuses])
+        self._conn.executemany(
+            'INSERT OR IGNORE INTO outbox '
+            '(key, tenant, chat_id, text, created) VALUES (?, ?, ?, ?, ?)',
+            [(key, tenant, str(chat_id), text, now)
+             for key, chat_id, text in messages])
+
+    def rename_tenant(self, old, new):
+        """
+        Переносит курсор, статусы и outbox арендатора old на ключ new.
+        Ничего не делает, если у new уже есть курсор. Возвращает True,
+        если состояние перенесено.
+        """
+        with self._lock:
+            if self._conn.execute('SELECT 1 FROM cursors WHERE tenant = ?',
+                                  (new,)).fetchone():
+                return False
+            if not any(self._conn.execute(
+                    f'SELECT 1 FROM {table} WHERE tenant = ? LIMIT 1',
+                    (old,)).fetchone()
+                    for table in ('cursors', 'statuses', 'outbox')):
+                return False
+            self._conn.execute('BEGIN')
+            moved = self._conn.execute(
+                'UPDATE cursors SET tenant = ? WHERE tenant = ?',
+                (new, old)).rowcount
+            for table in ('statuses', 'outbox'):
+                self._conn.execute(
+                    f'UPDATE {table} SET tenant = ? WHERE tenant = ?',
+                    (new, old))
+            self._conn.execute('COMMIT')
+        if moved:
+            logger.info(f'Состояние арендатора {old} перенесено в {new}')
+        return bool(moved)
+
+    def pending_messages(self, tenants=None):
+        """
+        Возвращает неотправленные сообщения в порядке добавления.
+        Сообщения — кортежи (key, chat_id, text); tenants ограничивает
+        выборку арендаторами. Фильтр выполняется в SQL по индексу
+        (tenant, id) пачками по TENANTS_PER_QUERY ключей.
+        """
+        if tenants is None:
+            with self._lock:
+                rows = self._conn.execute(
+                    'SELECT id, key, chat_id, text FROM outbox ORDER BY id'
+                ).fetchall()
+            return [(key, chat_id, text) for _, key, chat_id, text in rows]
+        tenants = list(tenants)
+        rows = []
+        with self._lock:
+            for start in range(0, len(tenants), TENANTS_PER_QUERY):
+                chunk = tenants[start:start + TENANTS_PER_QUERY]
+                rows.extend(self._conn.execute(
+                    'SELECT id, key, chat_id, text FROM outbox '
+                    f'WHERE tenant IN ({", ".join("?" * len(chunk))})',
+                    chunk))
+        rows.sort()
+        return [(key, chat_id, text) for _, key, chat_id, text in rows]
+
+    def ack(self, *keys):
+        """
+        Удаляет доставленные сообщения из outbox.
+        Удаление фиксируется вместе с одновременными checkpoint() и ack()
+        других потоков (group commit). Возвращает управление после fsync.
+        """
+        if keys:
+            self._submit((None, None, (), (), keys))
+
+    def fail(self, *keys):
+        """
+        Засчитывает неудачную попытку доставки сообщений keys.
+        Сообщения, исчерпавшие max_attempts попыток, переносятся
+        в dead_letters; возвращает их ключи.
+        """
+        if not keys:
+            return []
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany(
+                    'UPDATE outbox SET attempts = attempts + 1 '
+                    'WHERE key = ?', [(key,) for key in keys])
+                dead = [row for key in keys for row in self._conn.execute(
+                    'SELECT key, chat_id, attempts FROM outbox '
+                    'WHERE key = ? AND attempts >= ?',
+                    (key, self.max_attempts))]
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO dead_letters '
+                    '(key, tenant, chat_id, text, created, attempts, parked) '
+                    'SELECT key, tenant, chat_id, text, created, attempts, ? '
+                    'FROM outbox WHERE key = ?',
+                    [(time.time(), key) for key, _, _ in dead])
+                self._conn.executemany(
+                    'DELETE FROM outbox WHERE key = ?',
+                    [(key,) for key, _, _ in dead])
+            except sqlite3.Error:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+        for key, chat_id, attempts in dead:
+            logger.error(f'Сообщение {key} в чат {chat_id} не доставлено '
+                         f'за {attempts} попыток и перенесено в dead_letters')
+        return [key for key, _, _ in dead]
+
+    def close(self):
+        """Переносит WAL в основной файл и закрывает базу."""
+        with self._lock:
+            self._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            self._conn.close()
@@ -0,0 +1,124 @@
+import codecs
+import json
+
+from exceptions import CurrentTimeError, JSONDecodeError
+
+
+WHITESPACE = ' \t\n\r'
+
+
+class HomeworkStream:
+    """
+    Потоковый разбор ответа API домашних работ.
+    Принимает итератор байтовых фрагментов тела ответа и по одной
+    отдаёт работы из списка 'homeworks', не загружая тело целиком.
+    Структура проверяется так же, как в check_response: ответ —
+    словарь, 'homeworks' — список, 'current_date' — целое число.
+    current_date доступен после того, как итерация завершена.
+    """
+
+    def __init__(self, chunks, close=None):
+        self._chunks = iter(chunks)
+        self._close = close
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._exhausted = False
+        self._consumed = False
+        self.current_date = None
+
+    def __iter__(self):
+        """Отдаёт работы по одной и проверяет ответ целиком."""
+        if self._consumed:
+            raise RuntimeError('Поток ответа уже прочитан')
+        self._consumed = True
+        try:
+            yield from self._parse()
+        finally:
+            if self._close is not None:
+                self._close()
+
+    def _parse(self):
+        if self._next_char() != '{':
+            raise TypeError('Ответ API не является словарем')
+        self._pos += 1
+        keys = set()
+        while True:
+            char = self._next_char()
+            if char == '}':
+                break
+            if char == ',':
+                self._pos += 1
+                continue
+            key = self._value()
+            if self._next_char() != ':':
+                raise JSONDecodeError('Ожидалось двоеточие в ответе API')
+            self._pos += 1
+            keys.add(key)
+            if key == 'homeworks':
+                if self._next_char() != '[':
+                    raise TypeError('Ответ API не является списком')
+                self._pos += 1
+                yield from self._items()
+            elif key == 'current_date':
+                self.current_date = self._value()
+            else:
+                self._value()
+        self._check_keys(keys)
+
+    def _check_keys(self, keys):
+        if 'homeworks' not in keys:
+            raise KeyError('В ответе API отсутствует домашняя работа')
+        if 'current_date' not in keys:
+            raise CurrentTimeError('В ответе API отсутствует текущее время')
+        if not isinstance(self.current_date, int):
+            raise CurrentTimeError('current_date не является целым числом')
+
+    def _items(self):
+        while True:
+            char = self._next_char()
+            if char == ']':
+                self._pos += 1
+                return
+            if char == ',':
+                self._pos += 1
+                continue
+            yield self._value()
+
+    def _read(self):
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._buffer += self._decoder.decode(b'', final=True)
+            self._exhausted = True
+            return
+        self._buffer = self._buffer[self._pos:] + self._decoder.decode(chunk)
+        self._pos = 0
+
+    def _next_char(self):
+        while True:
+            while (self._pos < len(self._buffer)
+                   and self._buffer[self._pos] in WHITESPACE):
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if self._exhausted:
+                raise JSONDecodeError('Ответ API оборвался')
+            self._read()
+
+    def _value(self):
+        self._next_char()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as error:
+                if self._exhausted:
+                    raise JSONDecodeError(
+                        f'Некорректный JSON в ответе API: {error}')
+            else:
+                # Число в конце буфера может продолжиться в следующем
+                # фрагменте, поэтому принимаем значение только за ним.
+                if end < len(self._buffer) or self._exhausted:
+                    self._pos = end
+                    return value
+            self._read()
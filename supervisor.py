@@ -0,0 +1,258 @@
+from bisect import bisect
+import hashlib
+import logging
+import multiprocessing
+from operator import attrgetter
+import os
+import queue
+import time
+
+import metrics
+
+
+logger = logging.getLogger(__name__)
+
+WORKER_START_METHOD = os.getenv('WORKER_START_METHOD', 'spawn')
+HASH_REPLICAS = int(os.getenv('HASH_REPLICAS', 64))
+HEALTH_INTERVAL = float(os.getenv('HEALTH_INTERVAL', 5))
+HEALTH_TIMEOUT = float(os.getenv('HEALTH_TIMEOUT', 60))
+RESTART_DELAY = float(os.getenv('RESTART_DELAY', 5))
+
+
+def worker_count(value=None):
+    """Число воркеров из WORKER_PROCESSES; auto — по числу ядер."""
+    if value is None:
+        value = os.getenv('WORKER_PROCESSES', '1')
+    if value == 'auto':
+        return os.cpu_count() or 1
+    return max(1, int(value))
+
+
+def _hash(value):
+    return int.from_bytes(
+        hashlib.md5(value.encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    """
+    Кольцо согласованного хеширования.
+    Каждый узел представлен replicas точками на кольце, ключ
+    принадлежит ближайшей точке по часовой стрелке. При удалении
+    узла переезжают только его ключи, при добавлении — примерно
+    1/N ключей остальных узлов.
+    """
+
+    def __init__(self, nodes=(), replicas=HASH_REPLICAS):
+        self.replicas = replicas
+        self._points = []
+        self._owners = []
+        self.nodes = set()
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self):
+        """Число узлов на кольце."""
+        return len(self.nodes)
+
+    def _rebuild(self, ring):
+        ring.sort()
+        self._points = [point for point, _ in ring]
+        self._owners = [node for _, node in ring]
+
+    def add(self, node):
+        """Добавляет узел на кольцо."""
+        self.nodes.add(node)
+        ring = list(zip(self._points, self._owners))
+        ring.extend((_hash(f'{node}#{replica}'), node)
+                    for replica in range(self.replicas))
+        self._rebuild(ring)
+
+    def remove(self, node):
+        """Убирает узел с кольца."""
+        self.nodes.discard(node)
+        self._rebuild([(point, owner) for point, owner
+                       in zip(self._points, self._owners) if owner != node])
+
+    def node_for(self, key):
+        """Возвращает узел, которому принадлежит ключ, или None."""
+        if not self._points:
+            return None
+        index = bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+
+class WorkerState:
+    """Состояние воркера глазами супервизора."""
+
+    def __init__(self, worker_id, process, commands, last_seen):
+        self.worker_id = worker_id
+        self.process = process
+        self.commands = commands
+        self.last_seen = last_seen
+        self.tenants = 0
+        self.snapshot = {}
+        self.restarts = 0
+
+
+class Supervisor:
+    """
+    Родительский процесс режима нескольких воркеров.
+    Запускает workers процессов и распределяет между ними арендаторов
+    по кольцу согласованного хеширования ключа shard_key(tenant),
+    по умолчанию атрибута key; арендаторы с одинаковым ключом
+    всегда попадают к одному воркеру.
+    Воркер вызывает target(worker_id, tenants, commands, events):
+    получает из commands новые назначения ('assign', tenants) и
+    раз в health_interval шлёт в events ('health', worker_id, число
+    арендаторов, снимок метрик). Если воркер завершился или замолчал
+    дольше health_timeout, его арендаторы уходят оставшимся, а через
+    restart_delay он перезапускается и забирает свою долю обратно.
+    Метрики всех воркеров суммируются и отдаются одним /metrics.
+    """
+
+    def __init__(self, tenants, target, workers=None,
+                 health_timeout=HEALTH_TIMEOUT, restart_delay=RESTART_DELAY,
+                 context=None, clock=time.monotonic,
+                 shard_key=attrgetter('key')):
+        self.tenants = list(tenants)
+        self.target = target
+        self.shard_key = shard_key
+        self.workers = worker_count() if workers is None else workers
+        self.health_timeout = health_timeout
+        self.restart_delay = restart_delay
+        self.context = context or multiprocessing.get_context(
+            WORKER_START_METHOD)
+        self.clock = clock
+        self.ring = HashRing()
+        self.states = {}
+        self.events = self.context.Queue()
+        self._restart_at = {}
+        self.registry = metrics.Registry()
+        self.alive = self.registry.register(metrics.Gauge(
+            'homework_bot_worker_up', 'Жив ли воркер.', ('worker',)))
+        self.assigned = self.registry.register(metrics.Gauge(
+            'homework_bot_worker_tenants', 'Арендаторы воркера.',
+            ('worker',)))
+        self.restarts = self.registry.register(metrics.Counter(
+            'homework_bot_worker_restarts_total', 'Перезапуски воркеров.',
+            ('worker',)))
+
+    def assignments(self):
+        """Возвращает словарь worker_id → список арендаторов."""
+        result = {worker_id: [] for worker_id in self.ring.nodes}
+        for tenant in self.tenants:
+            owner = self.ring.node_for(self.shard_key(tenant))
+            if owner is not None:
+                result[owner].append(tenant)
+        return result
+
+    def _spawn(self, worker_id, tenants):
+        commands = self.context.Queue()
+        process = self.context.Process(
+            target=self.target, name=f'homework-worker-{worker_id}',
+            args=(worker_id, tenants, commands, self.events), daemon=True)
+        process.start()
+        state = self.states.get(worker_id)
+        self.states[worker_id] = WorkerState(
+            worker_id, process, commands, self.clock())
+        if state is not None:
+            self.states[worker_id].restarts = state.restarts
+        self.alive.set(str(worker_id), value=1)
+        self.assigned.set(str(worker_id), value=len(tenants))
+        logger.info(f'Запущен воркер {worker_id} (pid {process.pid}), '
+                    f'арендаторов: {len(tenants)}')
+
+    def _rebalance(self, skip=None):
+        for worker_id, tenants in self.assignments().items():
+            self.assigned.set(str(worker_id), value=len(tenants))
+            if worker_id != skip:
+                self.states[worker_id].commands.put(('assign', tenants))
+
+    def start(self):
+        """Запускает воркеры с начальным распределением арендаторов."""
+        for worker_id in range(self.workers):
+            self.ring.add(worker_id)
+        for worker_id, tenants in self.assignments().items():
+            self._spawn(worker_id, tenants)
+
+    def _drain_events(self, timeout):
+        try:
+            event = self.events.get(timeout=timeout)
+        except queue.Empty:
+            return
+        while True:
+            kind, worker_id, tenants, snapshot = event
+            state = self.states.get(worker_id)
+            if kind == 'health' and state is not None:
+                state.last_seen = self.clock()
+                state.tenants = tenants
+                state.snapshot = snapshot
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                return
+
+    def _on_failure(self, state, reason):
+        logger.error(f'Воркер {state.worker_id} {reason}, '
+                     f'арендаторы переданы остальным')
+        if state.process.is_alive():
+            state.process.kill()
+        state.process.join()
+        self.ring.remove(state.worker_id)
+        self.alive.set(str(state.worker_id), value=0)
+        self.assigned.set(str(state.worker_id), value=0)
+        state.snapshot = {}
+        self._restart_at[state.worker_id] = self.clock() + self.restart_delay
+        if self.ring.nodes:
+            self._rebalance()
+
+    def check(self, timeout=0):
+        """
+        Обрабатывает события воркеров и следит за их здоровьем.
+        Арендаторы упавших и зависших воркеров перераспределяются,
+        а сами воркеры перезапускаются через restart_delay.
+        """
+        self._drain_events(timeout)
+        now = self.clock()
+        for worker_id, state in list(self.states.items()):
+            if worker_id in self._restart_at:
+                continue
+            if not state.process.is_alive():
+                self._on_failure(
+                    state, f'завершился с кодом {state.process.exitcode}')
+            elif now - state.last_seen > self.health_timeout:
+                self._on_failure(state, 'не отвечает')
+        now = self.clock()
+        for worker_id, restart_at in list(self._restart_at.items()):
+            if now < restart_at:
+                continue
+            del self._restart_at[worker_id]
+            self.ring.add(worker_id)
+            self.restarts.inc(str(worker_id))
+            self.states[worker_id].restarts += 1
+            self._spawn(worker_id, self.assignments()[worker_id])
+            self._rebalance(skip=worker_id)
+
+    def render(self):
+        """Отдаёт метрики всех воркеров и самого супервизора."""
+        snapshots = [state.snapshot for state in self.states.values()]
+        return (metrics.REGISTRY.render(snapshots)
+                + self.registry.render())
+
+    def run(self, interval=HEALTH_INTERVAL):
+        """Запускает воркеры и следит за ними до остановки процесса."""
+        self.start()
+        metrics.start_metrics_server(registry=self)
+        try:
+            while True:
+                self.check(timeout=interval)
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Останавливает все воркеры."""
+        for state in self.states.values():
+            if state.process.is_alive():
+                state.process.terminate()
+        for state in self.states.values():
+            state.process.join()
@@ -0,0 +1,144 @@
+import asyncio
+from datetime import datetime, timezone
+import json
+import threading
+import time
+
+import pytest
+
+from backfill import plan_windows, run_backfill, window_homeworks
+from engine import PollingEngine, Tenant
+from storage import CheckpointStore
+from streaming import HomeworkStream
+from utils import RecordingBot
+
+DAY = 24 * 3600
+
+
+def iso(moment):
+    return datetime.fromtimestamp(moment, timezone.utc).isoformat()
+
+
+class TestPlanWindows:
+
+    def test_gap_is_split_into_windows(self):
+        assert plan_windows(0, 250, 100) == [
+            (0, 100), (100, 200), (200, None)], (
+            'Проверьте, что последнее окно открыто справа'
+        )
+        assert plan_windows(0, 50, 100) == [(0, None)]
+
+    def test_window_count_is_capped(self):
+        windows = plan_windows(0, 365 * DAY, DAY, max_windows=8)
+
+        assert len(windows) == 8, (
+            'Проверьте, что для долгого простоя окна укрупняются'
+        )
+        assert windows[0][0] == 0 and windows[-1][1] is None
+        assert all(end == start for (_, end), (start, _)
+                   in zip(windows, windows[1:])), 'Окна должны стыковаться'
+
+
+class TestWindowHomeworks:
+    HOMEWORKS = [
+        {'homework_name': 'old', 'date_updated': iso(50)},
+        {'homework_name': 'inside', 'date_updated': iso(150)},
+        {'homework_name': 'edge', 'date_updated': iso(200)},
+        {'homework_name': 'undated'},
+    ]
+
+    def test_window_keeps_only_its_updates(self):
+        names = [item['homework_name']
+                 for item in window_homeworks(self.HOMEWORKS, 100, 200)]
+
+        assert names == ['inside'], (
+            'Проверьте, что окно [start, end) отбрасывает чужие работы'
+        )
+
+    def test_last_window_takes_undated(self):
+        names = [item['homework_name']
+                 for item in window_homeworks(self.HOMEWORKS, 100, None)]
+
+        assert names == ['inside', 'edge', 'undated']
+
+
+class TestRunBackfill:
+
+    def test_windows_are_processed_in_order(self):
+        processed = []
+        release = threading.Event()
+
+        def fetch(start, end):
+            if start == 0:
+                release.wait(5)
+            else:
+                release.set()
+            return 1000, [start]
+
+        cursor = run_backfill(
+            fetch, 0, 400, lambda homeworks, cursor: processed.append(
+                (homeworks, cursor)), window=100, concurrency=4)
+
+        assert processed == [([0], 100), ([100], 200), ([200], 300),
+                             ([300], 1000)], (
+            'Проверьте, что окна обрабатываются по порядку, даже если '
+            'ответы пришли в другом'
+        )
+        assert cursor == 1000
+
+    def test_failure_keeps_cursor_of_last_window(self):
+        saved = []
+
+        def fetch(start, end):
+            if start >= 200:
+                raise ConnectionError('API недоступно')
+            return 1000, []
+
+        with pytest.raises(ConnectionError):
+            run_backfill(fetch, 0, 400,
+                         lambda homeworks, cursor: saved.append(cursor),
+                         window=100, concurrency=2)
+
+        assert saved == [100, 200], (
+            'Проверьте, что курсор остаётся на последнем обработанном окне'
+        )
+
+
+class TestEngineBackfill:
+
+    def test_stream_backfill_delivers_in_order_and_saves_cursor(self):
+        now = int(time.time())
+        started = now - 3 * DAY
+        homeworks = [
+            {'id': 2, 'homework_name': 'second', 'status': 'approved',
+             'date_updated': iso(started + 2 * DAY + 10)},
+            {'id': 1, 'homework_name': 'first', 'status': 'rejected',
+             'date_updated': iso(started + 10)},
+        ]
+        calls = []
+
+        def fetch(token, from_date):
+            calls.append(from_date)
+            body = json.dumps({'homeworks': homeworks, 'current_date': now})
+            return HomeworkStream([body.encode()])
+
+        store = CheckpointStore(':memory:')
+        bot = RecordingBot()
+        tenant = Tenant('tok', '1', started)
+        polling = PollingEngine(bot, [tenant], fetch=fetch, store=store,
+                                backfill_window=DAY, backfill_concurrency=2)
+        asyncio.run(polling.run_once())
+        polling.close()
+
+        assert len(calls) == 3, 'Проверьте, что пропуск делится на окна'
+        assert tenant.from_date == now, (
+            'Проверьте, что current_date потока читается после разбора'
+        )
+        assert store.get_cursor(tenant.key, 0) == now
+        assert [text for _, text in bot.sent] == [
+            'Изменился статус проверки работы "first".'
+            'Работа проверена: у ревьюера есть замечания.',
+            'Изменился статус проверки работы "second".'
+            'Работа проверена: ревьюеру всё понравилось. Ура!',
+        ], 'Проверьте, что изменения доставляются по date_updated'
+        store.close()
@@ -0,0 +1,29 @@
+from benchmarks.bench_pipeline import compare
+
+BASELINE = {
+    'stages': {'parse_status': {'cost': 1.0, 'peak_bytes': 144}},
+    'allowances': {'parse_status': {
+        'user-000': {'cost': 0.5, 'peak_bytes': 0, 'reason': 'тест'}}},
+}
+
+
+def result(cost, peak_bytes):
+    return {'parse_status': {'cost': cost, 'ops_per_sec': 1.0,
+                             'peak_bytes': peak_bytes}}
+
+
+class TestPipelineGate:
+
+    def test_allowance_is_added_to_baseline(self):
+        assert compare(result(1.9, 144), BASELINE, 0.3) == [], (
+            'Проверьте, что допуск прибавляется к замеру baseline'
+        )
+        assert compare(result(2.0, 144), BASELINE, 0.3) == ['parse_status']
+
+    def test_small_memory_changes_are_ignored(self):
+        assert compare(result(1.0, 176), BASELINE, 0.3) == [], (
+            'Проверьте, что рост памяти меньше MEMORY_FLOOR не считается '
+            'регрессией'
+        )
+        assert compare(result(1.0, 144 + 2048), BASELINE, 0.3) == [
+            'parse_status']
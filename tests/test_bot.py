@@ -1,8 +1,13 @@
 import os
 from http import HTTPStatus
+import time
 
-import requests
+import pytest
 import telegram
+
+from storage import CheckpointStore
+from throttle import RequestThrottle
+import transport
 import utils
 
 
@@ -186,7 +191,7 @@ class TestHomework:
                 current_timestamp=current_timestamp, **kwargs
             )
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        monkeypatch.setattr(transport, 'get', mock_response_get)
 
         import homework
 
@@ -232,7 +237,7 @@ class TestHomework:
             response.json = json_invalid
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_500_response_get)
+        monkeypatch.setattr(transport, 'get', mock_500_response_get)
 
         import homework
 
@@ -315,7 +320,7 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        monkeypatch.setattr(transport, 'get', mock_response_get)
 
         import homework
 
@@ -352,7 +357,7 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        monkeypatch.setattr(transport, 'get', mock_response_get)
 
         import homework
 
@@ -400,7 +405,7 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        monkeypatch.setattr(transport, 'get', mock_response_get)
 
         import homework
 
@@ -448,7 +453,7 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        monkeypatch.setattr(transport, 'get', mock_response_get)
 
         import homework
 
@@ -484,7 +489,7 @@ class TestHomework:
             response.json = json_invalid
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_no_homeworks_response_get)
+        monkeypatch.setattr(transport, 'get', mock_no_homeworks_response_get)
 
         import homework
 
@@ -525,7 +530,7 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        monkeypatch.setattr(transport, 'get', mock_response_get)
 
         import homework
 
@@ -565,7 +570,7 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        monkeypatch.setattr(transport, 'get', mock_response_get)
 
         import homework
 
@@ -599,7 +604,7 @@ class TestHomework:
             response.json = json_invalid
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_empty_response_get)
+        monkeypatch.setattr(transport, 'get', mock_empty_response_get)
 
         import homework
 
@@ -626,7 +631,7 @@ class TestHomework:
             )
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        monkeypatch.setattr(transport, 'get', mock_response_get)
 
         import homework
 
@@ -640,3 +645,55 @@ class TestHomework:
                 f'Убедитесь, что в функции `{func_name}` обрабатываете ситуацию, '
                 'когда API возвращает код, отличный от 200'
             )
+
+
+class TestMain:
+
+    def test_dead_subscriber_does_not_stop_polling(self, tmp_path,
+                                                    monkeypatch):
+        import homework
+
+        calls = []
+        cycles = []
+
+        class StopLoop(Exception):
+            pass
+
+        def get_api_answer(from_date):
+            calls.append(from_date)
+            return {'homeworks': [{'id': len(calls), 'status': 'approved',
+                                   'homework_name': f'hw{len(calls)}'}],
+                    'current_date': int(time.time())}
+
+        def sleep(delay):
+            cycles.append(delay)
+            if len(cycles) >= 8:
+                raise StopLoop
+
+        bot = utils.RecordingBot(broken={'dead'})
+
+        monkeypatch.setattr(homework, 'load_config', lambda: None)
+        monkeypatch.setattr(homework, 'PRACTICUM_TOKEN', 'tok')
+        monkeypatch.setattr(homework, 'TELEGRAM_TOKEN', '1234:abcdefg')
+        monkeypatch.setattr(homework, 'TELEGRAM_CHAT_ID', 'ok')
+        monkeypatch.setattr(homework, 'TELEGRAM_SUBSCRIBERS', 'dead')
+        monkeypatch.setattr(telegram, 'Bot', lambda **kwargs: bot)
+        monkeypatch.setattr(homework.metrics, 'start_metrics_server',
+                            lambda: None)
+        monkeypatch.setattr(homework, 'CheckpointStore', lambda: (
+            CheckpointStore(str(tmp_path / 'state.sqlite3'))))
+        monkeypatch.setattr(homework, 'RequestThrottle', lambda: (
+            RequestThrottle(str(tmp_path / 'throttle.sqlite3'))))
+        monkeypatch.setattr(homework, 'get_api_answer', get_api_answer)
+        monkeypatch.setattr(homework.transport, 'prewarm', lambda url: None)
+        monkeypatch.setattr(homework.time, 'sleep', sleep)
+
+        with pytest.raises(StopLoop):
+            homework.main()
+
+        assert len(calls) == 4, (
+            'Проверьте, что недоступный подписчик не останавливает опрос API'
+        )
+        assert [chat for chat, _ in bot.sent] == ['ok'] * 4, (
+            'Проверьте, что основной чат получает каждое уведомление'
+        )
@@ -0,0 +1,129 @@
+import pytest
+
+from benchmarks.replay_cassette import replay
+import cassette
+from cassette import CassettePlayer, CassetteRecorder
+from exceptions import RateLimitError, SendMessageError
+import homework
+from streaming import HomeworkStream
+
+TOKEN = 'secret-practicum-token'
+RESPONSE = {
+    'homeworks': [{'id': 1, 'homework_name': 'hw', 'status': 'approved',
+                   'date_updated': '2022-10-26T18:07:39Z'}],
+    'current_date': 1000,
+}
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 0.5
+        return self.now
+
+
+def record(path):
+    recorder = CassetteRecorder(path, clock=FakeClock())
+    calls = iter([RESPONSE, RateLimitError('Превышен лимит', 429, 30)])
+
+    def fetch(token, from_date):
+        result = next(calls)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def send(bot, chat_id, message):
+        if chat_id == 'dead':
+            raise SendMessageError('Chat not found')
+
+    request = recorder.record_api(fetch)
+    send_message = recorder.record_send(send)
+    assert request(TOKEN, 0) == RESPONSE
+    with pytest.raises(RateLimitError):
+        request(TOKEN, 1000)
+    send_message(None, 'ok', 'текст')
+    with pytest.raises(SendMessageError):
+        send_message(None, 'dead', 'текст')
+    recorder.close()
+
+
+class TestCassette:
+
+    def test_tokens_are_redacted(self, tmp_path):
+        path = str(tmp_path / 'traffic.bin')
+        record(path)
+
+        with open(path, 'rb') as file:
+            data = file.read()
+        assert TOKEN.encode() not in data, (
+            'Проверьте, что токен не попадает в кассету'
+        )
+        assert b'token-1' in data
+
+    def test_replay_returns_responses_errors_and_timings(self, tmp_path):
+        path = str(tmp_path / 'traffic.bin')
+        record(path)
+        pauses = []
+        player = CassettePlayer(path, speed=10, sleep=pauses.append)
+
+        assert player.request('other-token', 0) == RESPONSE, (
+            'Проверьте, что токены воспроизведения сопоставляются '
+            'псевдонимам по порядку появления'
+        )
+        with pytest.raises(RateLimitError) as error:
+            player.request('other-token', 1000)
+        assert error.value.retry_after == 30
+        player.send(None, 'ok', 'текст')
+        with pytest.raises(SendMessageError):
+            player.send(None, 'ok', 'текст')
+        assert pauses == [0.05] * 4, (
+            'Проверьте, что задержки воспроизводятся с ускорением speed'
+        )
+        player.close()
+
+    def test_stream_is_recorded_and_replayed(self, tmp_path):
+        path = str(tmp_path / 'traffic.bin')
+        recorder = CassetteRecorder(path)
+        stream = recorder.record_stream(
+            lambda token, from_date: HomeworkStream(
+                [b'{"homeworks": [{"id": 1}], "current_date": 5}']))
+        replayed = stream(TOKEN, 0)
+        assert list(replayed) == [{'id': 1}]
+        assert replayed.current_date == 5
+        recorder.close()
+
+        player = CassettePlayer(path, speed=0)
+        replayed = player.stream(TOKEN, 0)
+        assert list(replayed) == [{'id': 1}]
+        assert replayed.current_date == 5
+        player.close()
+
+    def test_install_replaces_network_calls(self, tmp_path, monkeypatch):
+        path = str(tmp_path / 'traffic.bin')
+        record(path)
+        for name in ('request_homework_statuses', 'stream_homework_statuses',
+                     'send_message_to_chat'):
+            monkeypatch.setattr(homework, name, getattr(homework, name))
+        monkeypatch.setattr(homework, 'PRACTICUM_TOKEN', TOKEN)
+
+        player = cassette.install('replay', path, speed=0)
+
+        assert homework.get_api_answer(0) == RESPONSE, (
+            'Проверьте, что get_api_answer читает ответ из кассеты'
+        )
+        player.close()
+
+    def test_replay_benchmark_runs_pipeline(self, tmp_path):
+        path = str(tmp_path / 'traffic.bin')
+        record(path)
+        player = CassettePlayer(path, speed=0)
+
+        count, stages, errors = replay(player)
+        player.close()
+
+        assert count == 2
+        assert errors == {'RateLimitError': 1}
+        assert 'send_message' in stages
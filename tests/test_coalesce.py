@@ -0,0 +1,105 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import pytest
+
+from coalesce import RequestCoalescer
+from engine import PollingEngine, Tenant
+from utils import RecordingBot
+
+
+class TestRequestCoalescer:
+
+    def test_concurrent_calls_share_one_request(self):
+        coalescer = RequestCoalescer(window=60)
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def fetch(from_date):
+            calls.append(from_date)
+            started.set()
+            release.wait(5)
+            return {'current_date': from_date}
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            leader = executor.submit(coalescer.call, 'tok', 125, fetch)
+            started.wait(5)
+            followers = [executor.submit(coalescer.call, 'tok', 130, fetch)
+                         for _ in range(4)]
+            release.set()
+            results = [leader.result()] + [
+                follower.result() for follower in followers]
+
+        assert calls == [120], (
+            'Проверьте, что одновременные запросы одного окна объединяются '
+            'и from_date округляется до начала окна'
+        )
+        assert all(result is results[0] for result in results)
+
+    def test_cache_expires_and_evicts_least_recent(self):
+        now = [0.0]
+        coalescer = RequestCoalescer(
+            window=60, ttl=10, max_entries=2, clock=lambda: now[0])
+        calls = []
+
+        def fetch(from_date):
+            calls.append(from_date)
+            return from_date
+
+        coalescer.call('a', 0, fetch)
+        coalescer.call('b', 0, fetch)
+        coalescer.call('a', 30, fetch)
+        coalescer.call('c', 0, fetch)
+        coalescer.call('a', 0, fetch)
+        assert len(calls) == 3, (
+            'Проверьте, что свежий ответ отдаётся из кэша'
+        )
+        coalescer.call('b', 0, fetch)
+        assert len(calls) == 4, (
+            'Проверьте, что при переполнении вытесняется давний ключ'
+        )
+        now[0] = 10
+        coalescer.call('a', 0, fetch)
+        assert len(calls) == 5, 'Проверьте, что ответ устаревает через ttl'
+
+    def test_errors_are_not_cached(self):
+        coalescer = RequestCoalescer()
+        calls = []
+
+        def fetch(from_date):
+            calls.append(from_date)
+            raise ConnectionError('API недоступно')
+
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                coalescer.call('tok', 0, fetch)
+        assert len(calls) == 2
+
+    def test_engine_requests_scale_with_tokens(self):
+        calls = []
+
+        def fetch(token, from_date):
+            calls.append(token)
+            return {
+                'homeworks': [{'id': 1, 'homework_name': 'hw',
+                               'status': 'approved'}],
+                'current_date': 500
+            }
+
+        bot = RecordingBot()
+        tenants = [Tenant(token, chat, 0)
+                   for token in ('tok1', 'tok2')
+                   for chat in ('student', 'mentor', 'group')]
+        polling = PollingEngine(
+            bot, tenants, fetch=fetch, coalescer=RequestCoalescer())
+        asyncio.run(polling.run_once())
+        polling.close()
+
+        assert sorted(calls) == ['tok1', 'tok2'], (
+            'Проверьте, что чаты с общим токеном делят один запрос к API'
+        )
+        assert len(bot.sent) == 6, (
+            'Проверьте, что каждый чат получает своё уведомление'
+        )
@@ -0,0 +1,166 @@
+import asyncio
+from types import SimpleNamespace
+
+from commands import (CommandHandler, CommandPoller, format_reply,
+                      parse_command, serve_commands)
+from engine import PollingEngine, Tenant
+from homework_index import HomeworkIndex
+from utils import RecordingBot
+
+
+def update(update_id, chat_id, text):
+    message = SimpleNamespace(chat_id=chat_id, text=text)
+    return SimpleNamespace(update_id=update_id, effective_message=message)
+
+
+class UpdatesBot(RecordingBot):
+
+    def __init__(self, batches):
+        super().__init__()
+        self.batches = list(batches)
+        self.offsets = []
+
+    def get_updates(self, offset=None, timeout=0, allowed_updates=None):
+        self.offsets.append(offset)
+        return self.batches.pop(0) if self.batches else []
+
+
+class OncePoller:
+
+    timeout = 30
+
+    def __init__(self, commands):
+        self.commands = list(commands)
+
+    def poll(self, timeout=None):
+        commands, self.commands = self.commands, []
+        return commands
+
+
+def index_with(*homeworks):
+    index = HomeworkIndex()
+    for homework_item in homeworks:
+        index.apply(homework_item)
+    return index
+
+
+class TestCommands:
+
+    def test_parse_command(self):
+        assert parse_command('/status') == 'status'
+        assert parse_command('/History@homework_bot 5') == 'history'
+        assert parse_command('статус') is None
+        assert parse_command(None) is None
+
+    def test_records_are_newest_first_and_merge_pending(self):
+        index = index_with(
+            {'id': 1, 'homework_name': 'hw1', 'status': 'approved',
+             'date_updated': '2022-10-01T00:00:00Z'},
+            {'id': 2, 'homework_name': 'hw2', 'status': 'reviewing',
+             'date_updated': '2022-10-02T00:00:00Z'})
+
+        records = index.records([
+            {'id': 1, 'homework_name': 'hw1', 'status': 'rejected',
+             'date_updated': '2022-10-03T00:00:00Z'}])
+
+        assert [record[1:3] for record in records] == [
+            ('hw1', 'rejected'), ('hw2', 'reviewing')], (
+            'Проверьте, что records сортирует работы от свежих к давним '
+            'и учитывает непримененные статусы'
+        )
+        assert index.get('1')[0] == 'approved', (
+            'Проверьте, что records не меняет индекс'
+        )
+
+    def test_format_reply(self):
+        records = index_with(
+            {'id': 1, 'homework_name': 'hw1', 'status': 'approved'}).records()
+
+        assert 'hw1' in format_reply('status', records)
+        assert format_reply('history', records).startswith(
+            'История проверки работ: 1')
+        assert format_reply('status', []) == (
+            'Пока нет данных о проверке работ.')
+
+    def test_poller_confirms_updates(self):
+        bot = UpdatesBot([[update(7, 1, '/status'), update(8, 2, 'привет')],
+                          [update(9, 1, '/history')]])
+        poller = CommandPoller(bot, timeout=0)
+
+        assert poller.poll() == [('1', 'status')]
+        assert poller.poll() == [('1', 'history')]
+        assert bot.offsets == [None, 9], (
+            'Проверьте, что полученные обновления подтверждаются offset'
+        )
+
+    def test_serve_commands_answers_only_recipients(self, monkeypatch):
+        monkeypatch.setattr('commands.time.sleep', lambda seconds: None)
+        bot = UpdatesBot([])
+        index = index_with(
+            {'id': 1, 'homework_name': 'hw1', 'status': 'approved'})
+        poller = OncePoller([('1', 'status'), ('666', 'status')])
+
+        serve_commands(bot, poller, ('1',), index, seconds=2)
+
+        assert [chat for chat, _ in bot.sent] == ['1'], (
+            'Проверьте, что бот отвечает только своим получателям'
+        )
+        assert 'hw1' in bot.sent[0][1]
+
+
+class TestCommandHandler:
+
+    def build(self, polled_at):
+        calls = []
+
+        def fetch(token, from_date):
+            calls.append(token)
+            return {'homeworks': [{'id': 1, 'homework_name': 'hw1',
+                                   'status': 'rejected'}],
+                    'current_date': from_date + 10}
+
+        bot = UpdatesBot([])
+        tenant = Tenant('tok', '1', 100, subscribers=('2',))
+        tenant.index.apply({'id': 1, 'homework_name': 'hw1',
+                            'status': 'approved'})
+        tenant.polled_at = polled_at
+        polling = PollingEngine(bot, [tenant], fetch=fetch)
+        handler = CommandHandler(polling, poller=OncePoller([]),
+                                 max_age=60, clock=lambda: 1000)
+        return polling, handler, calls
+
+    def test_fresh_index_answers_without_api(self):
+        polling, handler, calls = self.build(polled_at=990)
+
+        asyncio.run(handler.handle('2', 'status'))
+        polling.close()
+
+        assert calls == [], (
+            'Проверьте, что при свежем индексе API не запрашивается'
+        )
+        assert polling.bot.sent == [
+            ('2', 'Статус проверки работы "hw1": '
+                  'Работа проверена: ревьюеру всё понравилось. Ура!')]
+
+    def test_stale_index_is_refreshed_once(self):
+        polling, handler, calls = self.build(polled_at=None)
+        tenant = polling.tenants[0]
+
+        asyncio.run(handler.handle('1', 'status'))
+        polling.close()
+
+        assert calls == ['tok']
+        assert 'замечания' in polling.bot.sent[0][1]
+        assert tenant.index.get('1')[0] == 'approved' and tenant.from_date == 100, (
+            'Проверьте, что ответ на команду не меняет состояние '
+            'арендатора и не отменяет уведомление'
+        )
+
+    def test_unknown_chat(self):
+        polling, handler, calls = self.build(polled_at=990)
+
+        asyncio.run(handler.handle('666', 'history'))
+        polling.close()
+
+        assert polling.bot.sent == [
+            ('666', 'Для этого чата не отслеживаются работы.')]
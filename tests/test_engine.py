@@ -0,0 +1,185 @@
+import asyncio
+from copy import copy
+import json
+import logging
+import pickle
+import threading
+import time
+
+import engine
+from engine import PollingEngine, Tenant
+from storage import CheckpointStore
+from utils import RecordingBot
+
+
+class TestTenant:
+
+    def test_state_is_compact(self):
+        tenant = Tenant('tok', '1', 100)
+
+        assert not hasattr(tenant, '__dict__'), (
+            'Проверьте, что Tenant хранит атрибуты в __slots__'
+        )
+        assert tenant._notifier is None, (
+            'Проверьте, что ErrorNotifier создаётся только при сбое'
+        )
+        assert tenant.recovered() is None
+        tenant.notifier.alert(ConnectionError('API недоступно'))
+        assert 'восстановлена' in tenant.recovered()
+        assert tenant._notifier is None, (
+            'Проверьте, что после восстановления ErrorNotifier освобождается'
+        )
+
+    def test_copy_pickle_and_compare(self):
+        tenant = Tenant('tok', '1', 100, subscribers=('2',))
+        tenant.index.apply({'id': 1, 'status': 'approved'})
+
+        restored = pickle.loads(pickle.dumps(tenant))
+        assert restored == tenant and restored.statuses() == ['approved']
+        assert copy(tenant) == tenant and copy(tenant) is not tenant
+        assert Tenant('tok', '1', 100) != Tenant('tok', '1', 200)
+        assert 'from_date=100' in repr(tenant)
+
+
+class TestPollingEngine:
+
+    def test_poll_sends_status_to_tenant_chat(self):
+        def fetch(token, from_date):
+            return {
+                'homeworks': [{'homework_name': token, 'status': 'approved'}],
+                'current_date': from_date + 10
+            }
+
+        bot = RecordingBot()
+        now = int(time.time())
+        tenants = [Tenant('tok1', '1', now - 100),
+                   Tenant('tok2', '2', now - 200)]
+        polling = PollingEngine(bot, tenants, fetch=fetch)
+        asyncio.run(polling.run_once())
+        polling.close()
+
+        assert sorted(chat for chat, _ in bot.sent) == ['1', '2'], (
+            'Проверьте, что движок отправляет статус в чат каждого арендатора'
+        )
+        assert [t.from_date for t in tenants] == [now - 90, now - 190], (
+            'Проверьте, что движок сдвигает from_date на current_date'
+        )
+
+    def test_stage_durations_are_logged(self, caplog):
+        def fetch(token, from_date):
+            return {
+                'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+                'current_date': from_date + 10
+            }
+
+        polling = PollingEngine(RecordingBot(), [Tenant('tok', '1', 0)],
+                                fetch=fetch)
+        with caplog.at_level(logging.INFO, logger='engine'):
+            asyncio.run(polling.run_once())
+        polling.close()
+
+        stages = {record.stage: record for record in caplog.records
+                  if getattr(record, 'duration', None) is not None}
+        assert sorted(stages) == ['checkpoint', 'fetch', 'poll', 'send'], (
+            'Проверьте, что длительность каждого этапа опроса пишется '
+            'в лог с уровнем INFO'
+        )
+        assert all(record.tenant == '1:tok' and record.levelno == logging.INFO
+                   for record in stages.values())
+
+    def test_api_error_is_reported_to_chat(self):
+        def fetch(token, from_date):
+            return {'current_date': from_date}
+
+        bot = RecordingBot()
+        polling = PollingEngine(bot, [Tenant('tok', '7', 0)], fetch=fetch)
+        asyncio.run(polling.run_once())
+        polling.close()
+
+        assert len(bot.sent) == 1 and bot.sent[0][0] == '7'
+        assert bot.sent[0][1].startswith('Сбой в работе программы')
+
+    def test_in_flight_requests_are_limited(self):
+        lock = threading.Lock()
+        state = {'now': 0, 'peak': 0}
+
+        def fetch(token, from_date):
+            with lock:
+                state['now'] += 1
+                state['peak'] = max(state['peak'], state['now'])
+            time.sleep(0.01)
+            with lock:
+                state['now'] -= 1
+            return {'homeworks': [], 'current_date': from_date}
+
+        tenants = [Tenant(f'tok{i}', str(i), 0) for i in range(40)]
+        polling = PollingEngine(
+            RecordingBot(), tenants, max_in_flight=4, fetch=fetch)
+        asyncio.run(polling.run_once())
+        polling.close()
+
+        assert state['peak'] <= 4, (
+            'Проверьте, что движок ограничивает число одновременных запросов'
+        )
+
+    def test_assign_replaces_tenants(self):
+        kept, dropped = Tenant('tok1', '1', 0), Tenant('tok2', '2', 0)
+        polling = PollingEngine(RecordingBot(), [kept, dropped])
+        for tenant in (kept, dropped):
+            polling.scheduler.add(tenant)
+        added = Tenant('tok3', '3', 0)
+        polling.assign([Tenant('tok1', '1', 0), added])
+        polling.close()
+
+        assert polling.tenants == [kept, added], (
+            'Проверьте, что assign сохраняет состояние оставшихся '
+            'арендаторов и добавляет новых'
+        )
+        due = [tenant for tenant in polling.scheduler.pop_due()
+               if polling._assigned.get(tenant.key) is tenant]
+        assert dropped not in due and added in due
+
+    def test_load_tenants_from_file(self, tmp_path):
+        path = tmp_path / 'tenants.json'
+        path.write_text(json.dumps([
+            {'token': 'a', 'chat_id': 1},
+            {'token': 'b', 'chat_id': 2, 'subscribers': [3, '4'],
+             'digest_window': 30}]))
+
+        tenants = engine.load_tenants(str(path))
+
+        assert [(t.token, t.chat_id) for t in tenants] == [
+            ('a', '1'), ('b', '2')]
+        assert [t.recipients for t in tenants] == [('1',), ('2', '3', '4')]
+        assert [t.digest_window for t in tenants] == [0, 30]
+
+    def test_fan_out_isolates_failing_recipient(self, tmp_path):
+        def fetch(token, from_date):
+            return {
+                'homeworks': [{'id': 1, 'homework_name': 'hw',
+                               'status': 'approved'}],
+                'current_date': from_date + 10
+            }
+
+        store = CheckpointStore(str(tmp_path / 'state.sqlite3'))
+        bot = RecordingBot(broken={'3'})
+        tenant = Tenant('tok', '1', 0, subscribers=('2', '3', '4'))
+        polling = PollingEngine(bot, [tenant], fetch=fetch, store=store)
+        asyncio.run(polling.run_once())
+
+        assert sorted(chat for chat, _ in bot.sent) == ['1', '2', '4'], (
+            'Проверьте, что сбой в одном чате не мешает рассылке остальным'
+        )
+        assert len({text for _, text in bot.sent}) == 1
+        assert [chat for _, chat, _ in store.pending_messages()] == ['3']
+
+        bot.broken.clear()
+        asyncio.run(polling.replay_outbox())
+        asyncio.run(polling.run_once())
+        polling.close()
+        store.close()
+
+        assert sorted(chat for chat, _ in bot.sent) == ['1', '2', '3', '4'], (
+            'Проверьте, что повтор доставляет сообщение только '
+            'недоступному ранее чату'
+        )
@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestLoadEnv:
+
+    def test_env_file_reaches_import_time_settings(self, tmp_path):
+        (tmp_path / '.env').write_text(
+            'MAX_IN_FLIGHT=7\nTELEGRAM_GLOBAL_RATE=5\nLEASE_TTL=90\n')
+        environ = {name: value for name, value in os.environ.items()
+                   if name not in ('MAX_IN_FLIGHT', 'TELEGRAM_GLOBAL_RATE',
+                                   'LEASE_TTL')}
+        environ['PYTHONPATH'] = ROOT
+        code = ('import engine, leasing, send_queue\n'
+                'print(engine.MAX_IN_FLIGHT, send_queue.GLOBAL_RATE, '
+                'leasing.LEASE_TTL)')
+        output = subprocess.run(
+            [sys.executable, '-c', code], cwd=tmp_path, env=environ,
+            capture_output=True, text=True, check=True).stdout
+
+        assert output.split() == ['7', '5.0', '90.0'], (
+            'Проверьте, что настройки из .env видны модулям, '
+            'которые читают окружение при импорте'
+        )
@@ -0,0 +1,111 @@
+import asyncio
+import random
+
+from engine import PollingEngine, Tenant
+import homework
+import homework_index
+from homework_index import HomeworkIndex, status_code, status_name
+from utils import RecordingBot
+
+
+class TestHomeworkIndex:
+
+    def test_diff_returns_only_transitions(self):
+        index = HomeworkIndex({'1': ('reviewing', '2022-01-01T00:00:00Z')})
+        homeworks = [
+            {'id': 1, 'homework_name': 'a', 'status': 'reviewing',
+             'date_updated': '2022-01-01T00:00:00Z'},
+            {'id': 2, 'homework_name': 'b', 'status': 'approved',
+             'date_updated': '2022-01-03T00:00:00Z'},
+            {'id': 3, 'homework_name': 'c', 'status': 'rejected',
+             'date_updated': '2022-01-02T00:00:00Z'},
+        ]
+
+        changed = index.diff(homeworks)
+
+        assert [hw['id'] for hw in changed] == [3, 2], (
+            'Проверьте, что diff возвращает только новые статусы '
+            'в порядке date_updated'
+        )
+
+    def test_duplicates_collapse_to_latest(self):
+        index = HomeworkIndex()
+        homeworks = [
+            {'id': 1, 'status': 'approved', 'date_updated': '2022-01-02'},
+            {'id': 1, 'status': 'reviewing', 'date_updated': '2022-01-01'},
+        ]
+
+        changed = index.diff(homeworks)
+
+        assert [hw['status'] for hw in changed] == ['approved']
+
+    def test_diff_stream_matches_diff(self):
+        rng = random.Random(7)
+        for _ in range(300):
+            index = HomeworkIndex({'1': ('reviewing', '2022-01-01')})
+            homeworks = [
+                {'id': rng.randint(1, 3),
+                 'status': rng.choice(['approved', 'reviewing']),
+                 'date_updated': f'2022-01-0{rng.randint(1, 4)}'}
+                for _ in range(rng.randint(0, 6))]
+
+            assert index.diff_stream(iter(homeworks)) == index.diff(
+                homeworks), (
+                'Проверьте, что потоковый diff схлопывает повторы '
+                'и упорядочивает работы так же, как diff'
+            )
+
+    def test_apply_and_bounded_size(self):
+        index = HomeworkIndex(max_size=2)
+        for number in range(3):
+            index.apply({'id': number, 'status': 'approved'})
+
+        assert len(index) == 2
+        assert '0' not in index and index.get('2') == ('approved', None)
+        assert index.diff([{'id': 2, 'status': 'approved'}]) == []
+
+    def test_statuses_are_stored_as_codes(self):
+        index = HomeworkIndex()
+        index.apply({'id': 1, 'status': ''.join(['appr', 'oved']),
+                     'date_updated': '2022-01-01T00:00:00Z'})
+
+        assert homework.STATUS_CODES == {
+            'approved': 0, 'reviewing': 1, 'rejected': 2}, (
+            'Проверьте, что статусы VERDICTS получают коды по порядку'
+        )
+        assert index._entries['1'][0] == status_code('approved')
+        assert index.get('1') == ('approved', '2022-01-01T00:00:00Z')
+        assert index.statuses() == ['approved']
+        assert status_name(status_code('unknown')) == 'unknown', (
+            'Проверьте, что недокументированный статус получает код unknown'
+        )
+
+    def test_unknown_statuses_are_not_interned(self):
+        codes = dict(homework_index._CODES)
+        for status in (None, 'on_hold', 'draft', 'on_hold'):
+            assert status_code(status) == homework_index.UNKNOWN_CODE
+        assert homework_index._CODES == codes, (
+            'Проверьте, что status_code не запоминает неизвестные статусы'
+        )
+        assert status_name(status_code(None)) == 'unknown'
+
+    def test_engine_sends_every_changed_homework(self):
+        def fetch(token, from_date):
+            return {
+                'homeworks': [
+                    {'id': 1, 'homework_name': 'a', 'status': 'approved'},
+                    {'id': 2, 'homework_name': 'b', 'status': 'rejected'},
+                ],
+                'current_date': from_date + 1
+            }
+
+        bot = RecordingBot()
+        polling = PollingEngine(bot, [Tenant('tok', '1', 0)], fetch=fetch)
+        asyncio.run(polling.run_once())
+        asyncio.run(polling.run_once())
+        polling.close()
+
+        assert len(bot.sent) == 2, (
+            'Проверьте, что отправляются все изменившиеся работы '
+            'и только один раз'
+        )
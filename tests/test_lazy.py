@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+from lazy import lazy_import
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestLazyImport:
+
+    def test_module_loads_on_first_attribute(self, tmp_path, monkeypatch):
+        (tmp_path / 'lazy_probe.py').write_text(
+            'import builtins\nbuiltins.lazy_probe_loaded = True\nVALUE = 1\n')
+        monkeypatch.syspath_prepend(str(tmp_path))
+        monkeypatch.delitem(sys.modules, 'lazy_probe', raising=False)
+        import builtins
+
+        module = lazy_import('lazy_probe')
+        assert not hasattr(builtins, 'lazy_probe_loaded'), (
+            'Проверьте, что lazy_import не выполняет модуль сразу'
+        )
+        assert module.VALUE == 1
+        assert builtins.lazy_probe_loaded
+        del builtins.lazy_probe_loaded
+        sys.modules.pop('lazy_probe')
+
+    def test_homework_import_skips_heavy_dependencies(self):
+        code = ('import sys, homework\n'
+                'print(sorted(name for name in ("telegram", "requests", '
+                '"dotenv") if name in sys.modules '
+                'and type(sys.modules[name]).__name__ == "module"))')
+        output = subprocess.run(
+            [sys.executable, '-c', code], cwd=ROOT, capture_output=True,
+            text=True, check=True).stdout
+
+        assert output.strip() == '[]', (
+            'Проверьте, что import homework не загружает telegram, '
+            'requests и dotenv'
+        )
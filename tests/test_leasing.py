@@ -0,0 +1,125 @@
+import asyncio
+import sqlite3
+
+from engine import PollingEngine, Tenant
+from leasing import LeaseManager, SQLiteLeaseBackend
+from utils import RecordingBot
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_manager(tmp_path, node, clock, pool='default'):
+    backend = SQLiteLeaseBackend(str(tmp_path / 'leases.sqlite3'))
+    return LeaseManager(backend, node=node, pool=pool, ttl=100,
+                        renew_interval=30, clock=clock)
+
+
+KEYS = [f'chat{number}' for number in range(10)]
+
+
+class TestLeaseManager:
+
+    def test_nodes_split_keys_fairly(self, tmp_path):
+        clock = FakeClock()
+        first = make_manager(tmp_path, 'a', clock)
+        second = make_manager(tmp_path, 'b', clock)
+
+        assert first.renew(KEYS) == set(KEYS)
+        assert second.renew(KEYS) == set(), (
+            'Проверьте, что занятые аренды не захватываются другим узлом'
+        )
+        assert len(first.renew(KEYS)) == 5, (
+            'Проверьте, что узел отдаёт аренды сверх справедливой доли'
+        )
+        owned = second.renew(KEYS)
+        assert len(owned) == 5 and not owned & first.owned
+
+    def test_workers_with_one_node_id_keep_their_leases(self, tmp_path):
+        clock = FakeClock()
+        first = make_manager(tmp_path, 'a', clock, pool='default:0')
+        second = make_manager(tmp_path, 'a', clock, pool='default:1')
+
+        other = make_manager(tmp_path, 'b', clock, pool='default:0')
+
+        assert first.renew(KEYS[:5]) == set(KEYS[:5])
+        assert second.renew(KEYS[5:]) == set(KEYS[5:])
+        assert other.renew(KEYS[:5]) == set(), (
+            'Проверьте, что воркер с тем же NODE_ID в другом пуле '
+            'не освобождает чужие аренды как устаревшие'
+        )
+
+    def test_old_lease_table_gets_pool_column(self, tmp_path):
+        path = str(tmp_path / 'leases.sqlite3')
+        connection = sqlite3.connect(path)
+        connection.execute('CREATE TABLE leases (tenant TEXT PRIMARY KEY, '
+                           'node TEXT NOT NULL, expires REAL NOT NULL)')
+        connection.execute("INSERT INTO leases VALUES ('chat0', 'a', 0)")
+        connection.commit()
+        connection.close()
+
+        backend = SQLiteLeaseBackend(path)
+        assert backend.acquire('default', 'a', KEYS, 10, 20) == set(KEYS)
+
+    def test_dead_node_fails_over_after_ttl(self, tmp_path):
+        clock = FakeClock()
+        first = make_manager(tmp_path, 'a', clock)
+        second = make_manager(tmp_path, 'b', clock)
+        first.renew(KEYS)
+        second.renew(KEYS)
+
+        clock.now += 71
+        assert not first.owns(KEYS[0]), (
+            'Проверьте, что аренда без продления считается потерянной '
+            'раньше, чем истечёт в хранилище'
+        )
+        clock.now += 30
+        assert second.renew(KEYS) == set(KEYS), (
+            'Проверьте, что аренды упавшего узла переходят живому'
+        )
+
+    def test_release_frees_leases(self, tmp_path):
+        clock = FakeClock()
+        first = make_manager(tmp_path, 'a', clock)
+        second = make_manager(tmp_path, 'b', clock)
+        first.renew(KEYS)
+        first.release()
+
+        assert second.renew(KEYS) == set(KEYS)
+
+
+class TestEngineLeases:
+
+    def test_nodes_do_not_duplicate_messages(self, tmp_path):
+        clock = FakeClock()
+
+        def fetch(token, from_date):
+            return {'homeworks': [{'homework_name': token,
+                                   'status': 'approved'}],
+                    'current_date': from_date}
+
+        bots, engines = [], []
+        for node in ('a', 'b'):
+            bot = RecordingBot()
+            tenants = [Tenant(f'token{key}', key, 0) for key in KEYS]
+            bots.append(bot)
+            engines.append(PollingEngine(
+                bot, tenants, fetch=fetch,
+                leases=make_manager(tmp_path, node, clock)))
+        for polling in engines + engines:
+            polling._select_leased()
+        for polling in engines:
+            asyncio.run(polling.run_once())
+            polling.close()
+
+        first, second = ({chat for chat, _ in bot.sent} for bot in bots)
+        assert not first & second, (
+            'Проверьте, что арендатора опрашивает только владелец аренды'
+        )
+        assert first | second == set(KEYS)
@@ -0,0 +1,23 @@
+import homework
+from benchmarks import load_harness
+
+
+class TestLoadHarness:
+
+    def test_short_soak_delivers_scripted_changes(self, monkeypatch):
+        monkeypatch.setattr(homework, 'ENDPOINT', homework.ENDPOINT)
+        args = load_harness.parse_args([
+            '--tenants', '5', '--duration', '3', '--sample', '1',
+            '--interval', '0.3', '--steps', '1', '--step-interval', '0.5',
+            '--review-time', '0.5', '--api-429-rate', '0.05',
+            '--tg-429-rate', '0.05'])
+
+        result = load_harness.run(args)
+
+        assert result['polls'] >= 10, (
+            'Проверьте, что движок опрашивает заглушку API через сокеты'
+        )
+        assert len(result['delays']) >= 5, (
+            'Проверьте, что смены статусов доходят до заглушки Telegram'
+        )
+        assert result['duplicates'] == 0
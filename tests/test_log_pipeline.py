@@ -0,0 +1,54 @@
+import json
+import logging
+
+import pytest
+
+import log_pipeline
+
+
+@pytest.fixture
+def restore_root_logger():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield
+    root.handlers, root.level = handlers, level
+
+
+class TestLogPipeline:
+
+    def test_json_records_with_context(self, tmp_path, restore_root_logger):
+        path = tmp_path / 'main.log'
+        listener = log_pipeline.setup_logging(
+            level=logging.INFO, filename=str(path))
+        logger = logging.getLogger('test')
+        logger.info('Сообщение %s', 'отправлено', extra={
+            'tenant': 't1', 'stage': 'telegram_send', 'duration': 0.5})
+        try:
+            raise KeyError('status')
+        except KeyError:
+            logger.exception('Сбой')
+        listener.stop()
+
+        records = [json.loads(line)
+                   for line in path.read_text(encoding='UTF-8').splitlines()]
+        assert records[0]['message'] == 'Сообщение отправлено'
+        assert records[0]['tenant'] == 't1'
+        assert records[0]['stage'] == 'telegram_send'
+        assert records[0]['duration'] == 0.5
+        assert 'KeyError' in records[1]['exc']
+
+    def test_file_is_rotated_not_truncated(self, tmp_path,
+                                           restore_root_logger):
+        path = tmp_path / 'main.log'
+        path.write_text('{"message": "до перезапуска"}\n', encoding='UTF-8')
+        listener = log_pipeline.setup_logging(
+            level=logging.INFO, filename=str(path), max_bytes=300,
+            backup_count=2)
+        for number in range(20):
+            logging.getLogger('test').info(f'Запись {number}')
+        listener.stop()
+
+        assert (tmp_path / 'main.log.1').exists(), (
+            'Проверьте, что лог ротируется по размеру'
+        )
+        assert not (tmp_path / 'main.log.3').exists()
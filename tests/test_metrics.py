@@ -0,0 +1,53 @@
+from urllib.request import urlopen
+
+import homework
+import metrics
+from exceptions import HTTPError
+
+
+class TestMetrics:
+
+    def test_histogram_renders_cumulative_buckets(self):
+        histogram = metrics.Histogram(
+            'test_seconds', 'Тест.', ('stage',), buckets=(0.1, 1))
+        histogram.observe('a', value=0.05)
+        histogram.observe('a', value=0.5)
+        histogram.observe('a', value=5)
+
+        lines = histogram.render()
+
+        assert 'test_seconds_bucket{stage="a",le="0.1"} 1' in lines
+        assert 'test_seconds_bucket{stage="a",le="1"} 2' in lines
+        assert 'test_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+        assert 'test_seconds_count{stage="a"} 3' in lines
+
+    def test_pipeline_stages_are_timed(self):
+        before = metrics.STAGE_LATENCY.labels('parse_status').counts[:]
+        homework.parse_status({'homework_name': 'hw', 'status': 'approved'})
+
+        after = metrics.STAGE_LATENCY.labels('parse_status').counts
+        assert sum(after) == sum(before) + 1, (
+            'Проверьте, что parse_status учитывается в гистограмме этапов'
+        )
+
+    def test_errors_are_counted_by_class(self):
+        child = metrics.ERRORS.labels('HTTPError')
+        before = child.value
+        metrics.count_error(HTTPError('500'))
+
+        assert child.value == before + 1
+
+    def test_metrics_endpoint(self):
+        registry = metrics.Registry()
+        counter = registry.register(
+            metrics.Counter('test_total', 'Тест.', ('error',)))
+        counter.inc('KeyError')
+        server = metrics.start_metrics_server(0, registry=registry)
+        try:
+            url = f'http://127.0.0.1:{server.server_port}/metrics'
+            body = urlopen(url).read().decode()
+        finally:
+            server.shutdown()
+
+        assert '# TYPE test_total counter' in body
+        assert 'test_total{error="KeyError"} 1' in body
@@ -0,0 +1,197 @@
+import asyncio
+from collections import Counter
+import os
+import signal
+import socket
+import threading
+import time
+
+from engine import PollingEngine, Tenant
+import profiling
+from profiling import (Profiler, SlowCycleWatch, current_stage, sample,
+                       serve_control, stage)
+from utils import RecordingBot
+
+
+def read(base):
+    with open(f'{base}.txt', encoding='utf-8') as file:
+        return file.read()
+
+
+def run_in_stage(name, seconds):
+    """Запускает поток, который seconds секунд находится в этапе name."""
+    release = threading.Event()
+
+    @stage(name)
+    def busy():
+        release.wait(seconds)
+
+    thread = threading.Thread(target=busy)
+    thread.start()
+    return thread, release
+
+
+class TestStages:
+
+    def test_stage_is_restored(self):
+        @stage('parse_status')
+        def inner():
+            return current_stage()
+
+        @stage('check_response')
+        def outer():
+            return inner(), current_stage()
+
+        assert outer() == ('parse_status', 'check_response'), (
+            'Проверьте, что вложенный этап восстанавливает внешний'
+        )
+        assert current_stage() == profiling.IDLE
+
+    def test_sample_annotates_other_threads(self):
+        thread, release = run_in_stage('send_message', 5)
+        time.sleep(0.05)
+        counts = Counter()
+        sample(counts, skip={threading.get_ident()})
+        release.set()
+        thread.join()
+
+        stacks = [stack for stage_name, stack in counts
+                  if stage_name == 'send_message']
+        assert stacks and 'busy' in stacks[0], (
+            'Проверьте, что стек потока помечается его этапом'
+        )
+
+
+class TestProfiler:
+
+    def test_session_writes_dump(self, tmp_path):
+        thread, release = run_in_stage('get_api_answer', 5)
+        profiler = Profiler(str(tmp_path), interval=0.005)
+
+        base = profiler.start(0.1, reason='test')
+        assert profiler.start(0.1) is None, (
+            'Проверьте, что второй сеанс не запускается поверх первого'
+        )
+        profiler.wait(5)
+        release.set()
+        thread.join()
+
+        for extension in ('.txt', '.stacks', '.tracemalloc'):
+            assert os.path.exists(base + extension)
+        report = read(base)
+        assert 'get_api_answer' in report and 'Рост памяти:' in report
+        assert not profiler.running
+
+    def test_control_socket(self, tmp_path):
+        path = str(tmp_path / 'control.sock')
+        profiler = Profiler(str(tmp_path), interval=0.005)
+        server = serve_control(profiler, path)
+
+        def ask(command):
+            with socket.socket(socket.AF_UNIX) as client:
+                client.connect(path)
+                client.sendall(f'{command}\n'.encode())
+                return client.makefile().readline().strip()
+
+        try:
+            assert ask('profile 0.05 cpu').startswith('ok ')
+            profiler.wait(5)
+            answer = ask('profile 0.05')
+            assert answer.startswith('ok '), answer
+            profiler.wait(5)
+            assert ask('status') == 'idle'
+            assert ask('profile 60').startswith('ok ')
+            assert ask('status') == 'busy'
+            assert ask('stop') == 'ok'
+            profiler.wait(5)
+            assert ask('status') == 'idle', (
+                'Проверьте, что stop завершает сеанс досрочно'
+            )
+            assert ask('profile много').startswith('error')
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert os.path.exists(answer[3:] + '.txt')
+
+    def test_signal_starts_session(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(profiling, 'PROFILE_SECONDS', 0.05)
+        previous = signal.getsignal(signal.SIGUSR1)
+        profiler = Profiler(str(tmp_path), interval=0.005)
+        try:
+            profiling.install(profiler, 'SIGUSR1', '')
+            os.kill(os.getpid(), signal.SIGUSR1)
+            time.sleep(0.01)
+            assert profiler.running, (
+                'Проверьте, что сигнал запускает профилирование'
+            )
+            profiler.wait(5)
+        finally:
+            signal.signal(signal.SIGUSR1, previous)
+        assert any(name.endswith('.txt') for name in os.listdir(tmp_path))
+
+
+class TestSlowCycleWatch:
+
+    def test_slow_cycle_is_dumped_once_per_interval(self, tmp_path,
+                                                     monkeypatch):
+        watch = SlowCycleWatch(0.05, str(tmp_path), interval=0.005,
+                               min_interval=60)
+        writers = []
+        write_dump = profiling.write_dump
+
+        def record_writer(*args, **kwargs):
+            writers.append(threading.current_thread())
+            return write_dump(*args, **kwargs)
+        monkeypatch.setattr(profiling, 'write_dump', record_writer)
+
+        @stage('send_message')
+        def slow():
+            time.sleep(0.2)
+
+        assert watch.end(watch.begin('fast')) is None
+        cycle = watch.begin('main')
+        slow()
+        base = watch.end(cycle)
+        assert watch.flush(5)
+
+        assert writers and threading.current_thread() not in writers, (
+            'Проверьте, что дамп пишется в фоновом потоке, а не в end()'
+        )
+        report = read(base)
+        assert 'Медленная итерация main' in report
+        assert 'send_message' in report, (
+            'Проверьте, что дамп медленной итерации содержит этапы'
+        )
+        cycle = watch.begin('main')
+        slow()
+        assert watch.end(cycle) is None, (
+            'Проверьте, что дампы пишутся не чаще min_interval'
+        )
+
+    def test_disabled_without_threshold(self):
+        watch = SlowCycleWatch(0)
+
+        assert watch.begin() is None
+        assert watch._thread is None
+
+    def test_engine_dumps_slow_poll(self, tmp_path):
+        @stage('get_api_answer')
+        def fetch(token, from_date):
+            time.sleep(0.2)
+            return {'homeworks': [], 'current_date': from_date + 10}
+
+        watch = SlowCycleWatch(0.05, str(tmp_path), interval=0.005)
+        tenant = Tenant('tok', '1', int(time.time()))
+        polling = PollingEngine(RecordingBot(), [tenant], fetch=fetch,
+                                slow_cycles=watch)
+
+        asyncio.run(polling.run_once())
+        polling.close()
+        assert watch.flush(5)
+
+        reports = [name for name in os.listdir(tmp_path)
+                   if name.startswith('slow-cycle') and name.endswith('.txt')]
+        assert len(reports) == 1
+        report = read(str(tmp_path / reports[0])[:-len('.txt')])
+        assert f'Медленная итерация {tenant.key}' in report
+        assert 'get_api_answer' in report
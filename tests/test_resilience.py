@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from engine import PollingEngine, Tenant
+from exceptions import CircuitOpenError, HTTPError, RequestAPIError
+from resilience import CircuitBreaker, ErrorNotifier, fingerprint
+from utils import RecordingBot
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestErrorNotifier:
+
+    def test_repeats_are_spaced_exponentially(self):
+        clock = FakeClock()
+        notifier = ErrorNotifier(repeat_interval=10, max_interval=25,
+                                 clock=clock)
+        sent = []
+        for moment in range(0, 100, 5):
+            clock.now = moment
+            if notifier.alert(HTTPError(f'Сбой {moment}', 500)):
+                sent.append(moment)
+
+        assert sent == [0, 10, 30, 55, 80], (
+            'Проверьте, что повторы одного сбоя отправляются '
+            'через растущие интервалы'
+        )
+
+    def test_new_fingerprint_alerts_immediately(self):
+        notifier = ErrorNotifier(clock=FakeClock())
+
+        assert notifier.alert(HTTPError('Сбой 500', 500))
+        assert notifier.alert(KeyError('homeworks'))
+
+    def test_single_recovery_message(self):
+        notifier = ErrorNotifier(clock=FakeClock())
+        assert notifier.recovered() is None
+        notifier.alert(RequestAPIError('timeout'))
+        notifier.alert(RequestAPIError('timeout'))
+
+        assert 'восстановлена' in notifier.recovered()
+        assert notifier.recovered() is None
+
+    def test_fingerprint_ignores_numbers(self):
+        assert fingerprint(HTTPError('код 502')) == fingerprint(
+            HTTPError('код 503'))
+
+
+class TestCircuitBreaker:
+
+    def fail(self):
+        raise RequestAPIError('connection refused')
+
+    def test_opens_after_threshold_and_probes(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10,
+                                 max_reset_timeout=15, clock=clock)
+        for _ in range(2):
+            with pytest.raises(RequestAPIError):
+                breaker.call(self.fail)
+        with pytest.raises(CircuitOpenError):
+            breaker.call(self.fail)
+
+        clock.now = 10
+        with pytest.raises(RequestAPIError):
+            breaker.call(self.fail)
+        assert breaker.state == CircuitBreaker.OPEN
+        clock.now = 24
+        with pytest.raises(CircuitOpenError):
+            breaker.call(self.fail)
+
+        clock.now = 25
+        assert breaker.call(lambda: 'ok') == 'ok'
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_client_errors_do_not_open(self):
+        breaker = CircuitBreaker(failure_threshold=1, clock=FakeClock())
+
+        def unauthorized():
+            raise HTTPError('401', 401)
+
+        for _ in range(3):
+            with pytest.raises(HTTPError):
+                breaker.call(unauthorized)
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_engine_short_circuits_and_recovers(self):
+        bot = RecordingBot()
+        calls = []
+        healthy = [False]
+
+        def fetch(token, from_date):
+            calls.append(token)
+            if not healthy[0]:
+                raise RequestAPIError('timeout')
+            return {'homeworks': [], 'current_date': from_date}
+
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10,
+                                 clock=clock)
+        polling = PollingEngine(bot, [Tenant('tok', '1', 0)], fetch=fetch,
+                                breaker=breaker)
+        for _ in range(5):
+            asyncio.run(polling.run_once())
+        clock.now = 10
+        healthy[0] = True
+        asyncio.run(polling.run_once())
+        polling.close()
+
+        assert len(calls) == 3, (
+            'Проверьте, что при разомкнутой цепи запросы к API не уходят'
+        )
+        assert len(bot.sent) == 2 and 'восстановлена' in bot.sent[-1][1]
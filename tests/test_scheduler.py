@@ -0,0 +1,91 @@
+import asyncio
+
+from engine import PollingEngine, Tenant
+from scheduler import PollScheduler
+from utils import RecordingBot
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestPollScheduler:
+
+    def make(self, **kwargs):
+        clock = FakeClock()
+        scheduler = PollScheduler(
+            retry_time=600, reviewing_interval=120, idle_interval=3600,
+            max_backoff=7200, active_window=3600, jitter=0,
+            clock=clock, **kwargs)
+        return scheduler, clock
+
+    def test_interval_depends_on_statuses(self):
+        scheduler, _ = self.make()
+
+        assert scheduler.interval(['reviewing', 'approved']) == 120
+        assert scheduler.interval(['approved', 'approved']) == 3600
+        assert scheduler.interval(['approved'], since_change=10) == 600
+        assert scheduler.interval(['rejected']) == 600
+        assert scheduler.interval([]) == 600
+
+    def test_errors_back_off_exponentially(self):
+        scheduler, _ = self.make()
+
+        intervals = [scheduler.interval([], errors=n) for n in range(1, 5)]
+
+        assert intervals == [1200, 2400, 4800, 7200], (
+            'Проверьте, что после ошибок интервал растёт до max_backoff'
+        )
+
+    def test_jitter_stays_in_bounds(self):
+        scheduler, _ = self.make(rng=lambda: 1.0)
+        scheduler.jitter = 0.1
+
+        assert scheduler.reschedule('t', []) == 660
+
+    def test_pop_due_in_deadline_order(self):
+        scheduler, clock = self.make()
+        scheduler.add('late', 20)
+        scheduler.add('early', 10)
+
+        assert scheduler.pop_due() == []
+        assert scheduler.time_until_next() == 10
+        clock.now = 25
+        assert scheduler.pop_due() == ['early', 'late']
+
+
+class TestEngineScheduling:
+
+    def test_run_polls_by_schedule(self):
+        calls = []
+
+        def fetch(token, from_date):
+            calls.append(token)
+            return {'homeworks': [{'id': 1, 'homework_name': 'a',
+                                   'status': 'reviewing'}],
+                    'current_date': from_date}
+
+        scheduler = PollScheduler(retry_time=10, reviewing_interval=0.05,
+                                  jitter=0)
+        polling = PollingEngine(RecordingBot(), [Tenant('tok', '1', 0)],
+                                retry_time=10, fetch=fetch,
+                                scheduler=scheduler)
+
+        async def scenario():
+            try:
+                await asyncio.wait_for(polling.run(), 0.5)
+            except asyncio.TimeoutError:
+                pass
+
+        asyncio.run(scenario())
+        polling.close()
+
+        assert len(calls) >= 3, (
+            'Проверьте, что работа на проверке опрашивается '
+            'с интервалом reviewing'
+        )
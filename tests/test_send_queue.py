@@ -0,0 +1,181 @@
+import asyncio
+from functools import partial
+import multiprocessing
+import time
+
+import homework
+from send_queue import SendQueue, TokenBucket
+from throttle import RequestThrottle
+from utils import RecordingBot
+
+
+def deliver(queue, messages):
+    async def scenario():
+        queue.start()
+        for chat_id, text in messages:
+            queue.put(chat_id, text)
+        await asyncio.wait_for(queue.join(), 5)
+        await queue.stop()
+    asyncio.run(scenario())
+
+
+def send_worker(path, count, rate, sent):
+    throttle = RequestThrottle(path)
+    bot = RecordingBot()
+    queue = SendQueue(bot, workers=4, per_chat_rate=1000, global_take=partial(
+        throttle.take, 'telegram:global', rate))
+    deliver(queue, [(f'chat{number}', 'текст') for number in range(count)])
+    throttle.close()
+    sent.put(bot.moments)
+
+
+class TestTokenBucket:
+
+    def test_take_reserves_future_tokens(self):
+        now = [0.0]
+        bucket = TokenBucket(2, 1, clock=lambda: now[0])
+
+        assert bucket.take() == 0
+        assert bucket.take() == 0.5
+        assert bucket.take() == 1.0
+        now[0] = 2.0
+        assert bucket.take() == 0
+
+
+class TestSendQueue:
+
+    def test_order_is_kept_within_chat(self):
+        bot = RecordingBot()
+        queue = SendQueue(bot, workers=4, per_chat_rate=1000)
+        deliver(queue, [(chat, f'{chat}-{n}')
+                        for n in range(5) for chat in ('a', 'b')])
+
+        for chat in ('a', 'b'):
+            texts = [text for sent_chat, text in bot.sent
+                     if sent_chat == chat]
+            assert texts == [f'{chat}-{n}' for n in range(5)], (
+                'Проверьте, что сообщения одного чата уходят по порядку'
+            )
+
+    def test_per_chat_rate_is_limited(self):
+        bot = RecordingBot()
+        queue = SendQueue(bot, workers=4, per_chat_rate=20, per_chat_burst=1)
+        deliver(queue, [('a', str(n)) for n in range(4)])
+
+        moments = bot.moments
+        assert moments[-1] - moments[0] >= 0.14, (
+            'Проверьте, что отправка в один чат ограничена по скорости'
+        )
+
+    def test_flood_wait_is_retried(self):
+        bot = RecordingBot(flood_once={'a'})
+        queue = SendQueue(bot, workers=2, per_chat_rate=1000,
+                          send=homework.send_message_to_chat)
+        deliver(queue, [('a', 'first'), ('b', 'other')])
+
+        assert [text for chat, text in bot.sent if chat == 'a'] == [
+            'first'], 'Проверьте, что после RetryAfter сообщение повторяется'
+        assert len(queue) == 0
+
+    def test_on_sent_acks_only_delivered_messages(self):
+        bot = RecordingBot()
+        acked = []
+
+        def send(bot, chat_id, text):
+            if text == 'broken':
+                raise homework.SendMessageError('Сбой при отправке')
+            bot.send_message(chat_id, text)
+
+        failed = []
+        queue = SendQueue(bot, workers=2, per_chat_rate=1000, send=send,
+                          on_sent=acked.append, on_failed=failed.append)
+
+        async def scenario():
+            queue.start()
+            queue.put('a', 'ok', 'k1')
+            queue.put('a', 'broken', 'k2')
+            queue.put('b', 'alert')
+            await asyncio.wait_for(queue.join(), 5)
+            await queue.stop()
+        asyncio.run(scenario())
+
+        assert acked == ['k1'], (
+            'Проверьте, что on_sent вызывается только для доставленных '
+            'сообщений с ключом'
+        )
+        assert failed == ['k2'], (
+            'Проверьте, что on_failed засчитывает попытку недоставленным '
+            'сообщениям с ключом'
+        )
+
+    def test_digest_merges_messages_within_window(self):
+        bot = RecordingBot()
+        acked = []
+        queue = SendQueue(bot, workers=2, per_chat_rate=1000,
+                          on_sent=acked.append)
+
+        async def scenario():
+            queue.start()
+            started = time.monotonic()
+            for number in range(3):
+                queue.put('a', f'работа {number}', f'k{number}', window=0.2)
+            queue.put('b', 'сразу', 'kb')
+            await asyncio.wait_for(queue.join(), 5)
+            await queue.stop()
+            return started
+
+        started = asyncio.run(scenario())
+        sent = {chat: (text, moment) for (chat, text), moment
+                in zip(bot.sent, bot.moments)}
+        assert len(bot.sent) == 2, (
+            'Проверьте, что изменения за окно уходят одним сообщением'
+        )
+        assert sent['a'][0] == homework.format_digest(
+            [f'работа {number}' for number in range(3)])
+        assert sent['a'][1] - started >= 0.2
+        assert sent['b'][1] - started < 0.2, (
+            'Проверьте, что чаты без окна получают сообщения сразу'
+        )
+        assert sorted(acked) == ['k0', 'k1', 'k2', 'kb']
+
+    def test_digest_is_flushed_early_at_size_cap(self):
+        bot = RecordingBot()
+        queue = SendQueue(bot, workers=2, per_chat_rate=1000, digest_max=2)
+
+        async def scenario():
+            queue.start()
+            for number in range(3):
+                queue.put('a', str(number), f'k{number}', window=30)
+            queue.put('c', 'первое', window=30)
+            queue.put('c', 'сбой', window=0)
+            await asyncio.wait_for(queue.join(), 5)
+            await queue.stop()
+
+        asyncio.run(scenario())
+        texts = [text for _, text in bot.sent]
+        assert homework.format_digest(['0', '1']) in texts and '2' in texts, (
+            'Проверьте, что дайджест уходит раньше при достижении лимита'
+        )
+        assert texts.index('первое') < texts.index('сбой'), (
+            'Проверьте, что сообщение без окна отправляет накопленное'
+        )
+
+    def test_global_rate_is_shared_between_workers(self, tmp_path):
+        path = str(tmp_path / 'throttle.sqlite3')
+        RequestThrottle(path).close()
+        context = multiprocessing.get_context('fork')
+        sent = context.Queue()
+        workers = [context.Process(target=send_worker,
+                                   args=(path, 10, 20, sent))
+                   for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        moments = sorted(sum((sent.get(timeout=10) for _ in workers), []))
+        for worker in workers:
+            worker.join()
+
+        assert len(moments) == 20
+        assert moments[-1] - moments[0] >= 19 / 20 * 0.8, (
+            'Проверьте, что воркеры делят один глобальный лимит отправки, '
+            'а не получают по лимиту на процесс'
+        )
@@ -0,0 +1,251 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+import pytest
+import telegram
+
+from engine import PollingEngine, Tenant
+from exceptions import SendMessageError
+import homework
+from homework import drain_outbox
+from storage import CheckpointStore
+from utils import RecordingBot
+
+
+class FailingBot:
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        raise telegram.error.NetworkError('Telegram недоступен')
+
+
+def fetch_approved(token, from_date):
+    return {
+        'homeworks': [{'id': 1, 'homework_name': 'hw',
+                       'status': 'approved'}],
+        'current_date': 500
+    }
+
+
+class TestCheckpointStore:
+
+    def test_checkpoint_survives_reopen(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = CheckpointStore(path)
+        store.checkpoint('t1', 100, [('hw1', 'reviewing', None)])
+        store.checkpoint('t1', 200, [('hw1', 'approved', '2022-01-01')])
+        store.close()
+
+        store = CheckpointStore(path)
+        assert store.get_cursor('t1') == 200
+        assert store.get_cursor('t2', 5) == 5
+        assert store.load_cursors() == {'t1': 200}
+        assert store.get_statuses('t1') == {'hw1': ('approved', '2022-01-01')}
+        store.close()
+
+    def test_bot_and_engine_share_tenant_state(self, tmp_path):
+        store = CheckpointStore(str(tmp_path / 'state.sqlite3'))
+        store.checkpoint('1', 100, [('hw', 'approved', None)])
+
+        assert store.rename_tenant('1', homework.tenant_key('1', 'tok'))
+        assert not store.rename_tenant('1', homework.tenant_key('1', 'tok'))
+        polling = PollingEngine(RecordingBot(), [Tenant('tok', '1', 0)],
+                                fetch=fetch_approved, store=store)
+        polling.restore()
+        polling.close()
+        store.close()
+
+        tenant = polling.tenants[0]
+        assert tenant.from_date == 100, (
+            'Проверьте, что homework.main() и движок хранят состояние '
+            'арендатора под одним ключом'
+        )
+        assert tenant.index.get('hw') == ('approved', None)
+
+    def test_engine_resumes_without_resending(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        calls = []
+        now = int(time.time())
+
+        def fetch(token, from_date):
+            calls.append(from_date)
+            return {
+                'homeworks': [{'id': 1, 'homework_name': 'hw',
+                               'status': 'approved'}],
+                'current_date': now
+            }
+
+        for _ in range(2):
+            store = CheckpointStore(path)
+            bot = RecordingBot()
+            polling = PollingEngine(
+                bot, [Tenant('tok', '1', 0)], fetch=fetch, store=store)
+            polling.restore()
+            asyncio.run(polling.run_once())
+            polling.close()
+            store.close()
+
+        assert calls == [0, now], (
+            'Проверьте, что после перезапуска опрос продолжается с курсора'
+        )
+        assert bot.sent == [], (
+            'Проверьте, что после перезапуска старые статусы не отправляются'
+        )
+
+    def test_outbox_is_committed_with_cursor(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = CheckpointStore(path)
+        store.checkpoint('t1', 100, [('hw1', 'approved', None)],
+                         [('k1', '1', 'первое'), ('k2', '1', 'второе')])
+        store.checkpoint('t2', 100, [], [('k3', '2', 'третье')])
+        store.checkpoint('t1', 200, [], [('k1', '1', 'первое')])
+        store.close()
+
+        store = CheckpointStore(path)
+        assert store.pending_messages() == [
+            ('k1', '1', 'первое'), ('k2', '1', 'второе'),
+            ('k3', '2', 'третье')], (
+            'Проверьте, что сообщения outbox переживают перезапуск, '
+            'сохраняют порядок и не дублируются по ключу'
+        )
+        assert store.pending_messages({'t2'}) == [('k3', '2', 'третье')]
+        store.ack('k1', 'k3')
+        assert store.pending_messages() == [('k2', '1', 'второе')], (
+            'Проверьте, что ack удаляет доставленные сообщения'
+        )
+        store.close()
+
+    def test_group_commit_persists_concurrent_checkpoints(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = CheckpointStore(path)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(
+                lambda number: store.checkpoint(
+                    f't{number}', number,
+                    messages=[(f'k{number}', '1', str(number))]),
+                range(64)))
+        store.close()
+
+        store = CheckpointStore(path)
+        assert store.load_cursors() == {
+            f't{number}': number for number in range(64)}
+        assert len(store.pending_messages()) == 64
+        store.close()
+
+    def test_concurrent_acks_share_commits(self, tmp_path, monkeypatch):
+        store = CheckpointStore(str(tmp_path / 'state.sqlite3'))
+        store.checkpoint('t1', 1, messages=[
+            (f'k{number}', '1', str(number)) for number in range(64)])
+        writes = []
+        write = store._write
+
+        def slow_write(batch):
+            writes.append(len(batch))
+            time.sleep(0.01)
+            write(batch)
+        monkeypatch.setattr(store, '_write', slow_write)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda number: store.ack(f'k{number}'),
+                              range(64)))
+
+        assert store.pending_messages() == []
+        assert len(writes) < 64, (
+            'Проверьте, что одновременные ack() фиксируются общими '
+            'транзакциями'
+        )
+        store.close()
+
+    def test_pending_messages_filters_many_tenants(self, tmp_path):
+        store = CheckpointStore(str(tmp_path / 'state.sqlite3'))
+        for number in range(1200):
+            store.checkpoint(f't{number}', 1,
+                             messages=[(f'k{number}', '1', str(number))])
+
+        wanted = {f't{number}' for number in range(1, 1200, 2)}
+        assert store.pending_messages(wanted) == [
+            (f'k{number}', '1', str(number))
+            for number in range(1, 1200, 2)], (
+            'Проверьте, что фильтр по арендаторам сохраняет порядок '
+            'добавления при любом числе арендаторов'
+        )
+        store.close()
+
+    def test_undelivered_message_is_replayed_once(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = CheckpointStore(path)
+        polling = PollingEngine(
+            FailingBot(), [Tenant('tok', '1', 0)], fetch=fetch_approved,
+            store=store)
+        polling.restore()
+        asyncio.run(polling.run_once())
+        polling.close()
+        store.close()
+
+        bot = RecordingBot()
+        for _ in range(2):
+            store = CheckpointStore(path)
+            polling = PollingEngine(
+                bot, [Tenant('tok', '1', 0)], fetch=fetch_approved,
+                store=store)
+            polling.restore()
+            asyncio.run(polling.replay_outbox())
+            asyncio.run(polling.run_once())
+            polling.close()
+            store.close()
+
+        assert len(bot.sent) == 1, (
+            'Проверьте, что недоставленное сообщение отправляется '
+            'после перезапуска ровно один раз'
+        )
+        assert bot.sent[0][0] == '1'
+
+    def test_drain_outbox_skips_only_failing_chat(self, tmp_path):
+        store = CheckpointStore(str(tmp_path / 'state.sqlite3'))
+        store.checkpoint('t', 1, messages=[
+            ('k1', 'bad', 'первое'), ('k2', 'ok', 'первое'),
+            ('k3', 'bad', 'второе'), ('k4', 'ok', 'второе')])
+        bot = RecordingBot()
+        sent = bot.send_message
+
+        def send_message(chat_id=None, text=None, **kwargs):
+            if chat_id == 'bad':
+                raise telegram.error.NetworkError('Чат недоступен')
+            sent(chat_id, text)
+        bot.send_message = send_message
+
+        with pytest.raises(SendMessageError):
+            drain_outbox(bot, store, 't')
+
+        assert bot.sent == [('ok', 'первое'), ('ok', 'второе')]
+        assert [key for key, _, _ in store.pending_messages()] == [
+            'k1', 'k3'], (
+            'Проверьте, что сообщения недоступного чата ждут повтора '
+            'по порядку'
+        )
+        store.close()
+
+    def test_dead_chat_messages_are_parked(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        store = CheckpointStore(path, max_attempts=3)
+        store.checkpoint('t', 1, messages=[
+            ('k1', 'dead', 'первое'), ('k2', 'dead', 'второе')])
+
+        for _ in range(2):
+            with pytest.raises(SendMessageError):
+                drain_outbox(FailingBot(), store, 't')
+        assert len(store.pending_messages()) == 2
+        with pytest.raises(SendMessageError):
+            drain_outbox(FailingBot(), store, 't')
+
+        assert store.pending_messages() == [], (
+            'Проверьте, что сообщения, исчерпавшие попытки, больше '
+            'не повторяются'
+        )
+        store.close()
+        store = CheckpointStore(path)
+        parked = store._conn.execute(
+            'SELECT key, attempts FROM dead_letters ORDER BY key').fetchall()
+        assert parked == [('k1', 3), ('k2', 3)], (
+            'Проверьте, что сообщения переносятся в dead_letters'
+        )
+        store.close()
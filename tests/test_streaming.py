@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+import pytest
+import requests
+
+from engine import PollingEngine, Tenant
+from exceptions import CurrentTimeError, JSONDecodeError, RequestAPIError
+import homework
+from resilience import CircuitBreaker
+from streaming import HomeworkStream
+from utils import RecordingBot
+
+
+def chunked(payload, size):
+    data = payload if isinstance(payload, bytes) else json.dumps(
+        payload, ensure_ascii=False).encode()
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+class TestHomeworkStream:
+    RESPONSE = {
+        'current_date': 1234567890,
+        'homeworks': [
+            {'id': 1, 'homework_name': 'hw1', 'status': 'approved',
+             'reviewer_comment': 'Всё нравится'},
+            {'id': 2, 'homework_name': 'hw2', 'status': 'reviewing'},
+        ],
+        'extra': {'nested': [1, 2, {'x': None}]},
+    }
+
+    @pytest.mark.parametrize('size', [1, 2, 7, 4096])
+    def test_items_match_full_decode(self, size):
+        stream = HomeworkStream(chunked(self.RESPONSE, size))
+
+        assert list(stream) == self.RESPONSE['homeworks']
+        assert stream.current_date == 1234567890, (
+            'Проверьте, что число, разрезанное между фрагментами, '
+            'разбирается целиком'
+        )
+
+    def test_close_is_called(self):
+        closed = []
+        stream = HomeworkStream(chunked(self.RESPONSE, 10),
+                                close=lambda: closed.append(True))
+        list(stream)
+
+        assert closed == [True]
+
+    @pytest.mark.parametrize('payload, error', [
+        ([], TypeError),
+        ({'current_date': 1}, KeyError),
+        ({'homeworks': {}, 'current_date': 1}, TypeError),
+        ({'homeworks': []}, CurrentTimeError),
+        ({'homeworks': [], 'current_date': '1'}, CurrentTimeError),
+        (b'{"homeworks": [{"id": 1', JSONDecodeError),
+    ])
+    def test_invalid_response(self, payload, error):
+        with pytest.raises(error):
+            list(HomeworkStream(chunked(payload, 3)))
+
+    def test_engine_consumes_stream(self):
+        bot = RecordingBot()
+
+        def fetch(token, from_date):
+            return HomeworkStream(chunked(self.RESPONSE, 5))
+
+        tenant = Tenant('tok', '1', 0)
+        polling = PollingEngine(bot, [tenant], fetch=fetch)
+        asyncio.run(polling.run_once())
+        polling.close()
+
+        assert len(bot.sent) == 2 and tenant.from_date == 1234567890
+
+    def test_broken_body_is_api_error(self, monkeypatch):
+        class BrokenResponse:
+            status_code = 200
+
+            def iter_content(self, size):
+                yield b'{"homeworks": [{"id": 1'
+                raise requests.exceptions.ChunkedEncodingError('обрыв')
+
+            def close(self):
+                pass
+
+        monkeypatch.setattr(homework.transport, 'get',
+                            lambda *args, **kwargs: BrokenResponse())
+        breaker = CircuitBreaker(failure_threshold=1)
+        tenant = Tenant('tok', '1', 0)
+        polling = PollingEngine(
+            RecordingBot(), [tenant], fetch=homework.stream_homework_statuses,
+            breaker=breaker)
+
+        with pytest.raises(RequestAPIError):
+            list(homework.stream_homework_statuses('tok', 0))
+        asyncio.run(polling.poll_tenant(tenant))
+        polling.close()
+
+        assert tenant.errors == 1 and breaker.state == breaker.OPEN, (
+            'Проверьте, что обрыв тела ответа учитывается предохранителем'
+        )
@@ -0,0 +1,92 @@
+from collections import Counter, namedtuple
+import multiprocessing
+from operator import attrgetter
+import time
+
+from supervisor import HashRing, Supervisor
+
+Item = namedtuple('Item', 'key')
+Tenant = namedtuple('Tenant', 'key token')
+ERRORS = 'homework_bot_errors_total'
+
+
+def idle_worker(worker_id, tenants, commands, events):
+    events.put(('health', worker_id, len(tenants),
+                {ERRORS: {('ShardError',): 1}}))
+    time.sleep(60)
+
+
+class TestHashRing:
+
+    def test_keys_are_spread_and_move_minimally(self):
+        ring = HashRing(range(4))
+        keys = [f'chat{number}' for number in range(2000)]
+        before = {key: ring.node_for(key) for key in keys}
+
+        shares = Counter(before.values())
+        assert min(shares.values()) > 250, (
+            'Проверьте, что ключи распределяются между узлами равномерно'
+        )
+        ring.remove(2)
+        after = {key: ring.node_for(key) for key in keys}
+        moved = [key for key in keys if before[key] != after[key]]
+        assert moved and all(before[key] == 2 for key in moved), (
+            'Проверьте, что при удалении узла переезжают только его ключи'
+        )
+        ring.add(2)
+        assert {key: ring.node_for(key) for key in keys} == before
+
+
+class TestSupervisor:
+
+    def test_shard_key_keeps_token_on_one_worker(self):
+        tenants = [Tenant(f'chat{number}', f'token{number % 10}')
+                   for number in range(60)]
+        supervisor = Supervisor(tenants, idle_worker, workers=4,
+                                shard_key=attrgetter('token'))
+        for worker_id in range(4):
+            supervisor.ring.add(worker_id)
+        owners = {}
+        for worker_id, assigned in supervisor.assignments().items():
+            for tenant in assigned:
+                owners.setdefault(tenant.token, set()).add(worker_id)
+        assert all(len(workers) == 1 for workers in owners.values()), (
+            'Проверьте, что арендаторы с общим токеном попадают к одному '
+            'воркеру'
+        )
+
+    def test_dead_worker_tenants_are_rebalanced(self):
+        tenants = [Item(f'chat{number}') for number in range(30)]
+        supervisor = Supervisor(
+            tenants, idle_worker, workers=3, restart_delay=0,
+            context=multiprocessing.get_context('fork'))
+        supervisor.start()
+        try:
+            deadline = time.monotonic() + 5
+            while (time.monotonic() < deadline and not all(
+                    state.snapshot for state in supervisor.states.values())):
+                supervisor.check(timeout=0.1)
+            body = supervisor.render()
+            assert f'{ERRORS}{{error="ShardError"}} 3' in body, (
+                'Проверьте, что метрики воркеров суммируются'
+            )
+
+            supervisor.states[0].process.kill()
+            supervisor.states[0].process.join()
+            supervisor.check()
+            reassigned = []
+            for worker_id in (1, 2):
+                command, items = supervisor.states[worker_id].commands.get(
+                    timeout=5)
+                assert command == 'assign'
+                reassigned.extend(items)
+            assert sorted(reassigned) == sorted(tenants), (
+                'Проверьте, что арендаторы упавшего воркера '
+                'переданы оставшимся'
+            )
+            assert supervisor.states[0].process.is_alive(), (
+                'Проверьте, что упавший воркер перезапускается'
+            )
+            assert supervisor.states[0].restarts == 1
+        finally:
+            supervisor.stop()
@@ -0,0 +1,146 @@
+import asyncio
+from email.utils import formatdate
+
+import pytest
+
+from engine import PollingEngine, Tenant
+from exceptions import RateLimitError, ThrottledError
+import homework
+from throttle import RequestThrottle, parse_retry_after
+from utils import RecordingBot
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class MockResponse:
+
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def make_throttle(tmp_path, clock, **kwargs):
+    options = dict(window=60, token_limit=6, ip_limit=60, burst=2,
+                   default_penalty=30, clock=clock)
+    options.update(kwargs)
+    return RequestThrottle(str(tmp_path / 'throttle.sqlite3'), **options)
+
+
+class TestParseRetryAfter:
+
+    def test_seconds_and_http_date(self):
+        assert parse_retry_after(None) is None
+        assert parse_retry_after('120') == 120
+        assert parse_retry_after(
+            formatdate(1090, usegmt=True), now=1000) == 90
+        assert parse_retry_after('завтра') is None
+
+    def test_rate_limit_status_raises_rate_limit_error(self):
+        with pytest.raises(RateLimitError) as error:
+            homework.check_status_code(
+                MockResponse(429, {'Retry-After': '15'}))
+        assert error.value.retry_after == 15, (
+            'Проверьте, что время из Retry-After передаётся в исключение'
+        )
+        with pytest.raises(RateLimitError):
+            homework.check_status_code(MockResponse(503))
+
+
+class TestRequestThrottle:
+
+    def test_requests_are_spread_across_window(self, tmp_path):
+        clock = FakeClock()
+        throttle = make_throttle(tmp_path, clock)
+
+        assert throttle.acquire('token') == 0
+        assert throttle.acquire('token') == 0
+        assert throttle.acquire('token') == pytest.approx(10), (
+            'Проверьте, что после burst запросов следующий запрос '
+            'откладывается на окно, делённое на лимит'
+        )
+        clock.now += 10
+        assert throttle.acquire('token') == 0
+        assert throttle.acquire('other') == 0
+
+    def test_budget_is_shared_between_connections(self, tmp_path):
+        clock = FakeClock()
+        first = make_throttle(tmp_path, clock)
+        second = make_throttle(tmp_path, clock)
+        first.acquire('token')
+        first.acquire('token')
+
+        assert second.acquire('token') > 0, (
+            'Проверьте, что бюджет хранится в общей базе и виден '
+            'всем процессам'
+        )
+
+    def test_take_queues_shared_budget_like_token_bucket(self, tmp_path):
+        clock = FakeClock()
+        first = make_throttle(tmp_path, clock)
+        second = make_throttle(tmp_path, clock)
+
+        assert first.take('telegram:global', 2) == 0
+        assert second.take('telegram:global', 2) == 0.5
+        assert first.take('telegram:global', 2) == 1.0, (
+            'Проверьте, что take() всегда списывает единицу из общего '
+            'бюджета и возвращает задержку до её появления'
+        )
+        clock.now += 10
+        assert second.take('telegram:global', 2) == 0
+
+    def test_429_blocks_token_and_503_blocks_ip(self, tmp_path):
+        clock = FakeClock()
+        throttle = make_throttle(tmp_path, clock, burst=100)
+
+        def limited():
+            raise RateLimitError('429', 429, retry_after=40)
+
+        with pytest.raises(RateLimitError):
+            throttle.call('token', limited)
+        with pytest.raises(ThrottledError) as error:
+            throttle.call('token', lambda: 'ok')
+        assert error.value.retry_after == pytest.approx(40)
+        assert throttle.call('other', lambda: 'ok') == 'ok'
+
+        def unavailable():
+            raise RateLimitError('503', 503)
+
+        with pytest.raises(RateLimitError):
+            throttle.call('other', unavailable)
+        with pytest.raises(ThrottledError) as error:
+            throttle.call('third', lambda: 'ok')
+        assert error.value.retry_after == pytest.approx(30), (
+            'Проверьте, что 503 без Retry-After блокирует весь IP-адрес '
+            'на default_penalty'
+        )
+
+    def test_engine_reschedules_after_retry_after(self, tmp_path):
+        clock = FakeClock()
+        throttle = make_throttle(tmp_path, clock, burst=100)
+
+        def fetch(token, from_date):
+            raise RateLimitError('429', 429, retry_after=5000)
+
+        tenant = Tenant('tok', '1', 0)
+        polling = PollingEngine(RecordingBot(), [tenant], fetch=fetch,
+                                throttle=throttle)
+        polling.scheduler.jitter = 0
+
+        async def poll():
+            polling._wakeup = asyncio.Event()
+            await polling._poll_and_reschedule(tenant)
+
+        asyncio.run(poll())
+        polling.close()
+
+        assert tenant.retry_after == 5000
+        assert polling.scheduler.time_until_next() >= 4999, (
+            'Проверьте, что следующий опрос не раньше срока из Retry-After'
+        )
@@ -0,0 +1,49 @@
+import pytest
+import requests
+
+from benchmarks.stub_server import start_stub_server
+from transport import Transport
+
+
+@pytest.fixture
+def stub_url():
+    server, url = start_stub_server()
+    yield url
+    server.shutdown()
+
+
+class TestTransport:
+    HEADERS = {'Authorization': 'OAuth token'}
+
+    def test_connections_are_reused(self, stub_url):
+        pooled = Transport()
+        for from_date in range(5):
+            response = pooled.get(
+                stub_url, headers=self.HEADERS,
+                params={'from_date': from_date})
+            assert response.status_code == 200
+        pool = pooled.adapter.poolmanager.connection_from_url(stub_url)
+        assert pool.num_connections == 1, (
+            'Проверьте, что транспорт переиспользует keep-alive соединение'
+        )
+        pooled.close()
+
+    def test_prewarm_opens_connection_without_request(self, stub_url):
+        pooled = Transport()
+        pooled.prewarm(stub_url, connections=2)
+        pool = pooled.adapter.poolmanager.connection_from_url(stub_url)
+        assert pool.num_connections == 2
+        assert pool.num_requests == 0
+        pooled.get(stub_url, headers=self.HEADERS, params={'from_date': 0})
+        assert pool.num_connections == 2, (
+            'Проверьте, что запрос использует прогретое соединение'
+        )
+        pooled.close()
+
+    def test_read_timeout_is_applied(self):
+        server, url = start_stub_server(latency=0.5)
+        pooled = Transport(read_timeout=0.05)
+        with pytest.raises(requests.Timeout):
+            pooled.get(url, headers=self.HEADERS, params={'from_date': 0})
+        pooled.close()
+        server.shutdown()
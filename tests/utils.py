@@ -1,6 +1,9 @@
 from inspect import signature
+import time
 from types import ModuleType
 
+import telegram
+
 
 def check_function(scope: ModuleType, func_name: str, params_qty: int = 0):
     """Checks if scope has a function with specific name and params with qty"""
@@ -37,3 +40,25 @@ def check_default_var_exists(scope: ModuleType, var_name: str) -> None:
         f'{var_name} должна быть переменной, а не функцией.'
     )
 
+
+class RecordingBot:
+    """
+    Fake Telegram bot that records sent messages as (chat_id, text).
+    Chats from broken answer BadRequest, chats from flood_once answer
+    RetryAfter once; moments holds the monotonic time of every send.
+    """
+
+    def __init__(self, broken=(), flood_once=()):
+        self.sent = []
+        self.moments = []
+        self.broken = set(broken)
+        self.flood_once = set(flood_once)
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        if chat_id in self.broken:
+            raise telegram.error.BadRequest('Chat not found')
+        if chat_id in self.flood_once:
+            self.flood_once.discard(chat_id)
+            raise telegram.error.RetryAfter(0.05)
+        self.sent.append((chat_id, text))
+        self.moments.append(time.monotonic())
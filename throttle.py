@@ -0,0 +1,188 @@
+import hashlib
+from http import HTTPStatus
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from exceptions import RateLimitError, ThrottledError
+
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_PATH = os.getenv('THROTTLE_PATH', 'throttle.sqlite3')
+THROTTLE_WINDOW = float(os.getenv('THROTTLE_WINDOW', 60))
+THROTTLE_TOKEN_LIMIT = int(os.getenv('THROTTLE_TOKEN_LIMIT', 30))
+THROTTLE_IP_LIMIT = int(os.getenv('THROTTLE_IP_LIMIT', 120))
+THROTTLE_BURST = int(os.getenv('THROTTLE_BURST', 5))
+THROTTLE_DEFAULT_PENALTY = float(os.getenv('THROTTLE_DEFAULT_PENALTY', 60))
+SOURCE_IP = os.getenv('SOURCE_IP', 'default')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS budgets (
+    key TEXT PRIMARY KEY,
+    tat REAL NOT NULL,
+    blocked_until REAL NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+"""
+
+
+def parse_retry_after(value, now=None):
+    """
+    Возвращает число секунд из заголовка Retry-After или None.
+    Заголовок может содержать число секунд или HTTP-дату.
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    from email.utils import parsedate_to_datetime
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, moment.timestamp() - now)
+
+
+class RequestThrottle:
+    """
+    Общий для всех процессов бюджет запросов к API Практикума.
+    Бюджет считается отдельно для каждого токена и для исходящего
+    IP-адреса по алгоритму GCRA: запросы равномерно распределяются
+    по окну window, а подряд допускается не больше burst запросов.
+    Ответы 429 блокируют токен, а 503 — весь IP-адрес на время из
+    Retry-After. Состояние хранится в SQLite в режиме WAL, поэтому
+    его видят все воркеры, в том числе в других процессах.
+    """
+
+    def __init__(self, path=THROTTLE_PATH, window=THROTTLE_WINDOW,
+                 token_limit=THROTTLE_TOKEN_LIMIT,
+                 ip_limit=THROTTLE_IP_LIMIT, burst=THROTTLE_BURST,
+                 default_penalty=THROTTLE_DEFAULT_PENALTY,
+                 source=SOURCE_IP, clock=time.time):
+        self.path = path
+        self.window = window
+        self.token_limit = token_limit
+        self.ip_limit = ip_limit
+        self.burst = burst
+        self.default_penalty = default_penalty
+        self.source = source
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None,
+            timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+
+    def _keys(self, token):
+        digest = hashlib.sha256(token.encode()).hexdigest()[:16]
+        return ((f'token:{digest}', self.window / self.token_limit),
+                (f'ip:{self.source}', self.window / self.ip_limit))
+
+    def acquire(self, token):
+        """
+        Списывает один запрос с бюджетов токена и IP-адреса.
+        Возвращает 0, если запрос можно выполнять сразу, иначе —
+        сколько секунд нужно подождать; в этом случае бюджет
+        не расходуется.
+        """
+        keys = self._keys(token)
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                now = self.clock()
+                wait = 0.0
+                updates = []
+                for key, emission in keys:
+                    row = self._conn.execute(
+                        'SELECT tat, blocked_until FROM budgets '
+                        'WHERE key = ?', (key,)).fetchone()
+                    tat, blocked_until = row or (now, 0.0)
+                    new_tat = max(tat, now) + emission
+                    wait = max(wait, blocked_until - now,
+                               new_tat - now - emission * self.burst)
+                    updates.append((key, new_tat))
+                if wait <= 0:
+                    self._conn.executemany(
+                        'INSERT INTO budgets (key, tat) VALUES (?, ?) '
+                        'ON CONFLICT (key) DO UPDATE SET tat = excluded.tat',
+                        updates)
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        return max(wait, 0.0)
+
+    def take(self, key, rate, burst=1):
+        """
+        Забирает единицу из общего бюджета key в rate единиц в секунду.
+        Как TokenBucket.take(): единица списывается всегда, подряд
+        без ожидания проходят burst единиц, а возвращается задержка
+        до её появления. Бюджет общий для всех процессов с той же
+        базой, например глобальный лимит отправки в Telegram.
+        """
+        emission = 1 / rate
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                now = self.clock()
+                row = self._conn.execute(
+                    'SELECT tat FROM budgets WHERE key = ?',
+                    (key,)).fetchone()
+                tat = max(row[0] if row else now, now) + emission
+                self._conn.execute(
+                    'INSERT INTO budgets (key, tat) VALUES (?, ?) '
+                    'ON CONFLICT (key) DO UPDATE SET tat = excluded.tat',
+                    (key, tat))
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        return max(0.0, tat - now - emission * burst)
+
+    def penalize(self, token, status_code, retry_after=None):
+        """
+        Блокирует токен (429) или IP-адрес (503) на retry_after секунд.
+        Без Retry-After используется default_penalty.
+        """
+        token_key, ip_key = self._keys(token)
+        key = (ip_key if status_code == HTTPStatus.SERVICE_UNAVAILABLE
+               else token_key)[0]
+        delay = self.default_penalty if retry_after is None else retry_after
+        blocked_until = self.clock() + delay
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO budgets (key, tat, blocked_until) '
+                'VALUES (?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+                'blocked_until = max(blocked_until, excluded.blocked_until)',
+                (key, self.clock(), blocked_until))
+        logger.warning(
+            f'API ответило {status_code}, запросы {key.split(":")[0]} '
+            f'приостановлены на {delay:.0f} с')
+
+    def call(self, token, func, *args, **kwargs):
+        """
+        Вызывает func, если бюджет токена и IP-адреса не исчерпан.
+        Иначе выбрасывает ThrottledError со временем ожидания.
+        RateLimitError от func продлевает блокировку и пробрасывается.
+        """
+        wait = self.acquire(token)
+        if wait > 0:
+            raise ThrottledError(
+                f'Лимит запросов к API исчерпан, повтор через {wait:.0f} с',
+                retry_after=wait)
+        try:
+            return func(*args, **kwargs)
+        except RateLimitError as error:
+            self.penalize(token, error.status_code, error.retry_after)
+            raise
+
+    def close(self):
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,95 @@
+import logging
+import os
+import threading
+
+from lazy import lazy_import
+
+requests = lazy_import('requests')
+
+
+logger = logging.getLogger(__name__)
+
+POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', 4))
+POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 64))
+CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 3.05))
+READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 15))
+PREWARM_LEAD = float(os.getenv('HTTP_PREWARM_LEAD', 5))
+
+
+class Transport:
+    """
+    Общий HTTP-транспорт с пулом keep-alive соединений.
+    pool_connections — сколько хостов держать в пуле,
+    pool_maxsize — предел соединений к одному хосту: при его достижении
+    запросы ждут свободное соединение, а не открывают новые.
+    Таймауты подставляются во все запросы, если не заданы явно.
+    """
+
+    def __init__(self, pool_connections=POOL_CONNECTIONS,
+                 pool_maxsize=POOL_MAXSIZE, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT):
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_maxsize = pool_maxsize
+        self.adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+            pool_block=True)
+        self.session = requests.Session()
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+
+    def get(self, url, **kwargs):
+        """Выполняет GET-запрос через пул соединений."""
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def prewarm(self, url, connections=1):
+        """
+        Заранее открывает соединения к хосту из url.
+        DNS, TCP и TLS выполняются до запроса, а сам запрос к API
+        не отправляется, поэтому лимит запросов не расходуется.
+        Живые соединения из пула переиспользуются. Ошибки только
+        логируются: опрос всё равно откроет соединение сам.
+        """
+        connections = min(connections, self.pool_maxsize)
+        pool = self.adapter.poolmanager.connection_from_url(url)
+        taken = []
+        try:
+            for _ in range(connections):
+                conn = pool._get_conn(timeout=self.timeout[0])
+                taken.append(conn)
+                if conn.sock is None:
+                    conn.timeout = self.timeout[0]
+                    conn.connect()
+        except Exception as error:
+            logger.warning(f'Не удалось прогреть соединение с {url}: {error}')
+        finally:
+            for conn in taken:
+                pool._put_conn(conn)
+
+    def close(self):
+        """Закрывает все соединения пула."""
+        self.session.close()
+
+
+_transport = None
+_lock = threading.Lock()
+
+
+def get_transport():
+    """Возвращает общий транспорт процесса, создавая его при первом вызове."""
+    global _transport
+    if _transport is None:
+        with _lock:
+            if _transport is None:
+                _transport = Transport()
+    return _transport
+
+
+def get(url, **kwargs):
+    """GET-запрос через общий транспорт."""
+    return get_transport().get(url, **kwargs)
+
+
+def prewarm(url, connections=1):
+    """Прогревает соединения общего транспорта."""
+    get_transport().prewarm(url, connections)